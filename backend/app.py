@@ -1,15 +1,79 @@
-from flask import Flask, request, jsonify
+from flask import (
+    Flask,
+    Response,
+    g,
+    jsonify,
+    make_response,
+    redirect,
+    request,
+    stream_with_context,
+    url_for,
+)
 from flask_cors import CORS
+import functools
+import hmac
+import io
+import itertools
 import os
+import time
+import uuid
+from contextlib import ExitStack
+import cv2
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
-from ml.color_extractor import extract_dominant_colors
+from ml.color_extractor import (
+    QUALITY_ORDER,
+    apply_thread_limit,
+    extract_dominant_colors,
+    iter_progressive_palettes,
+)
 from ml.color_classifier import classify_color
 from ml.complementary_colors import get_complementary_colors
-from utils.image_processor import process_image, allowed_file
+from ml.harmony import HARMONY_SCHEMES, harmony_schemes, rgb_to_hex_array
+from utils.image_processor import (
+    ALLOWED_EXTENSIONS,
+    ImageTooLargeError,
+    allowed_file,
+    decode_reduction,
+    fetch_image_url,
+    fit_pixel_selection,
+    probe_image,
+    process_image,
+    read_image,
+)
+from utils.admission import AdmissionController, OverloadedError
 from utils.color_distance import calculate_color_distance
-from backend.utils.color_utils import rgb_to_hex, rgb_to_hsl, hex_to_rgb
+from utils.job_queue import JobQueue
+from utils.palette_index import SharedPaletteIndex
+from utils.palette_matching import (
+    ReferencePalette,
+    ReferencePaletteCache,
+    match_palette,
+    palette_rgb,
+)
+from utils.perceptual_hash import PaletteHashCache, image_signature
+from utils.profiling import (
+    REPORT_FORMATS,
+    Profiler,
+    ProfileStore,
+    RequestProfile,
+    is_allowed,
+    parse_allowlist,
+)
+from utils.serialization import (
+    COLUMNAR_MEDIA_TYPE,
+    FastJSONProvider,
+    dumps,
+    loads,
+    to_columnar,
+)
+from backend.utils.color_utils import rgb_to_hex, rgb_to_hsl, hex_to_rgb, normalize_hex
 
 app = Flask(__name__)
+# orjson-backed jsonify that also accepts NumPy scalars and arrays
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # Configure upload folder
@@ -18,46 +82,506 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max upload
+# Limit on decoded pixels; MAX_CONTENT_LENGTH only bounds compressed bytes
+app.config["MAX_IMAGE_PIXELS"] = int(
+    float(os.environ.get("MAX_IMAGE_MEGAPIXELS", 40)) * 1_000_000
+)
+# Working resolution advertised to clients, which downscale uploads to it
+# before sending; clustering needs far fewer pixels than a phone photo has
+app.config["WORKING_MAX_SIDE"] = int(os.environ.get("WORKING_MAX_SIDE", 1024))
+app.config["WORKING_MAX_PIXELS"] = int(
+    float(os.environ.get("WORKING_MEGAPIXELS", 0.5)) * 1_000_000
+)
+
+# Image URLs on private networks are refused unless explicitly allowed
+app.config["ALLOW_PRIVATE_IMAGE_URLS"] = os.environ.get(
+    "ALLOW_PRIVATE_IMAGE_URLS", ""
+).lower() in ("1", "true")
+
+# Configure load-aware extraction quality: under load, requests step down
+# through the QUALITY_ORDER tiers to keep p95 latency near the SLO
+admission = AdmissionController(
+    QUALITY_ORDER,
+    slo_p95=float(os.environ.get("SLO_P95_MS", 1000)) / 1000,
+    concurrency=int(os.environ.get("ADMISSION_CONCURRENCY", 4 * (os.cpu_count() or 1))),
+    max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 64)),
+    enabled=os.environ.get("ADAPTIVE_QUALITY", "1").lower() not in ("0", "false"),
+)
+
+# Cap the native threads of clustering (EXTRACTOR_THREADS) once for the
+# whole process; the ASGI app imports this module, so it is covered too
+apply_thread_limit()
+
+# Configure request profiling: clients that send PROFILE_TOKEN (X-Profile-Token
+# or ?profile_token=) from PROFILE_ALLOWLIST may profile a request with
+# ?profile= or X-Profile and read /api/profiles. Behind a reverse proxy every
+# client has the proxy's address, so the token is required and profiling is
+# off without one. The slowest requests are always logged; with
+# PROFILE_SLOW_REQUESTS every request is sampled so they come with profiles.
+app.config["PROFILE_TOKEN"] = os.environ.get("PROFILE_TOKEN", "")
+app.config["PROFILE_ALLOWLIST"] = parse_allowlist(
+    os.environ.get("PROFILE_ALLOWLIST", "127.0.0.1,::1")
+)
+app.config["PROFILE_SLOW_REQUESTS"] = Profiler is not None and os.environ.get(
+    "PROFILE_SLOW_REQUESTS", ""
+).lower() in ("1", "true")
+profile_store = ProfileStore(
+    os.environ.get("PROFILE_DIR", "profiles"),
+    slow_log_size=int(os.environ.get("SLOW_LOG_SIZE", 20)),
+)
+
+# Configure the bulk extraction job queue
+app.config["JOBS_DB"] = os.environ.get("JOBS_DB", "jobs.db")
+app.config["JOBS_INPUT_ROOT"] = os.path.realpath(
+    os.environ.get("JOBS_INPUT_ROOT", os.getcwd())
+)
+
+# Created on first use, so importing the app does not create the database;
+# workers run separately (python -m backend.cli workers)
+_job_queue = None
+
+
+def get_job_queue():
+    global _job_queue
+
+    if _job_queue is None:
+        _job_queue = JobQueue(app.config["JOBS_DB"])
+    return _job_queue
+
+
+# Configure the palette similarity index
+app.config["PALETTE_INDEX_DIR"] = os.environ.get("PALETTE_INDEX_DIR", "palette_index")
+palette_index = SharedPaletteIndex(
+    app.config["PALETTE_INDEX_DIR"],
+    compact_every=int(os.environ.get("PALETTE_INDEX_COMPACT_EVERY", 10000)),
+)
+
+# Responses of the GET color endpoints are pure functions of the URL, so
+# caches may keep them for a year; bump the version when their output changes
+COLOR_RESPONSE_VERSION = "2"
+COLOR_RESPONSE_MAX_AGE = 365 * 24 * 3600
+
+# Reference (brand) palettes for /api/match-palette, stored by id
+reference_palettes = ReferencePaletteCache(
+    max_entries=int(os.environ.get("REFERENCE_PALETTE_CACHE_SIZE", 1000))
+)
+
+# Palettes of recent uploads, reused for resized or re-encoded copies
+palette_cache = PaletteHashCache(
+    max_distance=int(os.environ.get("PALETTE_CACHE_MAX_DISTANCE", 6))
+)
+
+
+@app.after_request
+def vary_on_accept(response):
+    """Mark responses whose format was negotiated from the Accept header."""
+    if g.get("accept_negotiated"):
+        response.vary.add("Accept")
+    return response
+
+
+@app.errorhandler(ImageTooLargeError)
+def image_too_large(error):
+    return jsonify({"error": str(error)}), 413
+
+
+@app.errorhandler(UnidentifiedImageError)
+def unidentified_image(error):
+    return jsonify({"error": "Invalid image file"}), 400
+
+
+@app.errorhandler(OverloadedError)
+def overloaded(error):
+    response = jsonify({"error": str(error)})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def adaptive_quality(view):
+    """Run a view under the admission controller.
+
+    The view reads its extraction quality tier from g.quality; the tier is
+    also sent in the X-Quality-Tier response header.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Receive the upload first so slow clients do not count as load
+        request.files
+        with ExitStack() as stack:
+            quality = stack.enter_context(admission.admit())
+            g.quality = quality
+            response = make_response(view(*args, **kwargs))
+            if response.is_streamed:
+                # Streamed responses extract while they are sent, so they
+                # hold the slot until the server closes them
+                response.call_on_close(stack.pop_all().close)
+        response.headers["X-Quality-Tier"] = quality
+        return response
+
+    return wrapper
+
+
+def profiling_allowed():
+    """Whether the client sent PROFILE_TOKEN from an address in PROFILE_ALLOWLIST."""
+    token = app.config["PROFILE_TOKEN"]
+    supplied = request.headers.get("X-Profile-Token") or request.args.get(
+        "profile_token", ""
+    )
+    return (
+        bool(token)
+        and hmac.compare_digest(supplied.encode(), token.encode())
+        and is_allowed(request.remote_addr, app.config["PROFILE_ALLOWLIST"])
+    )
+
+
+def requested_profile():
+    """
+    Profile format asked for by a client allowed to profile, or None
+
+    "1" stores the profile and returns its id in X-Profile-Id; "html",
+    "speedscope" and "text" return the report instead of the normal response.
+    """
+    value = request.args.get("profile") or request.headers.get("X-Profile")
+    if value in (None, "", "0", "false"):
+        return None
+    if not profiling_allowed():
+        return None
+    return value if value in REPORT_FORMATS else "1"
+
+
+def profiled(view):
+    """
+    Time a view for the slow-request log and profile it when asked to
+
+    Streamed responses are timed and profiled until the server closes them.
+    Views can add details for the log, such as the image size, to
+    g.profile_details.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        report_format = requested_profile()
+        g.profile_details = {}
+        stack = ExitStack()
+        profile = None
+        if report_format is not None or app.config["PROFILE_SLOW_REQUESTS"]:
+            engine = request.args.get("profiler") if report_format else None
+            if engine not in ("pyinstrument", "cprofile"):
+                engine = None
+            profile = stack.enter_context(RequestProfile(engine=engine))
+
+        start = time.perf_counter()
+        with stack:
+            response = make_response(view(*args, **kwargs))
+            if response.is_streamed and report_format in REPORT_FORMATS:
+                # The report replaces the body, so generate it now
+                response.get_data()
+            streamed = response.is_streamed
+            if streamed:
+                # Keep profiling while the body is generated and sent
+                stack = stack.pop_all()
+
+        details = {
+            "path": request.path,
+            "time": time.time(),
+            "status": response.status_code,
+            "bytes": request.content_length,
+            "params": request.form.to_dict(),
+            "quality": response.headers.get("X-Quality-Tier"),
+        }
+        details.update(g.profile_details)
+        # Requested profiles get their id up front, streams are stored later
+        profile_id = uuid.uuid4().hex if report_format is not None else None
+
+        def finish():
+            stack.close()
+            duration = time.perf_counter() - start
+            stored_id = None
+            if profile is not None:
+                duration = profile.duration
+                if report_format is not None or profile_store.is_slow(duration):
+                    stored_id = profile_store.save(
+                        profile, requested=bool(report_format), profile_id=profile_id
+                    )
+            profile_store.record(duration, details, stored_id)
+
+        if streamed:
+            response.call_on_close(finish)
+        else:
+            finish()
+
+        if report_format in REPORT_FORMATS:
+            if profile.engine == "cprofile":
+                report_format = "text"
+            return Response(
+                profile.render(report_format),
+                content_type=REPORT_FORMATS[report_format],
+                headers={"X-Profile-Id": profile_id},
+            )
+        if report_format is not None:
+            response.headers["X-Profile-Id"] = profile_id
+            response.headers["X-Profile-Url"] = f"/api/profiles/{profile_id}"
+        return response
+
+    return wrapper
+
+
+def parse_num_colors(value, default=5):
+    """Parse the num_colors form field: a positive integer or "auto"."""
+    if value is None or value == "":
+        return default
+    if value == "auto":
+        return value
+    num_colors = int(value)
+    if num_colors < 1:
+        raise ValueError("num_colors must be a positive integer or 'auto'")
+    return num_colors
+
+
+def wants_stream():
+    """Check whether the client asked for an NDJSON streaming response."""
+    g.accept_negotiated = True
+    if request.args.get("stream") in ("1", "true", "ndjson"):
+        return True
+    return "application/x-ndjson" in request.headers.get("Accept", "")
+
+
+def ndjson_response(items):
+    """Stream an iterable of JSON-serializable items, one per line."""
+
+    def generate():
+        for item in items:
+            yield dumps(item) + b"\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+
+
+def wants_columnar():
+    """Check whether the client asked for palettes as parallel arrays."""
+    g.accept_negotiated = True
+    if request.args.get("format") == "columnar":
+        return True
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("Accept", "")
+
+
+def palette_cache_params(num_colors, selection_options, quality="full"):
+    """Cache key parameters, or None when the request cannot use the cache."""
+    # Masks are arbitrary images, so masked extractions are never reused
+    if selection_options.get("mask") is not None:
+        return None
+    rect = selection_options.get("rect")
+    return (
+        str(num_colors),
+        selection_options.get("alpha_threshold"),
+        tuple(rect) if rect is not None else None,
+        quality,
+    )
+
+
+def pixel_selection_options(form, mask_data=None):
+    """Read optional alpha_threshold, rect and mask fields from a form.
+
+    Args:
+        form: Mapping of form field values
+        mask_data (bytes): Contents of the uploaded mask image, if any
+
+    Returns:
+        dict: Keyword arguments for extract_dominant_colors
+    """
+    options = {}
+
+    alpha_threshold = form.get("alpha_threshold")
+    if alpha_threshold not in (None, ""):
+        options["alpha_threshold"] = int(alpha_threshold)
+        if not 0 <= options["alpha_threshold"] <= 255:
+            raise ValueError("alpha_threshold must be between 0 and 255")
+
+    rect = form.get("rect")
+    if rect:
+        options["rect"] = [int(value) for value in rect.split(",")]
+        if len(options["rect"]) != 4:
+            raise ValueError("rect must be x,y,width,height")
+
+    if mask_data:
+        # Non-black mask pixels mark the region to analyze
+        mask = Image.open(io.BytesIO(mask_data)).convert("L")
+        options["mask"] = np.asarray(mask) > 127
+
+    return options
+
+
+def parse_pixel_selection():
+    """Pixel selection options of the current Flask request."""
+    mask_file = request.files.get("mask")
+    mask_data = None
+    if mask_file is not None and mask_file.filename != "":
+        mask_data = mask_file.read()
+    return pixel_selection_options(request.form, mask_data)
+
+
+def upload_error(filename):
+    """Error message for a missing or disallowed upload, else None."""
+    if filename is None:
+        return "No image provided"
+    if filename == "":
+        return "No selected file"
+    if not allowed_file(filename):
+        return "File type not allowed"
+    return None
+
+
+def decode_upload(stream, selection_options, max_pixels):
+    """Decode an uploaded image and fit the pixel selection to it.
+
+    Shared by the Flask and ASGI upload routes so both report a bad upload
+    the same way.
+
+    Args:
+        stream: Seekable file object with the uploaded bytes
+        selection_options (dict): Result of pixel_selection_options
+        max_pixels (int): Decoded pixel limit (see decode_reduction)
+
+    Returns:
+        tuple: (image array, pixel selection options on the decoded grid)
+
+    Raises:
+        ImageTooLargeError: If the image cannot be decoded within max_pixels
+        ValueError: If the file is not an image or the mask or rect does not
+            fit it
+    """
+    try:
+        info = probe_image(stream)
+        img = process_image(stream, max_pixels=max_pixels)
+    except OSError:
+        # Includes UnidentifiedImageError for files that are not images
+        raise ValueError("Invalid image file")
+    # Large JPEGs are decoded reduced, so the mask and rect are scaled to match
+    return img, fit_pixel_selection(selection_options, info, img.shape)
 
 
 @app.route("/api/upload", methods=["POST"])
+@profiled
+@adaptive_quality
 def upload_image():
-    if "image" not in request.files:
-        return jsonify({"error": "No image provided"}), 400
+    image_file = request.files.get("image")
+    invalid = upload_error(getattr(image_file, "filename", None))
+    if invalid is not None:
+        return jsonify({"error": invalid}), 400
 
-    image_file = request.files["image"]
+    try:
+        num_colors = parse_num_colors(request.form.get("num_colors"))
+    except ValueError:
+        return jsonify({"error": "Invalid num_colors"}), 400
 
-    # Check if file is empty
-    if image_file.filename == "":
-        return jsonify({"error": "No selected file"}), 400
+    try:
+        selection_options = parse_pixel_selection()
+    except (ValueError, OSError) as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Check file extension
-    if not allowed_file(image_file.filename):
-        return jsonify({"error": "File type not allowed"}), 400
+    try:
+        img, selection_options = decode_upload(
+            image_file.stream, selection_options, app.config["MAX_IMAGE_PIXELS"]
+        )
+    except ImageTooLargeError:
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if "profile_details" in g:
+        g.profile_details["imageSize"] = [img.shape[1], img.shape[0]]
 
-    img = process_image(image_file)
+    # Progressive mode: stream a coarse palette first, then refinements
+    if request.form.get("progressive") in ("1", "true"):
+        deadline = request.form.get("deadline_ms", 1000, type=float) / 1000
+        updates = iter_progressive_palettes(
+            img, num_colors=num_colors, deadline=deadline, **selection_options
+        )
+        # The first stage runs before the response starts, so its errors
+        # are reported with a status code instead of cutting the stream
+        try:
+            updates = itertools.chain([next(updates)], updates)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        format_colors = to_columnar if wants_columnar() else list
+        return ndjson_response(
+            {
+                "stage": update["stage"],
+                "size": update["size"],
+                "dominant_colors": format_colors(update["colors"]),
+                "shift": update["shift"],
+                "converged": update["converged"],
+                "final": update["final"],
+                "elapsed_ms": update["elapsed_ms"],
+            }
+            for update in updates
+        )
 
-    # Process the image and return dominant colors
-    dominant_colors = extract_dominant_colors(img)
+    def compute():
+        return extract_dominant_colors(
+            img, num_colors=num_colors, quality=g.quality, **selection_options
+        )
 
-    return jsonify({"dominant_colors": dominant_colors})
+    # Process the image and return dominant colors, reusing the palette of a
+    # near-duplicate image when there is one
+    format_colors = to_columnar if wants_columnar() else list
+    params = palette_cache_params(num_colors, selection_options, g.quality)
+    try:
+        if params is None:
+            return jsonify(
+                {"dominant_colors": format_colors(compute()), "quality": g.quality}
+            )
+        # Decoded uploads are BGR with three channels and RGBA with four
+        image_hash, color = image_signature(
+            img, bgr=img.ndim == 3 and img.shape[2] == 3
+        )
+        dominant_colors, cache_info = palette_cache.get_or_compute(
+            image_hash, params, compute, color=color
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {
+            "dominant_colors": format_colors(dominant_colors),
+            "phash": f"{image_hash:016x}",
+            "cache": cache_info,
+            "quality": g.quality,
+        }
+    )
 
 
 @app.route("/api/analyze", methods=["POST"])
+@profiled
+@adaptive_quality
 def analyze_image():
-    # Check if image was uploaded
-    if "image" not in request.files:
-        return jsonify({"error": "No image part"}), 400
+    file = request.files.get("image")
+    invalid = upload_error(getattr(file, "filename", None))
+    if invalid is not None:
+        return jsonify({"error": invalid}), 400
 
-    file = request.files["image"]
+    try:
+        num_colors = parse_num_colors(request.form.get("num_colors"))
+    except ValueError:
+        return jsonify({"error": "Invalid num_colors"}), 400
 
-    # Check if file is empty
-    if file.filename == "":
-        return jsonify({"error": "No selected file"}), 400
+    try:
+        selection_options = parse_pixel_selection()
+    except (ValueError, OSError) as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Check file extension
-    if not allowed_file(file.filename):
-        return jsonify({"error": "File type not allowed"}), 400
+    # Check dimensions from the header before anything is decoded or saved;
+    # images over MAX_IMAGE_PIXELS that cannot be read reduced are refused
+    try:
+        info = probe_image(file.stream)
+    except OSError:
+        return jsonify({"error": "Invalid image file"}), 400
+    decode_reduction(info, app.config["MAX_IMAGE_PIXELS"])
+    if "profile_details" in g:
+        g.profile_details["imageSize"] = [info["width"], info["height"]]
 
     # Save file
     filename = secure_filename(file.filename)
@@ -65,17 +589,79 @@ def analyze_image():
     file.save(file_path)
 
     try:
-        # Extract dominant colors
-        dominant_colors = extract_dominant_colors(file_path)
+        # Decode once; the same array is hashed and clustered
+        img = read_image(file_path, max_pixels=app.config["MAX_IMAGE_PIXELS"])
+        if img.ndim == 3 and img.shape[2] == 4:
+            # Four-channel arrays are passed to the extractor as RGBA
+            img = cv2.cvtColor(img, cv2.COLOR_BGRA2RGBA)
+
+        # Large JPEGs are decoded reduced, so the mask and rect are scaled
+        # to match
+        selection_options = fit_pixel_selection(selection_options, info, img.shape)
+        selections = []
 
-        # Get image dimensions
-        height, width = process_image(file_path, get_dimensions_only=True)
+        def compute():
+            colors, selection = extract_dominant_colors(
+                img,
+                num_colors=num_colors,
+                return_selection=True,
+                quality=g.quality,
+                **selection_options,
+            )
+            selections.append(selection)
+            return colors
+
+        # Extract dominant colors, or reuse those of a near-duplicate image
+        params = palette_cache_params(num_colors, selection_options, g.quality)
+        image_hash, color = (
+            image_signature(img, bgr=img.ndim == 3 and img.shape[2] == 3)
+            if params is not None
+            else (None, None)
+        )
+        cache_info = None
+        if image_hash is None:
+            dominant_colors = compute()
+        else:
+            dominant_colors, cache_info = palette_cache.get_or_compute(
+                image_hash, params, compute, color=color
+            )
+        # Cached palettes carry no selection details (audited hits recompute
+        # one, but it does not describe the returned palette)
+        hit = cache_info is not None and cache_info["hit"]
+        selection = selections[0] if selections and not hit else None
+
+        # Image dimensions come from the header probe
+        height, width = info["height"], info["width"]
 
         # Prepare response
-        response = {"dominantColors": dominant_colors, "width": width, "height": height}
+        response = {
+            "dominantColors": (
+                to_columnar(dominant_colors) if wants_columnar() else dominant_colors
+            ),
+            "width": width,
+            "height": height,
+            "numColors": len(dominant_colors),
+            "quality": g.quality,
+        }
+        if cache_info is not None:
+            response["phash"] = f"{image_hash:016x}"
+            response["cache"] = cache_info
+        if selection is not None:
+            response["autoSelection"] = {
+                "selectedK": selection["num_colors"],
+                "timeMs": selection["elapsed_ms"],
+                "reason": selection["reason"],
+                "candidatesEvaluated": selection["candidates_evaluated"],
+            }
 
         return jsonify(response)
 
+    except ImageTooLargeError as e:
+        return jsonify({"error": str(e)}), 413
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -85,6 +671,172 @@ def analyze_image():
             os.remove(file_path)
 
 
+@app.route("/api/capabilities", methods=["GET"])
+def capabilities():
+    """
+    Upload limits and the working resolution clients should downscale to
+
+    Images at or below the working resolution are analyzed as sent.
+    """
+    response = jsonify(
+        {
+            "workingResolution": {
+                "maxSide": app.config["WORKING_MAX_SIDE"],
+                "maxPixels": app.config["WORKING_MAX_PIXELS"],
+            },
+            "maxUploadBytes": app.config["MAX_CONTENT_LENGTH"],
+            "maxImagePixels": app.config["MAX_IMAGE_PIXELS"],
+            "formats": sorted(ALLOWED_EXTENSIONS),
+        }
+    )
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return response
+
+
+@app.route("/api/palette-cache/stats", methods=["GET"])
+def palette_cache_stats():
+    """Hit rate and audited false-match Delta E of the near-duplicate cache."""
+    return jsonify(palette_cache.stats())
+
+
+@app.route("/api/admission/stats", methods=["GET"])
+def admission_stats():
+    """Load, current quality tier and per-tier counts of adaptive extraction."""
+    return jsonify(admission.stats())
+
+
+def require_profile_access(view):
+    """Restrict a view to clients allowed to profile (see profiling_allowed)."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not profiling_allowed():
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+@app.route("/api/profiles/slow", methods=["GET"])
+@require_profile_access
+def slow_requests():
+    """The slowest requests seen so far, with image size, params and profile id."""
+    return jsonify({"requests": profile_store.slow_requests()})
+
+
+@app.route("/api/profiles/<profile_id>", methods=["GET"])
+@require_profile_access
+def get_profile(profile_id):
+    """Render a stored profile as html, speedscope (flamegraph JSON) or text."""
+    report_format = request.args.get("format", "html")
+    if report_format not in REPORT_FORMATS:
+        return jsonify({"error": "Invalid format"}), 400
+    report, content_type = profile_store.render(profile_id, report_format)
+    if report is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(report, content_type=content_type)
+
+
+@app.route("/api/analyze-batch", methods=["POST"])
+@profiled
+@adaptive_quality
+def analyze_batch():
+    """Analyze several uploaded images ("images" field) in one request.
+
+    With ?stream=1 or Accept: application/x-ndjson each image's result is
+    sent as its own line as soon as it is ready.
+    """
+    files = request.files.getlist("images")
+    if not files:
+        return jsonify({"error": "No images provided"}), 400
+
+    try:
+        num_colors = parse_num_colors(request.form.get("num_colors"))
+    except ValueError:
+        return jsonify({"error": "Invalid num_colors"}), 400
+
+    format_colors = to_columnar if wants_columnar() else list
+    quality = g.quality
+
+    # The request closes its files when the view returns, before a streamed
+    # response is generated, so the generator takes the upload streams over
+    # (large uploads are spooled to disk) and closes each one once it is read
+    uploads = [FileStorage(f.stream, f.filename) for f in files]
+    for image_file in files:
+        image_file.stream = io.BytesIO()
+
+    def analyze_files():
+        try:
+            for index, image_file in enumerate(uploads):
+                result = {"index": index, "filename": image_file.filename}
+                if image_file.filename == "" or not allowed_file(image_file.filename):
+                    result["error"] = "File type not allowed"
+                    yield result
+                    continue
+                try:
+                    img = process_image(
+                        image_file, max_pixels=app.config["MAX_IMAGE_PIXELS"]
+                    )
+                    result["height"], result["width"] = img.shape[:2]
+                    result["dominantColors"] = format_colors(
+                        extract_dominant_colors(
+                            img, num_colors=num_colors, quality=quality
+                        )
+                    )
+                except UnidentifiedImageError:
+                    result["error"] = "Invalid image file"
+                except Exception as e:
+                    result["error"] = str(e)
+                finally:
+                    image_file.close()
+                yield result
+        finally:
+            for image_file in uploads:
+                image_file.close()
+
+    if wants_stream():
+        return ndjson_response(analyze_files())
+    return jsonify({"results": list(analyze_files())})
+
+
+@app.route("/api/extract-colors", methods=["POST"])
+def extract_colors_from_url():
+    """Extract dominant colors from an image URL ({"imageUrl": ..., "numColors"})."""
+    data = request.get_json(silent=True) or {}
+    image_url = data.get("imageUrl")
+    if not image_url:
+        return jsonify({"error": "No image URL provided"}), 400
+
+    try:
+        num_colors = parse_num_colors(data.get("numColors"))
+        image_data = fetch_image_url(
+            image_url,
+            app.config["MAX_CONTENT_LENGTH"],
+            allow_private=app.config["ALLOW_PRIVATE_IMAGE_URLS"],
+        )
+        info = probe_image(image_data)
+        # Only decoding and extraction count as load, not the download
+        with admission.admit() as quality:
+            img = process_image(image_data, max_pixels=app.config["MAX_IMAGE_PIXELS"])
+            dominant_colors = extract_dominant_colors(
+                img, num_colors=num_colors, quality=quality
+            )
+    except ImageTooLargeError:
+        raise
+    except (ValueError, OSError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {
+            "colors": (
+                to_columnar(dominant_colors) if wants_columnar() else dominant_colors
+            ),
+            "width": info["width"],
+            "height": info["height"],
+        }
+    )
+
+
 @app.route("/api/analyze-color", methods=["POST"])
 def analyze_color():
     data = request.json
@@ -117,5 +869,340 @@ def color_distance_api():
     return jsonify(distance_metrics)
 
 
+def immutable_json(key, compute):
+    """
+    Long-lived JSON response with a strong ETag derived from the URL
+
+    The ETag is known before the body, so a matching If-None-Match gets a
+    304 without calling compute.
+    """
+    etag = f"{COLOR_RESPONSE_VERSION}-{key}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(compute())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = (
+        f"public, max-age={COLOR_RESPONSE_MAX_AGE}, immutable"
+    )
+    return response
+
+
+@app.route("/api/colors/<color>", methods=["GET"])
+def color_info(color):
+    """Cacheable GET form of /api/analyze-color, e.g. /api/colors/ff8800."""
+    try:
+        canonical = normalize_hex(color)[1:]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if color != canonical:
+        return redirect(url_for("color_info", color=canonical), 301)
+
+    return immutable_json(
+        f"color-{canonical}",
+        lambda: {
+            "color_name": classify_color("#" + canonical),
+            "complementary_colors": get_complementary_colors("#" + canonical),
+        },
+    )
+
+
+@app.route("/api/distance/<color1>/<color2>", methods=["GET"])
+def color_distance_get(color1, color2):
+    """Cacheable GET form of /api/color-distance, e.g. /api/distance/ff0000/00ff00."""
+    try:
+        canonical1 = normalize_hex(color1)[1:]
+        canonical2 = normalize_hex(color2)[1:]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if (color1, color2) != (canonical1, canonical2):
+        return redirect(
+            url_for("color_distance_get", color1=canonical1, color2=canonical2), 301
+        )
+
+    return immutable_json(
+        f"distance-{canonical1}-{canonical2}",
+        lambda: calculate_color_distance("#" + canonical1, "#" + canonical2),
+    )
+
+
+@app.route("/api/harmony", methods=["POST"])
+def harmony_api():
+    """
+    Color harmonies for a whole palette in one request
+
+    Takes a JSON body with "palette" (hex strings, RGB lists or color dicts)
+    and optional "schemes" (default: all of HARMONY_SCHEMES). Each scheme
+    maps to one list of hex colors per palette color; the columnar format
+    adds the RGB values as (colors, scheme size, 3) arrays.
+    """
+    data = request.get_json(silent=True) or {}
+    colors = data.get("palette")
+    if not colors:
+        return jsonify({"error": "No palette provided"}), 400
+
+    try:
+        # Harmonies depend on the colors only, so weights are not parsed
+        rgb = palette_rgb(colors)
+        schemes = harmony_schemes(rgb, data.get("schemes") or HARMONY_SCHEMES)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_columnar():
+        result = {
+            name: {"hex": rgb_to_hex_array(scheme), "rgb": scheme}
+            for name, scheme in schemes.items()
+        }
+        palette = {"hex": rgb_to_hex_array(rgb), "rgb": rgb}
+    else:
+        result = {
+            name: rgb_to_hex_array(scheme).tolist() for name, scheme in schemes.items()
+        }
+        palette = rgb_to_hex_array(rgb).tolist()
+
+    return jsonify({"palette": palette, "schemes": result})
+
+
+@app.route("/api/palette-distance", methods=["POST"])
+def palette_distance_api():
+    """Distance matrix between two palettes, streamed row by row on request."""
+    data = request.get_json(silent=True)
+
+    if not data or "palette1" not in data or "palette2" not in data:
+        return jsonify({"error": "Missing palette data"}), 400
+
+    palette1 = data["palette1"]
+    palette2 = data["palette2"]
+
+    def distance_rows():
+        for index, color1 in enumerate(palette1):
+            yield {
+                "row": index,
+                "color": color1,
+                "distances": [
+                    calculate_color_distance(color1, color2) for color2 in palette2
+                ],
+            }
+
+    if wants_stream():
+        return ndjson_response(distance_rows())
+    return jsonify({"matrix": list(distance_rows())})
+
+
+@app.route("/api/palette-index", methods=["POST"])
+def add_to_palette_index():
+    """Extract an uploaded image's palette and store it in the search index."""
+    if "image" not in request.files:
+        return jsonify({"error": "No image provided"}), 400
+
+    image_file = request.files["image"]
+    if image_file.filename == "" or not allowed_file(image_file.filename):
+        return jsonify({"error": "File type not allowed"}), 400
+
+    palette_id = request.form.get("id") or image_file.filename
+    # Indexed palettes are kept, so they are always extracted at full
+    # quality; the admission controller still counts and limits the load
+    with admission.admit():
+        dominant_colors = extract_dominant_colors(
+            process_image(image_file, max_pixels=app.config["MAX_IMAGE_PIXELS"])
+        )
+
+    palette_index.add(palette_id, dominant_colors)
+
+    return jsonify(
+        {
+            "id": palette_id,
+            "dominant_colors": dominant_colors,
+            "size": len(palette_index),
+        }
+    )
+
+
+@app.route("/api/search-by-palette", methods=["POST"])
+def search_by_palette():
+    """Find indexed images whose palette is similar to a query.
+
+    The query is either an uploaded image ("image" field) or a JSON body with
+    "colors" (hex strings or color dicts with optional "percentage").
+    """
+    if "image" in request.files:
+        image_file = request.files["image"]
+        if image_file.filename == "" or not allowed_file(image_file.filename):
+            return jsonify({"error": "File type not allowed"}), 400
+        with admission.admit() as quality:
+            colors = extract_dominant_colors(
+                process_image(image_file, max_pixels=app.config["MAX_IMAGE_PIXELS"]),
+                quality=quality,
+            )
+        options = request.form
+    else:
+        options = request.get_json(silent=True) or {}
+        colors = options.get("colors")
+        if not colors:
+            return jsonify({"error": "No colors provided"}), 400
+
+    metric = options.get("metric", "delta_e")
+
+    try:
+        top_k = int(options.get("top_k", 10))
+        results = palette_index.search(colors, top_k=top_k, metric=metric)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"query": colors, "metric": metric, "results": results})
+
+
+@app.route("/api/match-palette", methods=["POST"])
+def match_palette_api():
+    """
+    Match a palette against a reference palette in one request
+
+    The palette is an uploaded image ("image" field) or a JSON body with
+    "palette" (hex strings or color dicts with optional "percentage"). The
+    reference palette is given as "reference" and is stored under
+    "reference_id" when one is given; later requests may send only the id.
+    Multipart requests pass "reference" as a JSON string.
+    """
+    if "image" in request.files:
+        image_file = request.files["image"]
+        if image_file.filename == "" or not allowed_file(image_file.filename):
+            return jsonify({"error": "File type not allowed"}), 400
+        options = request.form
+        try:
+            num_colors = parse_num_colors(options.get("num_colors"))
+            reference_colors = loads(options.get("reference") or "null")
+        except ValueError:
+            return jsonify({"error": "Invalid num_colors or reference"}), 400
+        with admission.admit() as quality:
+            colors = extract_dominant_colors(
+                process_image(image_file, max_pixels=app.config["MAX_IMAGE_PIXELS"]),
+                num_colors=num_colors,
+                quality=quality,
+            )
+    else:
+        options = request.get_json(silent=True) or {}
+        colors = options.get("palette")
+        reference_colors = options.get("reference")
+        if not colors:
+            return jsonify({"error": "No palette provided"}), 400
+
+    reference_id = options.get("reference_id")
+    try:
+        if reference_colors:
+            if reference_id:
+                reference = reference_palettes.put(reference_id, reference_colors)
+            else:
+                reference = ReferencePalette(reference_colors)
+        elif reference_id:
+            reference = reference_palettes.get(reference_id)
+            if reference is None:
+                return jsonify({"error": "Unknown reference_id"}), 404
+        else:
+            return jsonify({"error": "No reference palette provided"}), 400
+
+        result = match_palette(
+            colors,
+            reference,
+            return_matrix=str(options.get("matrix", "")).lower() in ("1", "true"),
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {
+            "palette": colors,
+            "reference_id": reference_id,
+            "reference": reference.hex,
+            **result,
+        }
+    )
+
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """Submit images for asynchronous palette extraction.
+
+    Accepts either multipart uploads in the "images" field or a JSON body
+    with a list of server-side "paths" under JOBS_INPUT_ROOT.
+    """
+    sources = []
+
+    if request.files:
+        num_colors_value = request.form.get("num_colors")
+        for image_file in request.files.getlist("images"):
+            if image_file.filename == "" or not allowed_file(image_file.filename):
+                return jsonify({"error": "File type not allowed"}), 400
+            sources.append(get_job_queue().store_upload(image_file))
+    else:
+        data = request.get_json(silent=True) or {}
+        num_colors_value = data.get("num_colors")
+        for path in data.get("paths", []):
+            real_path = os.path.realpath(path)
+            if os.path.commonpath(
+                [real_path, app.config["JOBS_INPUT_ROOT"]]
+            ) != app.config["JOBS_INPUT_ROOT"] or not os.path.isfile(real_path):
+                return jsonify({"error": f"Invalid path: {path}"}), 400
+            if not allowed_file(real_path):
+                return jsonify({"error": "File type not allowed"}), 400
+            sources.append(real_path)
+
+    if not sources:
+        return jsonify({"error": "No images provided"}), 400
+
+    try:
+        num_colors = parse_num_colors(
+            None if num_colors_value is None else str(num_colors_value)
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid num_colors"}), 400
+
+    job = get_job_queue().submit(sources, num_colors=num_colors)
+
+    return jsonify(job), 202
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = get_job_queue().get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route("/api/jobs/<job_id>/results", methods=["GET"])
+def get_job_results(job_id):
+    job = get_job_queue().get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    offset = request.args.get("offset", 0, type=int)
+    columnar = wants_columnar()
+
+    def format_result(result):
+        if columnar and "dominant_colors" in result:
+            result["dominant_colors"] = to_columnar(result["dominant_colors"])
+        return result
+
+    if wants_stream():
+        return ndjson_response(
+            map(format_result, get_job_queue().iter_results(job_id, offset=offset))
+        )
+
+    limit = min(request.args.get("limit", 100, type=int), 1000)
+    results = [
+        format_result(result)
+        for result in get_job_queue().get_results(job_id, offset=offset, limit=limit)
+    ]
+
+    return jsonify(
+        {
+            "job": job,
+            "results": results,
+            "offset": offset,
+            "nextOffset": offset + len(results) if len(results) == limit else None,
+        }
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,630 @@
+"""
+ASGI entry point for serving the API with uvicorn.
+
+Usage (from the backend directory):
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Request bodies and image URLs are received asynchronously, so slow clients
+only hold an open connection rather than a worker. Decoding and extraction
+run in a bounded thread pool. The upload and URL endpoints are implemented
+here; every other route is served by the Flask app in app.py.
+"""
+
+import asyncio
+import functools
+import io
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager
+from urllib.parse import urljoin
+import httpx
+from a2wsgi import WSGIMiddleware
+from PIL import UnidentifiedImageError
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from app import (
+    admission,
+    app as flask_app,
+    decode_upload,
+    palette_cache,
+    palette_cache_params,
+    parse_num_colors,
+    pixel_selection_options,
+    profile_store,
+    upload_error,
+)
+from ml.color_extractor import extract_dominant_colors, iter_progressive_palettes
+from utils.admission import OverloadedError
+from utils.image_processor import (
+    URL_FETCH_TIMEOUT,
+    URL_MAX_REDIRECTS,
+    ImageTooLargeError,
+    allowed_file,
+    decode_reduction,
+    fit_pixel_selection,
+    probe_image,
+    process_image,
+    validate_image_url,
+)
+from utils.perceptual_hash import image_signature
+from utils.serialization import COLUMNAR_MEDIA_TYPE, dumps, to_columnar
+
+MAX_CONTENT_LENGTH = flask_app.config["MAX_CONTENT_LENGTH"]
+MAX_IMAGE_PIXELS = flask_app.config["MAX_IMAGE_PIXELS"]
+
+# Threads for decoding and extraction; requests beyond this wait their turn
+CPU_WORKERS = int(os.environ.get("ASGI_CPU_WORKERS", os.cpu_count() or 1))
+executor = ThreadPoolExecutor(CPU_WORKERS, thread_name_prefix="extract")
+
+# Routes not implemented here, and profiled requests, are served by Flask
+flask_wsgi = WSGIMiddleware(flask_app)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with the orjson-backed serializer."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def error(message, status_code=400):
+    return FastJSONResponse({"error": message}, status_code=status_code)
+
+
+def run_cpu(function, *args, **kwargs):
+    """Run CPU-heavy work in the extraction thread pool."""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(executor, lambda: function(*args, **kwargs))
+
+
+def wants_stream(request):
+    request.state.accept_negotiated = True
+    if request.query_params.get("stream") in ("1", "true", "ndjson"):
+        return True
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+def wants_columnar(request):
+    request.state.accept_negotiated = True
+    if request.query_params.get("format") == "columnar":
+        return True
+    return COLUMNAR_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(items):
+    """Stream an async iterable of JSON-serializable items, one per line."""
+
+    async def generate():
+        async for item in items:
+            yield dumps(item) + b"\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+
+
+def profiled(endpoint):
+    """
+    Log a route's requests in the slow-request log, and serve those that ask
+    for a profile (?profile= or X-Profile) with the Flask view instead
+
+    Extraction runs in the thread pool, which the per-thread profilers cannot
+    follow, so profiles come from the Flask app, which also checks the
+    profiling token. Other requests are logged without a profile; streamed
+    responses are timed until their last line is sent. Routes can add
+    details for the log, such as the image size, to
+    request.state.profile_details.
+    """
+
+    @functools.wraps(endpoint)
+    async def wrapper(request):
+        requested = request.query_params.get("profile") or request.headers.get(
+            "x-profile"
+        )
+        if requested not in (None, "", "0", "false"):
+            # The body has not been read yet, so the WSGI app can serve the
+            # request as its response
+            return flask_wsgi
+
+        request.state.profile_details = {}
+        start = time.perf_counter()
+        response = await endpoint(request)
+
+        form = await request.form()
+        content_length = request.headers.get("content-length")
+        details = {
+            "path": request.url.path,
+            "time": time.time(),
+            "status": response.status_code,
+            "bytes": int(content_length) if content_length else None,
+            "params": {
+                key: value for key, value in form.items() if isinstance(value, str)
+            },
+            "quality": response.headers.get("x-quality-tier"),
+        }
+        details.update(request.state.profile_details)
+
+        def finish():
+            profile_store.record(time.perf_counter() - start, details)
+
+        if isinstance(response, StreamingResponse):
+            body = response.body_iterator
+
+            async def timed_body():
+                try:
+                    async for chunk in body:
+                        yield chunk
+                finally:
+                    finish()
+
+            response.body_iterator = timed_body()
+        else:
+            finish()
+        return response
+
+    return wrapper
+
+
+async def iterate_in_executor(iterator):
+    """Advance a CPU-bound iterator in the thread pool, one item at a time."""
+    done = object()
+    while True:
+        item = await run_cpu(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+class BodySizeLimitMiddleware:
+    """Reject request bodies larger than max_bytes, including chunked ones."""
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and int(content_length) > self.max_bytes:
+            response = error("Request body too large", 413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(413, "Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class VaryAcceptMiddleware:
+    """Mark responses whose format was negotiated from the Accept header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def vary_send(message):
+            if message["type"] == "http.response.start" and scope.get("state", {}).get(
+                "accept_negotiated"
+            ):
+                MutableHeaders(scope=message).add_vary_header("Accept")
+            await send(message)
+
+        await self.app(scope, receive, vary_send)
+
+
+async def read_upload_form(request):
+    """
+    Receive a multipart form and the bytes of its image and mask files
+
+    Returns:
+        tuple: (form, image filename, image bytes, mask bytes)
+    """
+    form = await request.form()
+    image_file = form.get("image")
+    filename = getattr(image_file, "filename", None)
+    data = await image_file.read() if filename else None
+
+    mask_file = form.get("mask")
+    mask_data = None
+    if getattr(mask_file, "filename", None):
+        mask_data = await mask_file.read()
+
+    return form, filename, data, mask_data
+
+
+def validate_upload(filename):
+    """Return an error response for a missing or disallowed upload, else None."""
+    message = upload_error(filename)
+    return None if message is None else error(message)
+
+
+def extract_with_cache(img, num_colors, selection_options, quality="full"):
+    """
+    Extract a palette at a quality tier, reusing the palette of a
+    near-duplicate image
+
+    Returns:
+        tuple: (colors, automatic selection details or None, image hash or
+        None, cache info or None)
+    """
+    selections = []
+
+    def compute():
+        colors, selection = extract_dominant_colors(
+            img,
+            num_colors=num_colors,
+            return_selection=True,
+            quality=quality,
+            **selection_options,
+        )
+        selections.append(selection)
+        return colors
+
+    params = palette_cache_params(num_colors, selection_options, quality)
+    if params is None:
+        return compute(), selections[0], None, None
+    # Decoded uploads are BGR with three channels and RGBA with four
+    image_hash, color = image_signature(img, bgr=img.ndim == 3 and img.shape[2] == 3)
+    colors, cache_info = palette_cache.get_or_compute(
+        image_hash, params, compute, color=color
+    )
+    # Cached palettes carry no selection details
+    selection = selections[0] if selections and not cache_info["hit"] else None
+    return colors, selection, image_hash, cache_info
+
+
+@profiled
+async def upload_image(request):
+    form, filename, data, mask_data = await read_upload_form(request)
+    invalid = validate_upload(filename)
+    if invalid is not None:
+        return invalid
+
+    try:
+        num_colors = parse_num_colors(form.get("num_colors"))
+    except ValueError:
+        return error("Invalid num_colors")
+
+    try:
+        selection_options = await run_cpu(pixel_selection_options, form, mask_data)
+    except (ValueError, OSError) as e:
+        return error(str(e))
+
+    try:
+        img, selection_options = await run_cpu(
+            decode_upload, io.BytesIO(data), selection_options, MAX_IMAGE_PIXELS
+        )
+    except ImageTooLargeError:
+        raise
+    except ValueError as e:
+        return error(str(e))
+    request.state.profile_details["imageSize"] = [img.shape[1], img.shape[0]]
+
+    format_colors = to_columnar if wants_columnar(request) else list
+
+    # Progressive mode: stream a coarse palette first, then refinements
+    if form.get("progressive") in ("1", "true"):
+        deadline = float(form.get("deadline_ms") or 1000) / 1000
+        updates = iter_progressive_palettes(
+            img, num_colors=num_colors, deadline=deadline, **selection_options
+        )
+
+        # Extraction runs while the response is sent, so the stream holds
+        # its admission slot until it ends
+        admitted = ExitStack()
+        quality = admitted.enter_context(admission.admit())
+
+        # The first stage runs before the response starts, so its errors
+        # are reported with a status code instead of cutting the stream
+        try:
+            first = await run_cpu(next, updates)
+        except ValueError as e:
+            admitted.close()
+            return error(str(e))
+        except BaseException:
+            admitted.close()
+            raise
+        updates = itertools.chain([first], updates)
+
+        async def progressive_updates():
+            try:
+                async for update in iterate_in_executor(updates):
+                    yield {
+                        "stage": update["stage"],
+                        "size": update["size"],
+                        "dominant_colors": format_colors(update["colors"]),
+                        "shift": update["shift"],
+                        "converged": update["converged"],
+                        "final": update["final"],
+                        "elapsed_ms": update["elapsed_ms"],
+                    }
+            finally:
+                admitted.close()
+
+        response = ndjson_response(progressive_updates())
+        response.headers["X-Quality-Tier"] = quality
+        return response
+
+    # The body has been received, so only extraction counts as load
+    with admission.admit() as quality:
+        try:
+            colors, _, image_hash, cache_info = await run_cpu(
+                extract_with_cache, img, num_colors, selection_options, quality
+            )
+        except ValueError as e:
+            return error(str(e))
+
+    response = {"dominant_colors": format_colors(colors), "quality": quality}
+    if cache_info is not None:
+        response["phash"] = f"{image_hash:016x}"
+        response["cache"] = cache_info
+    return FastJSONResponse(response, headers={"X-Quality-Tier": quality})
+
+
+@profiled
+async def analyze_image(request):
+    form, filename, data, mask_data = await read_upload_form(request)
+    invalid = validate_upload(filename)
+    if invalid is not None:
+        return invalid
+
+    try:
+        num_colors = parse_num_colors(form.get("num_colors"))
+    except ValueError:
+        return error("Invalid num_colors")
+
+    try:
+        selection_options = await run_cpu(pixel_selection_options, form, mask_data)
+    except (ValueError, OSError) as e:
+        return error(str(e))
+
+    # Check dimensions from the header before anything is decoded; images
+    # over MAX_IMAGE_PIXELS that cannot be read reduced are refused
+    try:
+        info = probe_image(io.BytesIO(data))
+    except OSError:
+        return error("Invalid image file")
+    decode_reduction(info, MAX_IMAGE_PIXELS)
+    request.state.profile_details["imageSize"] = [info["width"], info["height"]]
+
+    def analyze(quality):
+        img = process_image(io.BytesIO(data), max_pixels=MAX_IMAGE_PIXELS)
+        # Large JPEGs are decoded reduced, so the mask and rect are scaled
+        # to match
+        options = fit_pixel_selection(selection_options, info, img.shape)
+        return extract_with_cache(img, num_colors, options, quality)
+
+    with admission.admit() as quality:
+        try:
+            colors, selection, image_hash, cache_info = await run_cpu(analyze, quality)
+        except ImageTooLargeError as e:
+            return error(str(e), 413)
+        except ValueError as e:
+            return error(str(e))
+        except Exception as e:
+            return error(str(e), 500)
+
+    response = {
+        "dominantColors": to_columnar(colors) if wants_columnar(request) else colors,
+        "width": info["width"],
+        "height": info["height"],
+        "numColors": len(colors),
+        "quality": quality,
+    }
+    if cache_info is not None:
+        response["phash"] = f"{image_hash:016x}"
+        response["cache"] = cache_info
+    if selection is not None:
+        response["autoSelection"] = {
+            "selectedK": selection["num_colors"],
+            "timeMs": selection["elapsed_ms"],
+            "reason": selection["reason"],
+            "candidatesEvaluated": selection["candidates_evaluated"],
+        }
+    return FastJSONResponse(response, headers={"X-Quality-Tier": quality})
+
+
+@profiled
+async def analyze_batch(request):
+    form = await request.form()
+    files = [item for item in form.getlist("images") if hasattr(item, "filename")]
+    if not files:
+        return error("No images provided")
+
+    try:
+        num_colors = parse_num_colors(form.get("num_colors"))
+    except ValueError:
+        return error("Invalid num_colors")
+
+    format_colors = to_columnar if wants_columnar(request) else list
+
+    # The batch is admitted as one request; streamed batches hold the slot
+    # until the stream ends
+    admitted = ExitStack()
+    quality = admitted.enter_context(admission.admit())
+
+    def analyze_file(index, image_file):
+        filename = image_file.filename
+        result = {"index": index, "filename": filename}
+        if filename == "" or not allowed_file(filename):
+            result["error"] = "File type not allowed"
+            return result
+        try:
+            # Only the file being analyzed is read into memory
+            img = process_image(image_file.file, max_pixels=MAX_IMAGE_PIXELS)
+            result["height"], result["width"] = img.shape[:2]
+            result["dominantColors"] = format_colors(
+                extract_dominant_colors(img, num_colors=num_colors, quality=quality)
+            )
+        except UnidentifiedImageError:
+            result["error"] = "Invalid image file"
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    async def analyze_files():
+        try:
+            for index, image_file in enumerate(files):
+                yield await run_cpu(analyze_file, index, image_file)
+        finally:
+            admitted.close()
+
+    if wants_stream(request):
+        response = ndjson_response(analyze_files())
+        response.headers["X-Quality-Tier"] = quality
+        return response
+    return FastJSONResponse(
+        {"results": [result async for result in analyze_files()]},
+        headers={"X-Quality-Tier": quality},
+    )
+
+
+async def fetch_image_url(client, url, max_bytes, allow_private=False):
+    """Download an image URL without blocking the event loop (see
+    utils.image_processor.fetch_image_url)."""
+    try:
+        for _ in range(URL_MAX_REDIRECTS + 1):
+            # Resolving the host is blocking, so it runs in a thread
+            await run_in_threadpool(validate_image_url, url, allow_private)
+            request = client.build_request("GET", url)
+            response = await client.send(request, stream=True)
+            if not response.is_redirect:
+                break
+            await response.aclose()
+            url = urljoin(url, response.headers["location"])
+        else:
+            raise ValueError("Image URL redirected too many times")
+
+        try:
+            response.raise_for_status()
+            data = io.BytesIO()
+            async for chunk in response.aiter_bytes():
+                data.write(chunk)
+                if data.tell() > max_bytes:
+                    raise ImageTooLargeError("Image download exceeds the size limit")
+        finally:
+            await response.aclose()
+    except httpx.HTTPError as e:
+        raise ValueError(f"Could not fetch image URL: {e}")
+    data.seek(0)
+    return data
+
+
+async def extract_colors_from_url(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    image_url = data.get("imageUrl") if isinstance(data, dict) else None
+    if not image_url:
+        return error("No image URL provided")
+
+    try:
+        num_colors = parse_num_colors(data.get("numColors"))
+        image_data = await fetch_image_url(
+            request.app.state.http_client,
+            image_url,
+            MAX_CONTENT_LENGTH,
+            allow_private=flask_app.config["ALLOW_PRIVATE_IMAGE_URLS"],
+        )
+        info = probe_image(image_data)
+        # Only decoding and extraction count as load, not the download
+        with admission.admit() as quality:
+            img = await run_cpu(process_image, image_data, max_pixels=MAX_IMAGE_PIXELS)
+            colors = await run_cpu(
+                extract_dominant_colors, img, num_colors=num_colors, quality=quality
+            )
+    except ImageTooLargeError:
+        raise
+    except (ValueError, OSError) as e:
+        return error(str(e))
+
+    return FastJSONResponse(
+        {
+            "colors": to_columnar(colors) if wants_columnar(request) else colors,
+            "width": info["width"],
+            "height": info["height"],
+        }
+    )
+
+
+async def image_too_large(request, exc):
+    return error(str(exc), 413)
+
+
+async def unidentified_image(request, exc):
+    return error("Invalid image file")
+
+
+async def overloaded(request, exc):
+    response = error(str(exc), 503)
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+async def http_exception(request, exc):
+    return error(exc.detail, exc.status_code)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    async with httpx.AsyncClient(
+        timeout=URL_FETCH_TIMEOUT, follow_redirects=False
+    ) as client:
+        app.state.http_client = client
+        yield
+    executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route("/api/upload", upload_image, methods=["POST"]),
+        Route("/api/analyze", analyze_image, methods=["POST"]),
+        Route("/api/analyze-batch", analyze_batch, methods=["POST"]),
+        Route("/api/extract-colors", extract_colors_from_url, methods=["POST"]),
+        # Everything else is served by the Flask app in a thread
+        Mount("/", flask_wsgi),
+    ],
+    # Same open CORS policy as flask_cors.CORS(app)
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_methods=["*"],
+            allow_headers=["*"],
+        ),
+        Middleware(VaryAcceptMiddleware),
+    ],
+    exception_handlers={
+        ImageTooLargeError: image_too_large,
+        UnidentifiedImageError: unidentified_image,
+        OverloadedError: overloaded,
+        HTTPException: http_exception,
+    },
+    lifespan=lifespan,
+)
+app = BodySizeLimitMiddleware(app, MAX_CONTENT_LENGTH)
@@ -0,0 +1,82 @@
+"""
+Benchmark ColorClassifier inference throughput (colors/second).
+
+Compares one-color-per-call against batched prediction for the Keras model
+and the exported NumPy weights. Requires TensorFlow for the Keras rows.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_color_classifier.py --colors 10000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path[:0] = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+]
+
+from ml.color_classifier import ColorClassifier  # noqa: E402
+
+
+def colors_per_second(predict, colors, single):
+    start = time.perf_counter()
+    if single:
+        for color in colors:
+            predict([color])
+    else:
+        predict(colors)
+    return len(colors) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--colors", type=int, default=10000)
+    parser.add_argument(
+        "--single", type=int, default=200, help="Colors timed one by one"
+    )
+    parser.add_argument("--epochs", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    colors = rng.integers(0, 256, size=(args.colors, 3))
+
+    keras = ColorClassifier(weights_path=None)
+    keras.train(epochs=args.epochs)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "weights.npz")
+        keras.export_weights(path)
+        numpy_classifier = ColorClassifier(weights_path=path)
+
+    # Force the Keras path by hiding the NumPy weights
+    keras.weights = None
+
+    agreement = np.mean(
+        [
+            a["name"] == b["name"]
+            for a, b in zip(
+                keras.predict_color_names(colors),
+                numpy_classifier.predict_color_names(colors),
+            )
+        ]
+    )
+
+    rows = [
+        ("keras single", keras.predict_color_names, colors[: args.single], True),
+        ("keras batched", keras.predict_color_names, colors, False),
+        ("numpy single", numpy_classifier.predict_color_names, colors, True),
+        ("numpy batched", numpy_classifier.predict_color_names, colors, False),
+    ]
+    print(f"{'path':<16} {'colors/s':>14}")
+    for name, predict, subset, single in rows:
+        print(f"{name:<16} {colors_per_second(predict, subset, single):>14,.0f}")
+    print(f"Keras/NumPy label agreement: {agreement:.4f}")
+
+
+if __name__ == "__main__":
+    main()
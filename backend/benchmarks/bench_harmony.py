@@ -0,0 +1,108 @@
+"""
+Benchmark palette-wide color harmonies against the per-color path.
+
+For palettes of increasing size, compares harmony_schemes (all schemes for
+all colors in one NumPy pass, hex codes included) with one
+get_complementary_colors call per color and scheme, and with a scalar
+colorsys implementation. Also reports the largest channel difference from
+colorsys.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_harmony.py --sizes 5 100 10000
+"""
+
+import argparse
+import colorsys
+import os
+import sys
+import time
+import numpy as np
+
+sys.path[:0] = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+]
+
+from backend.utils.color_utils import rgb_to_hex  # noqa: E402
+from ml.complementary_colors import get_complementary_colors  # noqa: E402
+from ml.harmony import (  # noqa: E402
+    HARMONY_OFFSETS,
+    harmony_schemes,
+    rgb_to_hex_array,
+)
+
+
+def vectorized(palette):
+    return {
+        name: rgb_to_hex_array(scheme).tolist()
+        for name, scheme in harmony_schemes(palette).items()
+    }
+
+
+def per_color(palette):
+    hex_colors = [rgb_to_hex(*color) for color in palette.tolist()]
+    return {
+        name: [get_complementary_colors(color, name) for color in hex_colors]
+        for name in HARMONY_OFFSETS
+    }
+
+
+def scalar_colorsys(palette):
+    result = {name: [] for name in HARMONY_OFFSETS}
+    for r, g, b in palette.tolist():
+        hue, lightness, saturation = colorsys.rgb_to_hls(r / 255, g / 255, b / 255)
+        for name, offsets in HARMONY_OFFSETS.items():
+            colors = []
+            for offset in offsets:
+                rotated = colorsys.hls_to_rgb(
+                    (hue + offset / 360) % 1, lightness, saturation
+                )
+                colors.append(rgb_to_hex(*(round(value * 255) for value in rotated)))
+            result[name].append(colors)
+    return result
+
+
+def channel_difference(result, reference):
+    worst = 0
+    for name in HARMONY_OFFSETS:
+        for colors, expected in zip(result[name], reference[name]):
+            for color, other in zip(colors, expected):
+                a = np.array([int(color[i : i + 2], 16) for i in (1, 3, 5)])
+                b = np.array([int(other[i : i + 2], 16) for i in (1, 3, 5)])
+                worst = max(worst, int(np.abs(a - b).max()))
+    return worst
+
+
+def timed(function, palette, repeats):
+    function(palette)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = function(palette)
+    return result, (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 100, 10000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(
+        f"{'colors':>8} {'vectorized ms':>14} {'per-color ms':>13} "
+        f"{'colorsys ms':>12} {'speedup':>8} {'max diff':>9}"
+    )
+    for size in args.sizes:
+        palette = rng.integers(0, 256, size=(size, 3))
+        result, vector_time = timed(vectorized, palette, args.repeats)
+        _, per_color_time = timed(per_color, palette, args.repeats)
+        reference, scalar_time = timed(scalar_colorsys, palette, args.repeats)
+        print(
+            f"{size:>8} {vector_time * 1000:>14.3f} {per_color_time * 1000:>13.3f} "
+            f"{scalar_time * 1000:>12.3f} {per_color_time / vector_time:>7.0f}x "
+            f"{channel_difference(result, reference):>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
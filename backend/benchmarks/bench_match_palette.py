@@ -0,0 +1,111 @@
+"""
+Benchmark palette matching against a reference palette.
+
+Compares one /api/match-palette request (vectorized Delta E matrix plus a
+Hungarian assignment) with the per-pair path it replaces: N x M requests to
+/api/color-distance. Also times match_palette alone, with the reference
+palette converted per call and cached by id.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_match_palette.py --colors 8 --reference 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(BACKEND_DIR, ".."), BACKEND_DIR]
+
+
+def random_palette(rng, size, weighted=False):
+    colors = [
+        "#" + "".join(f"{value:02x}" for value in rgb)
+        for rgb in rng.integers(0, 256, size=(size, 3))
+    ]
+    if not weighted:
+        return colors
+    weights = rng.dirichlet(np.ones(size)) * 100
+    return [
+        {"hex": color, "percentage": float(weight)}
+        for color, weight in zip(colors, weights)
+    ]
+
+
+def timed(function, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--colors", type=int, default=8)
+    parser.add_argument("--reference", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    # The app writes uploads and its job database to the working directory
+    os.chdir(tempfile.mkdtemp())
+    import app as app_module
+    from utils.palette_matching import (
+        ReferencePalette,
+        ReferencePaletteCache,
+        match_palette,
+    )
+
+    rng = np.random.default_rng(0)
+    palette = random_palette(rng, args.colors, weighted=True)
+    reference = random_palette(rng, args.reference)
+    client = app_module.app.test_client()
+
+    def per_pair_requests():
+        return [
+            [
+                client.post(
+                    "/api/color-distance",
+                    json={"color1": color["hex"], "color2": other},
+                ).json["deltaE76"]
+                for other in reference
+            ]
+            for color in palette
+        ]
+
+    def match_request():
+        return client.post(
+            "/api/match-palette",
+            json={"palette": palette, "reference_id": "brand", "matrix": True},
+        ).json
+
+    client.post(
+        "/api/match-palette",
+        json={"palette": palette, "reference": reference, "reference_id": "brand"},
+    )
+    per_pair, per_pair_time = timed(per_pair_requests, 1)
+    matched, match_time = timed(match_request, args.repeats)
+    difference = np.abs(np.array(per_pair) - np.array(matched["matrix"])).max()
+
+    cache = ReferencePaletteCache()
+    cache.put("brand", reference)
+    _, convert_time = timed(
+        lambda: match_palette(palette, ReferencePalette(reference)), args.repeats
+    )
+    _, cached_time = timed(
+        lambda: match_palette(palette, cache.get("brand")), args.repeats
+    )
+
+    pairs = args.colors * args.reference
+    print(f"{args.colors} colors x {args.reference} reference colors ({pairs} pairs)")
+    print(f"{pairs} /api/color-distance requests: {per_pair_time * 1000:>9.1f} ms")
+    print(f"1 /api/match-palette request:     {match_time * 1000:>9.2f} ms")
+    print(f"match_palette, reference per call: {convert_time * 1000:>8.3f} ms")
+    print(f"match_palette, cached reference:   {cached_time * 1000:>8.3f} ms")
+    print(f"max Delta E difference from the per-pair path: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark palette similarity search latency.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_palette_search.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path[:0] = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+]
+
+from utils.palette_index import PaletteIndex  # noqa: E402
+
+
+def random_palette(rng, num_colors=5):
+    rgb = rng.integers(0, 256, size=(num_colors, 3))
+    weights = rng.dirichlet(np.ones(num_colors)) * 100
+    return [
+        {"rgb": {"r": int(r), "g": int(g), "b": int(b)}, "percentage": float(w)}
+        for (r, g, b), w in zip(rgb, weights)
+    ]
+
+
+def time_queries(index, queries, **kwargs):
+    start = time.perf_counter()
+    results = [index.search(query, **kwargs) for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = [random_palette(rng) for _ in range(args.queries)]
+
+    print(
+        f"{'entries':>10} {'brute ms':>10} {'tree ms':>10} {'emd ms':>10} {'recall':>8}"
+    )
+    for size in args.sizes:
+        index = PaletteIndex()
+        for i in range(size):
+            index.add(i, random_palette(rng, int(rng.integers(2, 9))))
+
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            index = PaletteIndex.load(directory)
+
+            # Exhaustive vectorized scan over the memory-mapped arrays
+            index.brute_force_limit = size
+            brute_ms, exact = time_queries(index, queries, top_k=args.top_k)
+
+            # Ball tree shortlist + exact rerank (tree built outside the timing)
+            index.brute_force_limit = 0
+            index.search(queries[0])
+            tree_ms, approx = time_queries(index, queries, top_k=args.top_k)
+            emd_ms, _ = time_queries(index, queries[:5], top_k=args.top_k, metric="emd")
+
+        recall = np.mean(
+            [
+                len({r["id"] for r in a} & {r["id"] for r in e}) / len(e)
+                for a, e in zip(approx, exact)
+            ]
+        )
+        print(
+            f"{size:>10} {brute_ms:>10.2f} {tree_ms:>10.2f} {emd_ms:>10.2f} {recall:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
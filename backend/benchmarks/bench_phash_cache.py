@@ -0,0 +1,135 @@
+"""
+Benchmark near-duplicate palette reuse with perceptual hashes.
+
+Each synthetic image is extracted once, then resized and re-encoded copies
+are looked up in the cache. Reports the hit rate, the Delta E between reused
+and freshly extracted palettes, false matches against unrelated images and
+the lookup latency.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_phash_cache.py --images 50 --distractors 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path[:0] = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+]
+
+from ml.color_extractor import extract_dominant_colors  # noqa: E402
+from utils.perceptual_hash import (  # noqa: E402
+    PaletteHashCache,
+    image_signature,
+    palette_delta_e,
+)
+
+PARAMS = ("5", None, None)
+
+
+def synthetic_image(rng, size=480):
+    """Random blobs of flat color over a gradient, roughly like a product shot."""
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    base = rng.integers(0, 256, size=3)
+    image = (base * (0.6 + 0.4 * x[..., None] * y[..., None])).astype(np.uint8)
+    for _ in range(int(rng.integers(3, 8))):
+        center = tuple(int(v) for v in rng.integers(0, size, size=2))
+        radius = int(rng.integers(size // 10, size // 3))
+        color = tuple(int(v) for v in rng.integers(0, 256, size=3))
+        cv2.circle(image, center, radius, color, -1)
+    return image
+
+
+def variants(image):
+    """Resized and JPEG re-encoded copies of an image."""
+    height, width = image.shape[:2]
+    for scale in (1.0, 0.5, 0.25):
+        for quality in (90, 60, 30):
+            resized = cv2.resize(
+                image,
+                (int(width * scale), int(height * scale)),
+                interpolation=cv2.INTER_AREA,
+            )
+            _, data = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            yield f"{scale}x q{quality}", cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--distractors", type=int, default=100000)
+    parser.add_argument("--max-distance", type=int, default=6)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cache = PaletteHashCache(max_distance=args.max_distance, audit_rate=0)
+
+    # Unrelated hashes so lookups run against a realistically sized index
+    hash_rng = random.Random(0)
+    for i in range(args.distractors):
+        cache.add(hash_rng.getrandbits(64), ("distractor", i), [])
+
+    originals = [synthetic_image(rng) for _ in range(args.images)]
+    for image in originals:
+        palette = extract_dominant_colors(image, num_colors=5)
+        image_hash, color = image_signature(image, bgr=True)
+        cache.add(image_hash, PARAMS, palette, color)
+
+    hits = 0
+    lookups = 0
+    lookup_seconds = 0.0
+    delta_es = []
+    for image in originals:
+        for _, variant in variants(image):
+            image_hash, color = image_signature(variant, bgr=True)
+            start = time.perf_counter()
+            palette, _ = cache.lookup(image_hash, PARAMS, color)
+            lookup_seconds += time.perf_counter() - start
+            lookups += 1
+            if palette is not None:
+                hits += 1
+                fresh = extract_dominant_colors(variant, num_colors=5)
+                delta_es.append(palette_delta_e(palette, fresh))
+
+    # Recolored copies (channels rotated) keep much of the brightness
+    # structure, and so the hash, of the original but must not reuse its palette
+    recolored_matches = 0
+    for image in originals:
+        recolored = np.ascontiguousarray(image[:, :, [1, 2, 0]])
+        image_hash, color = image_signature(recolored, bgr=True)
+        palette, _ = cache.lookup(image_hash, PARAMS, color)
+        recolored_matches += palette is not None
+
+    # Unrelated images that should not match anything
+    false_matches = []
+    for _ in range(args.images):
+        image = synthetic_image(rng)
+        image_hash, color = image_signature(image, bgr=True)
+        palette, _ = cache.lookup(image_hash, PARAMS, color)
+        if palette is not None:
+            fresh = extract_dominant_colors(image, num_colors=5)
+            false_matches.append(palette_delta_e(palette, fresh))
+
+    print(f"index size:        {args.distractors + args.images}")
+    print(f"variant hit rate:  {hits / lookups:.1%} ({hits}/{lookups})")
+    print(f"lookup latency:    {lookup_seconds / lookups * 1e6:.1f} us")
+    if delta_es:
+        print(
+            f"reused palette dE: mean {np.mean(delta_es):.2f}, "
+            f"p95 {np.percentile(delta_es, 95):.2f}, max {np.max(delta_es):.2f}"
+        )
+    print(f"recolored matches: {recolored_matches}/{args.images}")
+    print(f"unrelated matches: {len(false_matches)}/{args.images}", end="")
+    if false_matches:
+        print(f" (mean dE {np.mean(false_matches):.2f})", end="")
+    print()
+
+
+if __name__ == "__main__":
+    main()
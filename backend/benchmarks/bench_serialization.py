@@ -0,0 +1,68 @@
+"""
+Benchmark palette response serialization time and payload size.
+
+Compares the standard library encoder used by Flask's default jsonify with
+the orjson-backed serializer, for the nested and the columnar palette format.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_serialization.py --counts 1 100 10000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path[:0] = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+]
+
+from ml.color_extractor import format_palette  # noqa: E402
+from utils.serialization import dumps, to_columnar  # noqa: E402
+
+
+def random_palette(rng, num_colors=5):
+    """A palette in the extract_dominant_colors format (NumPy percentages)."""
+    centers = rng.integers(0, 256, size=(num_colors, 3)).astype(np.float64)
+    labels = rng.integers(0, num_colors, size=1000)
+    return format_palette(centers, labels)
+
+
+def stdlib_dumps(obj):
+    # Flask's default provider: json.dumps with a fallback for other types
+    return json.dumps(obj, default=str).encode()
+
+
+def time_call(function, payload, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data = function(payload)
+    return (time.perf_counter() - start) / repeat * 1000, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--num-colors", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'palettes':>9} {'format':>9} {'encoder':>8} {'ms':>10} {'bytes':>12}")
+    for count in args.counts:
+        palettes = [random_palette(rng, args.num_colors) for _ in range(count)]
+        nested = {"results": [{"dominantColors": p} for p in palettes]}
+        columnar = {"results": [{"dominantColors": to_columnar(p)} for p in palettes]}
+        # Keep the total work per measurement roughly constant
+        repeat = max(1, 2000 // count)
+
+        for name, payload in (("nested", nested), ("columnar", columnar)):
+            for encoder, function in (("json", stdlib_dumps), ("orjson", dumps)):
+                elapsed, size = time_call(function, payload, repeat)
+                print(f"{count:>9} {name:>9} {encoder:>8} {elapsed:>10.3f} {size:>12,}")
+
+
+if __name__ == "__main__":
+    main()
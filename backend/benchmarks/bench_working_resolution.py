@@ -0,0 +1,104 @@
+"""
+Benchmark uploads downscaled to the working resolution against originals.
+
+A synthetic phone-sized photo is posted to /api/upload as is and after the
+downscale the frontend applies (area resampling to the working resolution
+from /api/capabilities, re-encoded as JPEG). Reports upload bytes, request
+time, decoded pixel memory and the Delta E between the two palettes.
+
+Usage (from the repository root):
+    python backend/benchmarks/bench_working_resolution.py --width 4032 --height 3024
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(BACKEND_DIR, ".."), BACKEND_DIR]
+
+
+def synthetic_photo(width, height, seed=0):
+    """Regions of five colors with soft edges and sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    colors = rng.integers(0, 256, size=(5, 3))
+    labels = rng.integers(0, len(colors), size=(6, 8))
+    small = colors[labels].astype(np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
+    image = cv2.GaussianBlur(image, (0, 0), width / 200)
+    noise = rng.normal(0, 6, size=image.shape)
+    return (image + noise).clip(0, 255).astype(np.uint8)
+
+
+def working_scale(width, height, max_side, max_pixels):
+    return min(
+        1.0, max_side / max(width, height), (max_pixels / (width * height)) ** 0.5
+    )
+
+
+def post(client, data, repeats):
+    times = []
+    for index in range(repeats):
+        start = time.perf_counter()
+        response = client.post(
+            "/api/upload",
+            data={"image": (io.BytesIO(data), f"{index}.jpg"), "num_colors": "5"},
+        )
+        times.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.data
+    return response.json["dominant_colors"], float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # The app writes uploads and its job database to the working directory
+    os.chdir(tempfile.mkdtemp())
+    import app as app_module
+    from utils.perceptual_hash import palette_delta_e
+
+    # Measure full-quality extraction itself, not near-duplicate reuse or
+    # the cheaper tiers that slow originals would trigger
+    app_module.palette_cache.max_entries = 0
+    app_module.admission.enabled = False
+    client = app_module.app.test_client()
+    working = client.get("/api/capabilities").json["workingResolution"]
+
+    photo = synthetic_photo(args.width, args.height)
+    scale = working_scale(
+        args.width, args.height, working["maxSide"], working["maxPixels"]
+    )
+    reduced = cv2.resize(
+        photo,
+        (int(args.width * scale), int(args.height * scale)),
+        interpolation=cv2.INTER_AREA,
+    )
+
+    print(f"working resolution: {working}")
+    print(f"{'upload':>10} {'size':>11} {'bytes':>10} {'decoded':>10} {'ms':>8}")
+    palettes = {}
+    for name, image in (("original", photo), ("reduced", reduced)):
+        data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        colors, elapsed = post(client, data, args.repeats)
+        palettes[name] = colors
+        height, width = image.shape[:2]
+        print(
+            f"{name:>10} {f'{width}x{height}':>11} {len(data) / 1e6:>8.2f}MB "
+            f"{image.nbytes / 1e6:>8.1f}MB {elapsed * 1000:>8.0f}"
+        )
+
+    delta_e = palette_delta_e(palettes["original"], palettes["reduced"])
+    print(f"palette Delta E between original and reduced: {delta_e:.2f}")
+
+
+if __name__ == "__main__":
+    main()
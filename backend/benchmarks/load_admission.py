@@ -0,0 +1,124 @@
+"""
+Synthetic load test for load-aware extraction quality.
+
+Concurrent clients post the same image to /api/analyze in phases of rising
+concurrency, once with adaptive quality disabled (every request runs the
+full tier) and once enabled. Each phase reports throughput, latency
+percentiles, the quality tiers used and rejected requests. Phases run back
+to back against one controller, like a ramp on a running server.
+
+Usage (from the repository root):
+    python backend/benchmarks/load_admission.py --concurrency 1 4 8 16 --slo-ms 1000
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(BACKEND_DIR, ".."), BACKEND_DIR]
+
+
+def synthetic_jpeg(size, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.integers(0, 256, size=(6, 3))
+    labels = rng.integers(0, len(centers), size=size * size)
+    image = (centers[labels] + rng.normal(0, 12, size=(size * size, 3))).clip(0, 255)
+    image = image.astype(np.uint8).reshape(size, size, 3)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def run_phase(app, image_data, concurrency, duration):
+    """Run concurrent clients for duration seconds and collect results."""
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        test_client = app.test_client()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = test_client.post(
+                "/api/analyze",
+                data={"image": (io.BytesIO(image_data), f"{index}.jpg")},
+            )
+            elapsed = time.perf_counter() - start
+            tier = response.headers.get("X-Quality-Tier", "rejected")
+            with lock:
+                results.append((response.status_code, elapsed, tier))
+            if response.status_code == 503:
+                time.sleep(float(response.headers.get("Retry-After", 1)))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(concurrency, results, duration):
+    ok = [elapsed for status, elapsed, _ in results if status == 200]
+    rejected = sum(1 for status, _, _ in results if status == 503)
+    tiers = Counter(tier for status, _, tier in results if status == 200)
+    latency = (
+        f"{np.percentile(ok, 50) * 1000:>8.0f} {np.percentile(ok, 95) * 1000:>8.0f}"
+        if ok
+        else f"{'-':>8} {'-':>8}"
+    )
+    print(
+        f"{concurrency:>6} {len(ok) / duration:>8.1f} {latency} {rejected:>8}  "
+        + ", ".join(f"{tier}={count}" for tier, count in tiers.most_common())
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--size", type=int, default=1200, help="Image side")
+    parser.add_argument("--slo-ms", type=float, default=1000)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    args = parser.parse_args()
+
+    # The app writes uploads and its job database to the working directory
+    os.chdir(tempfile.mkdtemp())
+    import app as app_module
+    from ml.color_extractor import QUALITY_ORDER
+    from utils.admission import AdmissionController
+
+    image_data = synthetic_jpeg(args.size)
+    # Every client sends the same image, so keep the near-duplicate cache
+    # empty to measure extraction itself
+    app_module.palette_cache.max_entries = 0
+
+    defaults = app_module.admission
+    for enabled in (False, True):
+        print(
+            f"\nadaptive quality {'on' if enabled else 'off'} (SLO p95 {args.slo_ms:.0f} ms)"
+        )
+        print(
+            f"{'conc':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'503s':>8}  tiers"
+        )
+        # One controller for the whole ramp, as in a running server
+        app_module.admission = AdmissionController(
+            QUALITY_ORDER,
+            slo_p95=args.slo_ms / 1000,
+            concurrency=defaults.concurrency,
+            max_in_flight=args.max_in_flight,
+            enabled=enabled,
+        )
+        for concurrency in args.concurrency:
+            results = run_phase(app_module.app, image_data, concurrency, args.duration)
+            report(concurrency, results, args.duration)
+
+
+if __name__ == "__main__":
+    main()
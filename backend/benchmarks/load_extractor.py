@@ -0,0 +1,97 @@
+"""
+Load test: extraction throughput for combinations of workers x threads.
+
+Each worker process stands in for a gunicorn worker and runs
+extract_dominant_colors in a loop with the given native thread budget
+(threadpoolctl). "none" leaves the thread count unlimited, which is the
+default behaviour and shows the cost of oversubscription.
+
+Usage (from the repository root):
+    python backend/benchmarks/load_extractor.py --workers 1 4 8 --threads 1 2 none
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [os.path.join(BACKEND_DIR, ".."), BACKEND_DIR]
+
+
+def init_worker(threads):
+    """Set the worker's native thread budget once, as the server does at startup."""
+    sys.path[:0] = [os.path.join(BACKEND_DIR, ".."), BACKEND_DIR]
+    from ml.color_extractor import apply_thread_limit
+
+    apply_thread_limit(threads)
+
+
+def run_worker(duration, size, seed):
+    """Extract palettes from synthetic images until the duration elapses."""
+    from ml.color_extractor import extract_dominant_colors
+
+    rng = np.random.default_rng(seed)
+    centers = rng.integers(0, 256, size=(6, 3))
+    labels = rng.integers(0, len(centers), size=size * size)
+    image = (centers[labels] + rng.normal(0, 12, size=(size * size, 3))).clip(0, 255)
+    image = image.astype(np.uint8).reshape(size, size, 3)
+
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        extract_dominant_colors(image)
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", nargs="+", default=["1", "2", "none"])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--size", type=int, default=200, help="Image side in pixels")
+    args = parser.parse_args()
+
+    # Spawn so OpenMP state is not inherited across fork
+    context = multiprocessing.get_context("spawn")
+
+    print(f"{os.cpu_count()} CPUs, {args.size}x{args.size} images")
+    print(f"{'workers':>8} {'threads':>8} {'images/s':>10} {'per worker':>11}")
+    for workers in args.workers:
+        for threads in args.threads:
+            limit = None if threads == "none" else int(threads)
+            with ProcessPoolExecutor(
+                workers,
+                mp_context=context,
+                initializer=init_worker,
+                initargs=(limit,),
+            ) as pool:
+                # Warm up imports in every worker before timing
+                list(
+                    pool.map(
+                        run_worker,
+                        [0.1] * workers,
+                        [args.size] * workers,
+                        range(workers),
+                    )
+                )
+                start = time.perf_counter()
+                counts = list(
+                    pool.map(
+                        run_worker,
+                        [args.duration] * workers,
+                        [args.size] * workers,
+                        range(workers),
+                    )
+                )
+                elapsed = time.perf_counter() - start
+            rate = sum(counts) / elapsed
+            print(f"{workers:>8} {threads:>8} {rate:>10.1f} {rate / workers:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Load test: slow uploads against the Flask (gunicorn sync) and ASGI (uvicorn)
+deployments.
+
+Many clients upload an image slowly (throttled to --slow-rate bytes/s) while
+a probe client keeps sending small uploads. With sync workers each slow upload
+holds a worker for the whole transfer, so probes queue behind them; the ASGI
+server receives bodies asynchronously and keeps answering.
+
+On loopback the kernel socket buffers can hold a whole upload, which hides
+part of the cost of slow bodies for sync workers; the probe latency still
+shows requests queueing behind busy workers.
+
+Usage (from the repository root):
+    python backend/benchmarks/load_uploads.py --server flask asgi --slow 200
+    python backend/benchmarks/load_uploads.py --url http://127.0.0.1:5000
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+)
+
+BOUNDARY = "----loaduploadsboundary"
+
+
+def encode_jpeg(side, seed=0):
+    rng = np.random.default_rng(seed)
+    # Noise barely compresses, so the upload size grows with side squared
+    image = rng.integers(0, 256, size=(side, side, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def multipart_request(host, path, image_data, filename="upload.jpg"):
+    """Build the header and body of a multipart/form-data upload."""
+    body = (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="num_colors"\r\n\r\n3\r\n'
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="image"; filename="{filename}"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    body += image_data + f"\r\n--{BOUNDARY}--\r\n".encode()
+    head = (
+        f"POST {path} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n"
+    ).encode()
+    return head, body
+
+
+async def send_upload(host, port, head, body, rate=None, timeout=120.0):
+    """
+    Send one upload, optionally throttled to rate bytes/s
+
+    Returns:
+        tuple: (HTTP status or None on failure, seconds until the response)
+    """
+    start = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+        writer.write(head)
+        if rate is None:
+            writer.write(body)
+            await writer.drain()
+        else:
+            chunk = max(1, int(rate / 10))
+            for offset in range(0, len(body), chunk):
+                writer.write(body[offset : offset + chunk])
+                await writer.drain()
+                await asyncio.sleep(0.1)
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        status = int(status_line.split()[1]) if status_line else None
+    except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+        status = None
+    finally:
+        if writer is not None:
+            writer.close()
+    return status, time.perf_counter() - start
+
+
+async def run_load(url, args):
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    slow_head, slow_body = multipart_request(
+        f"{host}:{port}", "/api/upload", encode_jpeg(args.slow_side)
+    )
+    probe_head, probe_body = multipart_request(
+        f"{host}:{port}", "/api/upload", encode_jpeg(64, seed=1)
+    )
+
+    slow_tasks = [
+        asyncio.create_task(
+            send_upload(host, port, slow_head, slow_body, rate=args.slow_rate)
+        )
+        for _ in range(args.slow)
+    ]
+
+    # Probe with small uploads while the slow ones are in flight
+    probes = []
+    deadline = time.perf_counter() + args.duration
+    await asyncio.sleep(1.0)
+    while not all(task.done() for task in slow_tasks) and len(probes) < args.probes:
+        timeout = min(args.probe_timeout, max(deadline - time.perf_counter(), 0.1))
+        probes.append(
+            await send_upload(host, port, probe_head, probe_body, timeout=timeout)
+        )
+        if time.perf_counter() >= deadline:
+            break
+        await asyncio.sleep(args.probe_interval)
+
+    # Uploads still running at the end of the test count as failed
+    await asyncio.wait(slow_tasks, timeout=max(deadline - time.perf_counter(), 0))
+    for task in slow_tasks:
+        task.cancel()
+    await asyncio.gather(*slow_tasks, return_exceptions=True)
+    slow_results = [
+        task.result() if not task.cancelled() else (None, args.duration)
+        for task in slow_tasks
+    ]
+    return len(slow_body), slow_results, probes
+
+
+def wait_for_port(host, port, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex((host, port)) == 0:
+                return
+        time.sleep(0.2)
+    raise SystemExit(f"Server did not start on {host}:{port}")
+
+
+def start_server(server, port, workers, workdir):
+    """Start the Flask app under gunicorn sync workers or the ASGI app."""
+    if server == "flask":
+        command = [
+            "gunicorn",
+            "--workers",
+            str(workers),
+            "--worker-class",
+            "sync",
+            "--timeout",
+            "300",
+            "--pythonpath",
+            BACKEND_DIR,
+            "--bind",
+            f"127.0.0.1:{port}",
+            "app:app",
+        ]
+    else:
+        command = [
+            "uvicorn",
+            "asgi:app",
+            "--app-dir",
+            BACKEND_DIR,
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ]
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([BACKEND_DIR, os.path.dirname(BACKEND_DIR)]),
+    )
+    # The app writes uploads and its job database to the working directory
+    process = subprocess.Popen(
+        command,
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_for_port("127.0.0.1", port)
+    return process
+
+
+def report(name, body_size, slow_results, probes):
+    slow_ok = [elapsed for status, elapsed in slow_results if status == 200]
+    probe_ok = [elapsed for status, elapsed in probes if status == 200]
+    print(f"\n[{name}]")
+    print(
+        f"slow uploads:  {len(slow_ok)}/{len(slow_results)} finished "
+        f"({body_size / 1e6:.2f} MB each), "
+        f"median {np.median(slow_ok) if slow_ok else float('nan'):.1f}s"
+    )
+    if probe_ok:
+        print(
+            f"probe uploads: {len(probe_ok)}/{len(probes)} ok, "
+            f"p50 {np.percentile(probe_ok, 50) * 1000:.0f} ms, "
+            f"p95 {np.percentile(probe_ok, 95) * 1000:.0f} ms, "
+            f"max {max(probe_ok) * 1000:.0f} ms"
+        )
+    else:
+        print(f"probe uploads: 0/{len(probes)} ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--server", nargs="+", choices=["flask", "asgi"])
+    parser.add_argument("--url", help="Test an already running server instead")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--slow", type=int, default=200, help="Slow uploads")
+    parser.add_argument("--slow-rate", type=float, default=100_000, help="Bytes/s")
+    parser.add_argument("--slow-side", type=int, default=1000, help="Image side")
+    parser.add_argument("--probes", type=int, default=20)
+    parser.add_argument("--probe-interval", type=float, default=0.5)
+    parser.add_argument("--probe-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--duration", type=float, default=60.0, help="Seconds before giving up"
+    )
+    args = parser.parse_args()
+
+    if args.url:
+        report(args.url, *asyncio.run(run_load(args.url, args)))
+        return
+
+    for server in args.server or ["flask", "asgi"]:
+        with tempfile.TemporaryDirectory() as workdir:
+            process = start_server(server, args.port, args.workers, workdir)
+            try:
+                url = f"http://127.0.0.1:{args.port}"
+                report(server, *asyncio.run(run_load(url, args)))
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+Offline command line interface for bulk palette extraction.
+
+Usage:
+    python -m backend.cli extract DIR [DIR ...] --output palettes.jsonl
+    python -m backend.cli index palettes.jsonl --output palette_index
+    python -m backend.cli workers --db jobs.db --workers 8
+
+Images are decoded in a thread pool (OpenCV releases the GIL while decoding)
+and clustered in a process pool. Results are appended to the output as they
+complete and finished paths are recorded in a checkpoint file, so an
+interrupted run resumes where it stopped.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+# The backend modules import each other as top-level packages (ml, utils)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2  # noqa: E402
+from ml.color_extractor import (  # noqa: E402
+    apply_thread_limit,
+    extract_dominant_colors,
+)
+from utils.image_processor import (  # noqa: E402
+    allowed_file,
+    probe_image,
+    read_image,
+    resize_image,
+)
+from utils.job_queue import serve_workers  # noqa: E402
+from utils.palette_index import PaletteIndex  # noqa: E402
+
+OUTPUT_FIELDS = ["path", "width", "height", "bytes", "num_colors", "colors", "error"]
+
+
+def iter_image_paths(directories):
+    """Walk directories in a stable order and yield image file paths."""
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if allowed_file(name):
+                    yield os.path.join(root, name)
+
+
+def load_checkpoint(checkpoint_path):
+    """Return the set of paths already written by a previous run."""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def decode_image(path, max_size, max_pixels=None):
+    """
+    Read and downscale an image for clustering (runs in a decode thread)
+
+    Returns:
+        tuple: (path, BGR/RGBA image array or None, original (height, width),
+        file size)
+    """
+    size = os.path.getsize(path)
+    try:
+        info = probe_image(path)
+        image = read_image(path, max_pixels=max_pixels)
+    except (OSError, ValueError):
+        return path, None, (None, None), size
+    if image.ndim == 3 and image.shape[2] == 4:
+        # Four-channel arrays are passed to the extractor as RGBA
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    shape = (info["height"], info["width"])
+    return path, resize_image(image, max_size=max_size), shape, size
+
+
+def cluster_image(image, num_colors):
+    """Extract dominant colors from a decoded image (runs in a worker process)."""
+    return extract_dominant_colors(image, num_colors=num_colors)
+
+
+class ResultWriter:
+    """Append-only writer for JSONL, CSV or Parquet output."""
+
+    def __init__(self, output_path, output_format):
+        self.output_path = output_path
+        self.output_format = output_format
+        self._file = None
+        self._csv = None
+        self._part = 0
+
+        if output_format == "jsonl":
+            self._file = open(output_path, "a")
+        elif output_format == "csv":
+            is_new = not os.path.exists(output_path) or not os.path.getsize(output_path)
+            self._file = open(output_path, "a", newline="")
+            self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            if is_new:
+                self._csv.writeheader()
+        elif output_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit(
+                    "Parquet output requires pyarrow (pip install pyarrow)"
+                )
+            # Parquet files cannot be appended to, so each flush is a new part
+            os.makedirs(output_path, exist_ok=True)
+            self._part = len(
+                [name for name in os.listdir(output_path) if name.endswith(".parquet")]
+            )
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.output_format == "jsonl":
+            for row in rows:
+                self._file.write(json.dumps(row) + "\n")
+        elif self.output_format == "csv":
+            for row in rows:
+                self._csv.writerow(dict(row, colors=json.dumps(row["colors"])))
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pylist(
+                [dict(row, colors=json.dumps(row["colors"])) for row in rows]
+            )
+            pq.write_table(
+                table,
+                os.path.join(self.output_path, f"part-{self._part:05d}.parquet"),
+            )
+            self._part += 1
+
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class Throughput:
+    """Track and periodically print images/s and MB/s."""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.images = 0
+        self.bytes = 0
+
+    def add(self, num_bytes):
+        self.images += 1
+        self.bytes += num_bytes
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        prefix = "done" if final else "progress"
+        print(
+            f"[{prefix}] {self.images} images in {elapsed:.1f}s: "
+            f"{self.images / elapsed:.1f} images/s, "
+            f"{self.bytes / elapsed / 1e6:.2f} MB/s",
+            file=sys.stderr,
+        )
+
+
+def run_extract(args):
+    output_format = args.format or os.path.splitext(args.output)[1].lstrip(".")
+    if output_format not in ("jsonl", "csv", "parquet"):
+        raise SystemExit("Output format must be jsonl, csv or parquet")
+
+    max_pixels = int(args.max_megapixels * 1_000_000)
+    num_colors = args.num_colors if args.num_colors == "auto" else int(args.num_colors)
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    finished = load_checkpoint(checkpoint_path)
+    if finished:
+        print(f"Resuming: {len(finished)} images already processed", file=sys.stderr)
+
+    writer = ResultWriter(args.output, output_format)
+    checkpoint = open(checkpoint_path, "a")
+    throughput = Throughput(args.report_interval)
+    # Bound the number of decoded images held in memory at once
+    max_in_flight = args.workers * 4
+
+    pending_rows = []
+
+    def flush():
+        writer.write(pending_rows)
+        checkpoint.writelines(row["path"] + "\n" for row in pending_rows)
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+        pending_rows.clear()
+
+    def finish(row, num_bytes):
+        pending_rows.append(row)
+        throughput.add(num_bytes)
+        if len(pending_rows) >= args.chunk_size:
+            flush()
+
+    paths = (
+        path for path in iter_image_paths(args.directories) if path not in finished
+    )
+
+    try:
+        with ThreadPoolExecutor(args.decode_threads) as decoder, ProcessPoolExecutor(
+            args.workers, initializer=apply_thread_limit
+        ) as pool:
+            decoding = deque()
+            clustering = {}
+            exhausted = False
+
+            while True:
+                # Keep the decode queue topped up without exceeding the window
+                while not exhausted and len(decoding) + len(clustering) < max_in_flight:
+                    path = next(paths, None)
+                    if path is None:
+                        exhausted = True
+                        break
+                    decoding.append(
+                        decoder.submit(decode_image, path, args.max_size, max_pixels)
+                    )
+
+                # Hand decoded images over to the process pool
+                while decoding and decoding[0].done():
+                    path, image, (height, width), size = decoding.popleft().result()
+                    row = {
+                        "path": path,
+                        "width": width,
+                        "height": height,
+                        "bytes": size,
+                        "num_colors": None,
+                        "colors": [],
+                        "error": None,
+                    }
+                    if image is None:
+                        row["error"] = "Could not decode image"
+                        finish(row, size)
+                        continue
+                    clustering[pool.submit(cluster_image, image, num_colors)] = row
+
+                if not decoding and not clustering:
+                    if exhausted:
+                        break
+                    continue
+
+                waiting = list(clustering) + ([decoding[0]] if decoding else [])
+                done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+                for future in done:
+                    row = clustering.pop(future, None)
+                    if row is None:
+                        continue
+                    try:
+                        row["colors"] = future.result()
+                        row["num_colors"] = len(row["colors"])
+                    except Exception as e:
+                        row["error"] = str(e)
+                    finish(row, row["bytes"])
+    finally:
+        flush()
+        writer.close()
+        checkpoint.close()
+        throughput.report(final=True)
+
+
+def run_index(args):
+    start = time.perf_counter()
+    index = PaletteIndex.from_jsonl(args.input)
+    index.save(args.output)
+    print(
+        f"Indexed {len(index)} palettes in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+
+
+def run_workers(args):
+    serve_workers(args.db, args.workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.cli", description="Color detection tools"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract = subparsers.add_parser(
+        "extract", help="Extract dominant colors from all images in directories"
+    )
+    extract.add_argument("directories", nargs="+", help="Directories to scan")
+    extract.add_argument(
+        "-o",
+        "--output",
+        default="palettes.jsonl",
+        help="Output file (or directory for parquet)",
+    )
+    extract.add_argument(
+        "--format",
+        choices=["jsonl", "csv", "parquet"],
+        help="Defaults to the output extension",
+    )
+    extract.add_argument(
+        "-k", "--num-colors", default="5", help='Number of colors or "auto"'
+    )
+    extract.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Clustering processes"
+    )
+    extract.add_argument(
+        "--decode-threads", type=int, default=4, help="Decoding threads"
+    )
+    extract.add_argument(
+        "--max-size", type=int, default=400, help="Longest side used for clustering"
+    )
+    extract.add_argument(
+        "--max-megapixels",
+        type=float,
+        default=100,
+        help="Skip images larger than this unless they can be decoded reduced",
+    )
+    extract.add_argument(
+        "--chunk-size", type=int, default=256, help="Rows written per flush"
+    )
+    extract.add_argument(
+        "--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)"
+    )
+    extract.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between progress lines",
+    )
+    extract.set_defaults(func=run_extract)
+
+    index = subparsers.add_parser(
+        "index", help="Build a palette search index from extract JSONL output"
+    )
+    index.add_argument("input", help="JSONL file written by the extract command")
+    index.add_argument(
+        "-o", "--output", default="palette_index", help="Index directory"
+    )
+    index.set_defaults(func=run_index)
+
+    workers = subparsers.add_parser(
+        "workers", help="Run the worker processes of the /api/jobs queue"
+    )
+    workers.add_argument(
+        "--db",
+        default=os.environ.get("JOBS_DB", "jobs.db"),
+        help="Job queue database (default: JOBS_DB or jobs.db)",
+    )
+    workers.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes"
+    )
+    workers.set_defaults(func=run_workers)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 from backend.utils.color_utils import hex_to_rgb
+from ml.harmony import harmony_schemes
 import math
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras import layers, models
 import json
 import os
 
+# Trained weights exported by ColorClassifier.export_weights; loading them
+# lets predictions run in pure NumPy without importing TensorFlow
+DEFAULT_WEIGHTS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "color_classifier_weights.npz"
+)
+
 # Basic color name mapping
 BASIC_COLORS = {
     "red": [255, 0, 0],
@@ -30,10 +35,17 @@ BASIC_COLORS = {
 
 
 class ColorClassifier:
-    def __init__(self):
+    def __init__(self, weights_path=DEFAULT_WEIGHTS_PATH):
+        """
+        Args:
+            weights_path (str): Exported .npz weights to load if the file
+                exists; without them the Keras model is only built by train()
+        """
         self.model = None
+        self.weights = None
         self.color_names = self._load_color_names()
-        self._build_model()
+        if weights_path and os.path.exists(weights_path):
+            self.load_weights(weights_path)
 
     def _load_color_names(self):
         """Load color names database or use a simplified one if not available"""
@@ -47,8 +59,8 @@ class ColorClassifier:
 
     def _build_model(self):
         """Build a simple neural network for color classification"""
-        # In a real app, this would be a pre-trained model loaded from disk
-        # For demo purposes, we'll create a simple model structure
+        # TensorFlow is only needed for training
+        from tensorflow.keras import layers, models
 
         model = models.Sequential(
             [
@@ -76,27 +88,88 @@ class ColorClassifier:
         # One-hot encode the labels
         y = np.eye(len(self.color_names))
 
+        if self.model is None:
+            self._build_model()
+
         # Train the model
         self.model.fit(X, y, epochs=epochs, verbose=0)
 
-    def predict_color_name(self, rgb):
-        """Predict the name of a color based on RGB values"""
-        # Normalize RGB values
-        rgb_normalized = np.array([[rgb[0], rgb[1], rgb[2]]]) / 255.0
+        # Keep the NumPy inference path in sync with the trained model
+        self.weights = [
+            weight.astype(np.float32)
+            for layer in self.model.layers
+            for weight in layer.get_weights()
+        ]
+
+    def export_weights(self, path=DEFAULT_WEIGHTS_PATH):
+        """Save the trained dense layer weights and color names to a .npz file"""
+        if self.weights is None:
+            raise ValueError("Model has not been trained")
+
+        arrays = {f"arr_{i}": weight for i, weight in enumerate(self.weights)}
+        np.savez(path, color_names=np.array(list(self.color_names)), **arrays)
+
+    def load_weights(self, path=DEFAULT_WEIGHTS_PATH):
+        """Load weights written by export_weights"""
+        with np.load(path) as data:
+            names = [str(name) for name in data["color_names"]]
+            count = len(data.files) - 1
+            self.weights = [data[f"arr_{i}"] for i in range(count)]
+
+        # Weights only make sense with the color names they were trained on
+        if names != list(self.color_names):
+            self.color_names = {
+                name: self.color_names.get(name, BASIC_COLORS.get(name))
+                for name in names
+            }
+
+    def _forward(self, rgb_normalized):
+        """NumPy forward pass: ReLU dense layers followed by a softmax layer"""
+        x = rgb_normalized.astype(np.float32)
+        for i in range(0, len(self.weights) - 2, 2):
+            x = np.maximum(x @ self.weights[i] + self.weights[i + 1], 0)
+
+        logits = x @ self.weights[-2] + self.weights[-1]
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_color_names(self, rgbs):
+        """
+        Predict names for a batch of colors
+
+        Args:
+            rgbs: RGB values with shape (N, 3)
+
+        Returns:
+            list: {"name", "confidence"} dicts, one per color
+        """
+        rgbs = np.asarray(rgbs, dtype=np.float64).reshape(-1, 3)
 
         # If model is not trained, use nearest neighbor approach
-        if self.model is None:
-            return self._nearest_color_name(rgb)
-
-        # Make prediction
-        prediction = self.model.predict(rgb_normalized)[0]
-        color_index = np.argmax(prediction)
+        if self.weights is None and self.model is None:
+            return [self._nearest_color_name(rgb) for rgb in rgbs]
 
-        # Get color name
-        color_name = list(self.color_names.keys())[color_index]
-        confidence = float(prediction[color_index])
+        # Normalize RGB values
+        rgb_normalized = rgbs / 255.0
+
+        # Make predictions
+        if self.weights is not None:
+            predictions = self._forward(rgb_normalized)
+        else:
+            predictions = self.model.predict(rgb_normalized, verbose=0)
+        color_indices = np.argmax(predictions, axis=1)
+
+        # Get color names
+        names = list(self.color_names.keys())
+        return [
+            {"name": names[index], "confidence": float(prediction[index])}
+            for index, prediction in zip(color_indices, predictions)
+        ]
 
-        return {"name": color_name, "confidence": confidence}
+    def predict_color_name(self, rgb):
+        """Predict the name of a color based on RGB values"""
+        return self.predict_color_names([rgb[:3]])[0]
 
     def _nearest_color_name(self, rgb):
         """Find the nearest color name using Euclidean distance"""
@@ -123,30 +196,12 @@ class ColorClassifier:
 
     def predict_complementary_colors(self, rgb):
         """Predict complementary colors for a given RGB value"""
-        # Convert to numpy array
-        rgb = np.array(rgb)
-
-        # Complementary color (opposite on color wheel)
-        complementary = 255 - rgb
-
-        # Analogous colors (adjacent on color wheel)
-        # This is a simplified approach
-        analogous1 = np.clip(rgb + [30, -30, -30], 0, 255)
-        analogous2 = np.clip(rgb + [-30, 30, 30], 0, 255)
-
-        # Triadic colors (form a triangle on color wheel)
-        # Again, simplified
-        hue_shift = 120  # 120 degrees on color wheel
-        # In a real app, this would use proper HSL conversion and shifting
-
-        # For demo, we'll just create some variations
-        triadic1 = np.array([rgb[1], rgb[2], rgb[0]])  # Cycle the values
-        triadic2 = np.array([rgb[2], rgb[0], rgb[1]])  # Cycle again
+        schemes = harmony_schemes([rgb], ["complementary", "analogous", "triadic"])
 
         result = {
-            "complementary": complementary.tolist(),
-            "analogous": [analogous1.tolist(), analogous2.tolist()],
-            "triadic": [triadic1.tolist(), triadic2.tolist()],
+            "complementary": schemes["complementary"][0, 0].tolist(),
+            "analogous": schemes["analogous"][0].tolist(),
+            "triadic": schemes["triadic"][0].tolist(),
         }
 
         return result
@@ -225,8 +280,9 @@ def get_color_description(hex_color):
 
 # Usage example
 if __name__ == "__main__":
-    classifier = ColorClassifier()
+    classifier = ColorClassifier(weights_path=None)
     classifier.train(epochs=10)
+    classifier.export_weights()
 
     # Test prediction
     test_color = [255, 0, 0]  # Red
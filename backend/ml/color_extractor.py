@@ -1,5 +1,9 @@
+import os
+import time
+import threading
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from threadpoolctl import ThreadpoolController
 from PIL import Image
 import io
 import base64
@@ -7,6 +11,78 @@ import requests
 from urllib.parse import urlparse
 import cv2
 from utils.color_utils import rgb_to_hex, rgb_to_hsl
+from utils.image_processor import ALPHA_THRESHOLD, read_image, select_pixels
+
+# Defaults for automatic cluster-count selection (num_colors="auto")
+AUTO_MAX_COLORS = 10
+AUTO_SAMPLE_SIZE = 2000
+AUTO_UNEXPLAINED_THRESHOLD = 0.05
+AUTO_MIN_GAIN = 0.15
+AUTO_TIME_BUDGET = 0.25  # seconds per image
+
+# Defaults for progressive extraction (iter_progressive_palettes)
+PROGRESSIVE_SIZES = (32, 96, 256, 512)
+PROGRESSIVE_DEADLINE = 1.0  # seconds
+PROGRESSIVE_TOLERANCE = 2.0  # max centroid shift in RGB units
+
+# Extraction quality tiers, most to least expensive. Under load the server
+# steps down through them (see utils.admission.AdmissionController).
+#   max_side: longest side of the pixel grid that is clustered (strided)
+#   n_init: k-means restarts (None keeps the scikit-learn default)
+#   sample_size: random subset of the selected pixels that is clustered
+#   engine: "kmeans" on pixels, or "histogram" (weighted k-means on the
+#           occupied bins of a 4-bit-per-channel color histogram)
+QUALITY_TIERS = {
+    "full": {"max_side": None, "n_init": None, "sample_size": None, "engine": "kmeans"},
+    "reduced": {"max_side": 512, "n_init": 1, "sample_size": None, "engine": "kmeans"},
+    "sampled": {"max_side": 256, "n_init": 1, "sample_size": 10000, "engine": "kmeans"},
+    "histogram": {
+        "max_side": 256,
+        "n_init": 1,
+        "sample_size": None,
+        "engine": "histogram",
+    },
+}
+QUALITY_ORDER = tuple(QUALITY_TIERS)
+
+# Bits kept per channel by the histogram engine (16 levels, 4096 bins)
+HISTOGRAM_BITS = 4
+
+# Native (OpenMP/BLAS) threads each extraction may use. Unset means no limit,
+# which oversubscribes the CPU when several server workers cluster at once.
+DEFAULT_THREAD_LIMIT = (
+    int(os.environ["EXTRACTOR_THREADS"])
+    if os.environ.get("EXTRACTOR_THREADS")
+    else None
+)
+
+
+# Inspecting the loaded native libraries is slow, so do it once per process
+_thread_controller = None
+_thread_limit_lock = threading.Lock()
+
+
+def apply_thread_limit(threads=None):
+    """
+    Cap the native threads used by clustering in this process
+
+    threadpoolctl limits are process-global, so the budget is set once when
+    a process starts (the server at import, worker processes in their
+    initializer) rather than per call, where concurrent requests would
+    overwrite each other's limits.
+
+    Args:
+        threads (int): Thread budget, or None to use DEFAULT_THREAD_LIMIT
+    """
+    global _thread_controller
+
+    threads = threads or DEFAULT_THREAD_LIMIT
+    if threads is None:
+        return
+    with _thread_limit_lock:
+        if _thread_controller is None:
+            _thread_controller = ThreadpoolController()
+        _thread_controller.limit(limits=threads)
 
 
 class ColorExtractor:
@@ -14,11 +90,13 @@ class ColorExtractor:
         """
         Initialize the color extractor with the number of colors to extract
 
+        The extractor holds configuration only; each call fits its own
+        model, so one instance can be shared between threads.
+
         Args:
             n_colors (int): Number of dominant colors to extract
         """
         self.n_colors = n_colors
-        self.model = KMeans(n_clusters=n_colors, random_state=42)
 
     def load_image(self, image_source):
         """
@@ -65,21 +143,24 @@ class ColorExtractor:
             img = img.copy()
             img.thumbnail((200, 200))
 
-            # Convert to RGB if necessary
-            if img.mode != "RGB":
+            # Convert to RGB(A) if necessary
+            if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+                img = img.convert("RGBA")
+            elif img.mode != "RGB":
                 img = img.convert("RGB")
 
-            # Reshape image data for clustering
-            pixels = np.array(img).reshape(-1, 3)
+            # Drop transparent pixels and reshape image data for clustering
+            pixels = select_pixels(np.array(img))
 
-            # Fit model to pixels
-            self.model.fit(pixels)
+            # Fit a per-call model to pixels
+            model = KMeans(n_clusters=self.n_colors, random_state=42)
+            model.fit(pixels)
 
             # Get cluster centers (colors)
-            colors = self.model.cluster_centers_.astype(int)
+            colors = model.cluster_centers_.astype(int)
 
             # Count pixels in each cluster
-            labels = self.model.labels_
+            labels = model.labels_
             counts = np.bincount(labels)
 
             # Calculate percentages
@@ -124,44 +205,111 @@ class ColorExtractor:
         }
 
 
-def extract_dominant_colors(image_path, num_colors=5):
+def select_num_colors(
+    pixels,
+    max_colors=AUTO_MAX_COLORS,
+    sample_size=AUTO_SAMPLE_SIZE,
+    threshold=AUTO_UNEXPLAINED_THRESHOLD,
+    min_gain=AUTO_MIN_GAIN,
+    time_budget=AUTO_TIME_BUDGET,
+    random_state=42,
+):
     """
-    Extract dominant colors from an image using K-means clustering.
+    Pick the number of clusters for an image using a cheap elbow criterion.
+
+    Candidate k values are fit incrementally with MiniBatchKMeans on a small
+    pixel sample. The search stops as soon as the fraction of unexplained
+    variance falls below ``threshold``, adding a cluster explains less than
+    ``min_gain`` of what was left, or ``time_budget`` seconds have elapsed.
 
     Args:
-        image_path: Path to the image file or loaded image array
-        num_colors: Number of dominant colors to extract
+        pixels: Array of pixels with shape (N, 3)
+        max_colors: Largest k to consider
+        sample_size: Number of pixels sampled for the search
+        threshold: Unexplained variance fraction that is considered good enough
+        min_gain: Minimum relative improvement required to accept a larger k
+        time_budget: Wall-clock limit for the search in seconds
+        random_state: Seed for sampling and clustering
 
     Returns:
-        List of dominant colors with RGB, HEX, HSL values and percentages
+        dict: Selected k, unexplained fraction, stop reason and elapsed time
     """
-    # Handle both file paths and numpy arrays
-    if isinstance(image_path, str):
-        # Load image
-        image = cv2.imread(image_path)
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    else:
-        # Assume it's already a numpy array
-        image = image_path
-        if len(image.shape) == 3 and image.shape[2] == 3:
-            # Make sure it's RGB
-            if isinstance(image_path, np.ndarray):
-                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    start = time.perf_counter()
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 3)
 
-    # Reshape the image to be a list of pixels
-    pixels = image.reshape(-1, 3)
+    if len(pixels) > sample_size:
+        rng = np.random.default_rng(random_state)
+        sample = pixels[rng.choice(len(pixels), sample_size, replace=False)]
+    else:
+        sample = pixels
+
+    # Total sum of squares is the inertia of a single cluster (k=1)
+    total = float(((sample - sample.mean(axis=0)) ** 2).sum())
+    max_colors = min(max_colors, len(np.unique(sample, axis=0)))
+
+    best_k = 1
+    unexplained = 1.0
+    evaluated = 1
+    reason = "max_colors"
+
+    if total == 0:
+        reason = "threshold"
+        max_colors = 1
+
+    for k in range(2, max_colors + 1):
+        if time.perf_counter() - start > time_budget:
+            reason = "time_budget"
+            break
+
+        model = MiniBatchKMeans(
+            n_clusters=k,
+            n_init=1,
+            batch_size=min(len(sample), 1024),
+            random_state=random_state,
+        )
+        model.fit(sample)
+        evaluated += 1
+        candidate = float(model.inertia_) / total
+
+        # Elbow: the extra cluster barely reduces what is left unexplained
+        if unexplained - candidate < min_gain * unexplained:
+            reason = "elbow"
+            break
+
+        best_k = k
+        unexplained = candidate
+        if unexplained <= threshold:
+            reason = "threshold"
+            break
+
+    return {
+        "num_colors": best_k,
+        "unexplained": unexplained,
+        "reason": reason,
+        "candidates_evaluated": evaluated,
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def format_palette(centers, labels, weights=None):
+    """
+    Build the palette response from k-means centroids and pixel labels
 
-    # Perform k-means clustering
-    kmeans = KMeans(n_clusters=num_colors, random_state=42)
-    kmeans.fit(pixels)
+    Args:
+        centers: Cluster centers with shape (k, 3) in RGB order
+        labels: Cluster index of every clustered pixel
+        weights: Optional number of pixels represented by each label
 
+    Returns:
+        List of colors with RGB, HEX, HSL values and percentages, most
+        frequent first
+    """
     # Get the colors from centroids
-    colors = kmeans.cluster_centers_.astype(int)
+    colors = centers.astype(int)
 
     # Calculate percentage of each color
-    labels = kmeans.labels_
-    count = np.bincount(labels)
-    percentages = count / len(labels) * 100
+    count = np.bincount(labels, weights=weights, minlength=len(colors))
+    percentages = count / count.sum() * 100
 
     # Sort colors by percentage
     indices = np.argsort(percentages)[::-1]
@@ -187,6 +335,260 @@ def extract_dominant_colors(image_path, num_colors=5):
     return result
 
 
+def reduce_grid(image, max_side, mask=None, rect=None):
+    """
+    Subsample an image by striding so its longest side is at most max_side
+
+    Striding is a view, so this costs nothing before pixels are selected.
+    The mask and rectangle are mapped onto the reduced grid.
+
+    Returns:
+        tuple: (image, mask, rect)
+    """
+    step = -(-max(image.shape[:2]) // max_side)
+    if step <= 1:
+        return image, mask, rect
+    image = image[::step, ::step]
+    if mask is not None:
+        mask = np.asarray(mask)[::step, ::step]
+    if rect is not None:
+        x, y, w, h = (int(v) for v in rect)
+        rect = (x // step, y // step, max(-(-w // step), 1), max(-(-h // step), 1))
+    return image, mask, rect
+
+
+def histogram_clusters(pixels, num_colors, n_init=1):
+    """
+    Cluster the occupied bins of a coarse color histogram
+
+    Each bin is represented by the mean color of its pixels and weighted
+    by its pixel count, so k-means runs on at most 4096 points.
+
+    Returns:
+        tuple: (centers, bin labels, bin weights)
+    """
+    levels = 1 << HISTOGRAM_BITS
+    quantized = np.clip(pixels // (256 // levels), 0, levels - 1).astype(np.int64)
+    bins = (quantized[:, 0] * levels + quantized[:, 1]) * levels + quantized[:, 2]
+
+    counts = np.bincount(bins, minlength=levels**3)
+    occupied = np.flatnonzero(counts)
+    sums = np.stack(
+        [
+            np.bincount(bins, weights=pixels[:, c], minlength=levels**3)
+            for c in range(3)
+        ],
+        axis=1,
+    )
+    weights = counts[occupied]
+    means = sums[occupied] / weights[:, None]
+
+    kmeans = KMeans(
+        n_clusters=min(num_colors, len(occupied)), n_init=n_init, random_state=42
+    )
+    kmeans.fit(means, sample_weight=weights)
+    return kmeans.cluster_centers_, kmeans.labels_, weights
+
+
+def extract_dominant_colors(
+    image_path,
+    num_colors=5,
+    return_selection=False,
+    alpha_threshold=ALPHA_THRESHOLD,
+    mask=None,
+    rect=None,
+    max_pixels=None,
+    quality="full",
+):
+    """
+    Extract dominant colors from an image using K-means clustering.
+
+    Only the relevant pixels are clustered: transparent pixels, pixels
+    outside ``mask`` and pixels outside ``rect`` are dropped first, and
+    percentages are relative to the pixels that remain.
+
+    Args:
+        image_path: Path to the image file or loaded image array (BGR for
+            3 channels, RGBA for 4 channels)
+        num_colors: Number of dominant colors to extract, or "auto" to pick
+            it with select_num_colors
+        return_selection: If True, also return the auto-selection details
+            (None when num_colors is fixed)
+        alpha_threshold: Minimum alpha (0-255) for a pixel to be kept
+        mask: Optional boolean array (height, width) of pixels to keep
+        rect: Optional (x, y, width, height) region to keep
+        max_pixels: Decoded pixel limit when reading from a path; larger
+            JPEGs are decoded at reduced resolution, other formats rejected
+        quality: Name of a QUALITY_TIERS entry; cheaper tiers cluster fewer
+            pixels with fewer restarts or use the histogram engine
+
+    Returns:
+        List of dominant colors with RGB, HEX, HSL values and percentages,
+        or (colors, selection) if return_selection is True
+    """
+    # Handle both file paths and numpy arrays
+    if isinstance(image_path, str):
+        # Load image, keeping the alpha channel if there is one
+        image = read_image(image_path, max_pixels=max_pixels)
+        bgr_order = True
+    else:
+        # Assume it's already a numpy array
+        image = np.asarray(image_path)
+        bgr_order = image.ndim == 3 and image.shape[2] == 3
+
+    tier = QUALITY_TIERS[quality]
+    if tier["max_side"] is not None:
+        image, mask, rect = reduce_grid(image, tier["max_side"], mask=mask, rect=rect)
+
+    # Drop irrelevant pixels before clustering
+    pixels = select_pixels(image, alpha_threshold=alpha_threshold, mask=mask, rect=rect)
+    if len(pixels) == 0:
+        raise ValueError("No pixels left to analyze after masking")
+
+    if tier["sample_size"] is not None and len(pixels) > tier["sample_size"]:
+        rng = np.random.default_rng(42)
+        pixels = pixels[rng.choice(len(pixels), tier["sample_size"], replace=False)]
+
+    # Make sure it's RGB (only the selected pixels are reordered)
+    if bgr_order:
+        pixels = pixels[:, ::-1]
+
+    selection = None
+    if num_colors == "auto":
+        selection = select_num_colors(pixels)
+        num_colors = selection["num_colors"]
+
+    if tier["engine"] == "histogram":
+        centers, labels, weights = histogram_clusters(
+            pixels, num_colors, n_init=tier["n_init"]
+        )
+    else:
+        # Perform k-means clustering
+        options = {} if tier["n_init"] is None else {"n_init": tier["n_init"]}
+        kmeans = KMeans(n_clusters=num_colors, random_state=42, **options)
+        kmeans.fit(pixels)
+        centers, labels, weights = kmeans.cluster_centers_, kmeans.labels_, None
+
+    result = format_palette(centers, labels, weights)
+
+    if return_selection:
+        return result, selection
+    return result
+
+
+def iter_progressive_palettes(
+    image,
+    num_colors=5,
+    sizes=PROGRESSIVE_SIZES,
+    deadline=PROGRESSIVE_DEADLINE,
+    tolerance=PROGRESSIVE_TOLERANCE,
+    alpha_threshold=ALPHA_THRESHOLD,
+    mask=None,
+    rect=None,
+):
+    """
+    Yield increasingly accurate palettes, coarse first (anytime extraction)
+
+    The first palette comes from a tiny thumbnail. Each following stage
+    clusters a larger version of the image, warm-started from the previous
+    centroids, until the centroids stop moving, the deadline passes, or the
+    largest size has been used. Callers can stop iterating at any point.
+
+    Args:
+        image: Image array (BGR for 3 channels, RGBA for 4 channels)
+        num_colors: Number of dominant colors to extract, or "auto"
+        sizes: Longest-side sizes of the successive stages
+        deadline: Time budget in seconds after which no new stage starts
+        tolerance: Largest centroid shift (RGB units) counted as converged
+        alpha_threshold: Minimum alpha (0-255) for a pixel to be kept
+        mask: Optional boolean array (height, width) of pixels to keep
+        rect: Optional (x, y, width, height) region to keep
+
+    Yields:
+        dict: stage, size, pixels, colors, shift, converged, final and
+        elapsed_ms for each update
+    """
+    start = time.perf_counter()
+    image = np.asarray(image)
+    bgr_order = image.ndim == 3 and image.shape[2] == 3
+
+    # Apply the region once at full size; thumbnails are scaled from it
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+    if rect is not None:
+        x, y, w, h = (max(int(v), 0) for v in rect)
+        image = image[y : y + h, x : x + w]
+        if mask is not None:
+            mask = mask[y : y + h, x : x + w]
+
+    height, width = image.shape[:2]
+    if height == 0 or width == 0:
+        raise ValueError("No pixels left to analyze after masking")
+    longest = max(height, width)
+    stages = sorted({min(size, longest) for size in sizes})
+
+    centers = None
+    for stage, size in enumerate(stages):
+        scale = size / longest
+        dims = (max(int(width * scale), 1), max(int(height * scale), 1))
+        if scale < 1.0:
+            scaled = cv2.resize(image, dims, interpolation=cv2.INTER_AREA)
+            scaled_mask = (
+                None
+                if mask is None
+                else cv2.resize(
+                    mask.astype(np.uint8), dims, interpolation=cv2.INTER_NEAREST
+                ).astype(bool)
+            )
+        else:
+            scaled, scaled_mask = image, mask
+
+        pixels = select_pixels(
+            scaled, alpha_threshold=alpha_threshold, mask=scaled_mask
+        )
+        if len(pixels) == 0:
+            raise ValueError("No pixels left to analyze after masking")
+        if bgr_order:
+            pixels = pixels[:, ::-1]
+        pixels = pixels.astype(np.float64)
+
+        if centers is None:
+            if num_colors == "auto":
+                num_colors = select_num_colors(pixels)["num_colors"]
+            k = min(num_colors, len(np.unique(pixels, axis=0)))
+            kmeans = KMeans(n_clusters=k, random_state=42)
+        else:
+            # Warm start from the previous stage's centroids
+            kmeans = KMeans(n_clusters=len(centers), init=centers, n_init=1)
+        kmeans.fit(pixels)
+
+        new_centers = kmeans.cluster_centers_
+        shift = (
+            None
+            if centers is None
+            else float(np.sqrt(((new_centers - centers) ** 2).sum(axis=1)).max())
+        )
+        centers = new_centers
+
+        converged = shift is not None and shift <= tolerance
+        elapsed = time.perf_counter() - start
+        final = converged or stage == len(stages) - 1 or elapsed >= deadline
+
+        yield {
+            "stage": stage,
+            "size": size,
+            "pixels": len(pixels),
+            "colors": format_palette(centers, kmeans.labels_),
+            "shift": shift,
+            "converged": converged,
+            "final": final,
+            "elapsed_ms": elapsed * 1000,
+        }
+
+        if final:
+            return
+
+
 # Example usage
 if __name__ == "__main__":
     extractor = ColorExtractor(n_colors=5)
@@ -0,0 +1,130 @@
+import numpy as np
+
+# Hue offsets in degrees of the colors each scheme adds to a base color.
+# Tetradic is the square scheme (four hues 90 degrees apart).
+HARMONY_OFFSETS = {
+    "complementary": (180,),
+    "analogous": (-30, 30),
+    "triadic": (120, 240),
+    "split_complementary": (150, 210),
+    "tetradic": (90, 180, 270),
+}
+HARMONY_SCHEMES = tuple(HARMONY_OFFSETS)
+
+# Two-digit hex code of every channel value, for rgb_to_hex_array
+_HEX_DIGITS = np.array([f"{value:02x}" for value in range(256)])
+
+
+def rgb_to_hsl_array(rgb):
+    """
+    Vectorized RGB to HSL conversion
+
+    Args:
+        rgb: Array-like of RGB values (0-255) with shape (..., 3)
+
+    Returns:
+        numpy.ndarray: HSL values with the same shape, hue in degrees
+        [0, 360) and saturation and lightness in [0, 1]
+    """
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    cmax = rgb.max(axis=-1)
+    cmin = rgb.min(axis=-1)
+    delta = cmax - cmin
+    chromatic = delta > 0
+    safe_delta = np.where(chromatic, delta, 1.0)
+
+    # Hue sector depends on which channel is largest
+    hue = np.where(
+        cmax == r,
+        ((g - b) / safe_delta) % 6,
+        np.where(cmax == g, (b - r) / safe_delta + 2, (r - g) / safe_delta + 4),
+    )
+    hue = np.where(chromatic, hue * 60, 0.0)
+
+    lightness = (cmax + cmin) / 2
+    denominator = 1 - np.abs(2 * lightness - 1)
+    saturation = np.where(
+        chromatic, delta / np.where(denominator > 0, denominator, 1.0), 0.0
+    )
+
+    return np.stack([hue, saturation, lightness], axis=-1)
+
+
+def hsl_to_rgb_array(hsl):
+    """
+    Vectorized HSL to RGB conversion (inverse of rgb_to_hsl_array)
+
+    Args:
+        hsl: Array-like of HSL values with shape (..., 3), hue in degrees
+
+    Returns:
+        numpy.ndarray: uint8 RGB values with the same shape
+    """
+    hsl = np.asarray(hsl, dtype=np.float64)
+    hue = hsl[..., 0:1] % 360
+    saturation = hsl[..., 1:2]
+    lightness = hsl[..., 2:3]
+
+    # f(n) = L - a * max(-1, min(k - 3, 9 - k, 1)) with k = (n + H / 30) mod 12
+    k = (np.array([0, 8, 4]) + hue / 30) % 12
+    a = saturation * np.minimum(lightness, 1 - lightness)
+    rgb = lightness - a * np.clip(np.minimum(k - 3, 9 - k), -1, 1)
+
+    return np.rint(rgb * 255).clip(0, 255).astype(np.uint8)
+
+
+def harmony_schemes(palette, schemes=None):
+    """
+    Color harmonies for every color of a palette in one pass
+
+    Each color is converted to HSL once, its hue is rotated by the offsets
+    of all requested schemes together, and the result is converted back,
+    keeping saturation and lightness.
+
+    Args:
+        palette: Array-like of RGB values (0-255) with shape (N, 3)
+        schemes (list): Names from HARMONY_OFFSETS, or None for all
+
+    Returns:
+        dict: Scheme name to uint8 array of shape (N, colors in scheme, 3)
+    """
+    schemes = HARMONY_SCHEMES if schemes is None else tuple(schemes)
+    for scheme in schemes:
+        if scheme not in HARMONY_OFFSETS:
+            raise ValueError(f"Unknown scheme: {scheme}")
+
+    palette = np.asarray(palette, dtype=np.float64).reshape(-1, 3)
+    offsets = np.array(
+        [offset for scheme in schemes for offset in HARMONY_OFFSETS[scheme]],
+        dtype=np.float64,
+    )
+
+    # (N, K, 3): every color with every offset
+    hsl = np.repeat(rgb_to_hsl_array(palette)[:, None, :], len(offsets), axis=1)
+    hsl[..., 0] += offsets
+    rgb = hsl_to_rgb_array(hsl)
+
+    result = {}
+    start = 0
+    for scheme in schemes:
+        end = start + len(HARMONY_OFFSETS[scheme])
+        result[scheme] = rgb[:, start:end]
+        start = end
+    return result
+
+
+def rgb_to_hex_array(rgb):
+    """
+    Vectorized rgb_to_hex
+
+    Args:
+        rgb: Array-like of RGB values (0-255) with shape (..., 3)
+
+    Returns:
+        numpy.ndarray: Hex color codes with '#' prefix, shape (...)
+    """
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    codes = np.char.add("#", _HEX_DIGITS[rgb[..., 0]])
+    codes = np.char.add(codes, _HEX_DIGITS[rgb[..., 1]])
+    return np.char.add(codes, _HEX_DIGITS[rgb[..., 2]])
@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+import cv2
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# The backend imports its modules as top-level packages (ml, utils) and as
+# backend.utils, so both the backend and the repository root must be on the path
+sys.path[:0] = [os.path.abspath(os.path.join(BACKEND_DIR, "..")), BACKEND_DIR]
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    # The app writes uploads, profiles and its palette index relative to the
+    # working directory, so the tests run it in a temporary one
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    import app
+
+    yield app
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module):
+    # Every test measures a fresh extraction, not a near-duplicate hit
+    app_module.palette_cache.max_entries = 0
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def asgi_client(app_module):
+    import asgi
+    from starlette.testclient import TestClient
+
+    # Same loopback address as the Flask test client
+    return TestClient(asgi.app, client=("127.0.0.1", 50000))
+
+
+@pytest.fixture
+def png():
+    """Encode a solid BGR image as PNG: png(width, height, color)."""
+
+    def encode(width=20, height=20, color=(0, 0, 255)):
+        image = np.full((height, width, 3), color, dtype=np.uint8)
+        return cv2.imencode(".png", image)[1].tobytes()
+
+    return encode
+
+
+@pytest.fixture
+def upload(png):
+    """Fresh form fields for uploading a small red image."""
+    return lambda: {"image": (io.BytesIO(png()), "red.png"), "num_colors": "1"}
@@ -0,0 +1,165 @@
+import io
+import json
+import pytest
+
+
+def test_streamed_batch_reads_every_upload(client, png):
+    response = client.post(
+        "/api/analyze-batch?stream=1",
+        data={
+            "images": [
+                (io.BytesIO(png(20, 20)), "red.png"),
+                (io.BytesIO(png(20, 10, (255, 0, 0))), "blue.png"),
+                (io.BytesIO(b"text"), "notes.txt"),
+            ],
+            "num_colors": "1",
+        },
+    )
+
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.data.splitlines()]
+    assert [result.get("error") for result in results] == [
+        None,
+        None,
+        "File type not allowed",
+    ]
+    assert results[0]["dominantColors"][0]["hex"] == "#ff0000"
+    assert results[1]["dominantColors"][0]["hex"] == "#0000ff"
+    assert (results[1]["width"], results[1]["height"]) == (20, 10)
+
+
+def test_negotiated_responses_vary_on_accept(client, png):
+    upload = client.post(
+        "/api/upload",
+        data={"image": (io.BytesIO(png(20, 20)), "red.png"), "num_colors": "1"},
+    )
+    capabilities = client.get("/api/capabilities")
+
+    assert "Accept" in upload.headers["Vary"]
+    assert "Accept" not in capabilities.headers.get("Vary", "")
+
+
+def test_search_by_palette_rejects_invalid_top_k(client):
+    response = client.post(
+        "/api/search-by-palette", json={"colors": ["#ff0000"], "top_k": "many"}
+    )
+
+    assert response.status_code == 400
+
+
+def test_harmony_ignores_palette_weights(client):
+    palette = [
+        {"hex": "#ff0000", "percentage": 0},
+        {"rgb": {"r": 0, "g": 0, "b": 255}, "percentage": 0},
+    ]
+
+    response = client.post(
+        "/api/harmony", json={"palette": palette, "schemes": ["complementary"]}
+    )
+
+    assert response.status_code == 200
+    assert response.json["palette"] == ["#ff0000", "#0000ff"]
+
+
+def test_progressive_upload_holds_admission_until_the_stream_ends(
+    client, app_module, monkeypatch, png
+):
+    in_flight = []
+    updates = app_module.iter_progressive_palettes
+
+    def watched_updates(*args, **kwargs):
+        for update in updates(*args, **kwargs):
+            in_flight.append(app_module.admission.stats()["in_flight"])
+            yield update
+
+    monkeypatch.setattr(app_module, "iter_progressive_palettes", watched_updates)
+    response = client.post(
+        "/api/upload",
+        data={
+            "image": (io.BytesIO(png(64, 64)), "red.png"),
+            "num_colors": "1",
+            "progressive": "1",
+        },
+    )
+
+    lines = response.data.splitlines()
+    assert json.loads(lines[-1])["final"]
+    assert in_flight and set(in_flight) == {1}
+
+    # The server closes the response once it has been sent
+    response.close()
+    assert app_module.admission.stats()["in_flight"] == 0
+
+
+def test_progressive_upload_rejects_an_empty_rect(client, app_module, png):
+    response = client.post(
+        "/api/upload",
+        data={
+            "image": (io.BytesIO(png(64, 64)), "red.png"),
+            "progressive": "1",
+            "rect": "0,0,0,0",
+        },
+    )
+
+    assert response.status_code == 400
+    assert "positive" in response.json["error"]
+    assert app_module.admission.stats()["in_flight"] == 0
+
+
+def test_progressive_upload_rejects_a_mismatched_mask(client, png):
+    response = client.post(
+        "/api/upload",
+        data={
+            "image": (io.BytesIO(png(64, 64)), "red.png"),
+            "mask": (io.BytesIO(png(32, 32, (255, 255, 255))), "mask.png"),
+            "progressive": "1",
+        },
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Mask is 32x32, image is 64x64"
+
+
+@pytest.mark.parametrize(
+    "endpoint, field",
+    [
+        ("/api/analyze-batch", "images"),
+        ("/api/palette-index", "image"),
+        ("/api/search-by-palette", "image"),
+        ("/api/match-palette", "image"),
+    ],
+)
+def test_image_endpoints_go_through_admission(
+    client, app_module, monkeypatch, endpoint, field, png
+):
+    monkeypatch.setattr(app_module.admission, "max_in_flight", 0)
+
+    response = client.post(
+        endpoint,
+        data={field: (io.BytesIO(png(20, 20)), "red.png"), "reference": "[]"},
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_conditional_color_request_skips_computation(client, app_module, monkeypatch):
+    calls = []
+    classify_color = app_module.classify_color
+
+    def counted_classify_color(color):
+        calls.append(color)
+        return classify_color(color)
+
+    monkeypatch.setattr(app_module, "classify_color", counted_classify_color)
+
+    response = client.get("/api/colors/ff8800")
+    assert response.status_code == 200
+    assert calls == ["#ff8800"]
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/colors/ff8800", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.data == b""
+    assert calls == ["#ff8800"]
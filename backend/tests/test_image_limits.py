@@ -0,0 +1,132 @@
+import io
+import os
+import pytest
+from PIL import Image
+
+
+def bomb_png(width, height):
+    """A bilevel PNG of one color: a few KB on disk, width x height decoded."""
+    buffer = io.BytesIO()
+    Image.new("1", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def bomb():
+    # 64 MP, over the default 40 MP limit but under Pillow's own bomb check
+    return bomb_png(8000, 8000)
+
+
+@pytest.fixture(scope="module")
+def huge_bomb():
+    # 400 MP, large enough for Pillow to refuse to open it
+    return bomb_png(20000, 20000)
+
+
+@pytest.mark.parametrize("endpoint", ["/api/upload", "/api/analyze"])
+def test_oversized_image_is_rejected(client, bomb, endpoint):
+    response = client.post(endpoint, data={"image": (io.BytesIO(bomb), "bomb.png")})
+
+    assert response.status_code == 413
+    assert "limit is 40.0 MP" in response.json["error"]
+
+
+def test_image_pillow_refuses_to_open_is_rejected(client, app_module, huge_bomb):
+    response = client.post(
+        "/api/analyze", data={"image": (io.BytesIO(huge_bomb), "bomb.png")}
+    )
+
+    assert response.status_code == 413
+    assert os.listdir(app_module.app.config["UPLOAD_FOLDER"]) == []
+
+
+@pytest.mark.parametrize("endpoint", ["/api/upload", "/api/analyze"])
+def test_asgi_rejects_oversized_image(asgi_client, bomb, endpoint):
+    response = asgi_client.post(
+        endpoint, files={"image": ("bomb.png", bomb, "image/png")}
+    )
+
+    assert response.status_code == 413
+    assert "limit is 40.0 MP" in response.json()["error"]
+
+
+@pytest.mark.parametrize("endpoint", ["/api/upload", "/api/analyze"])
+def test_non_image_upload_is_rejected_by_both_apps(client, asgi_client, endpoint):
+    flask_response = client.post(
+        endpoint, data={"image": (io.BytesIO(b"not an image"), "fake.png")}
+    )
+    asgi_response = asgi_client.post(
+        endpoint, files={"image": ("fake.png", b"not an image", "image/png")}
+    )
+
+    assert flask_response.status_code == asgi_response.status_code == 400
+    assert (
+        flask_response.json == asgi_response.json() == {"error": "Invalid image file"}
+    )
+
+
+def test_file_signature_checks_the_limit_before_decoding(tmp_path, bomb, monkeypatch):
+    from utils import perceptual_hash
+    from utils.image_processor import ImageTooLargeError
+
+    path = tmp_path / "bomb.png"
+    path.write_bytes(bomb)
+    decoded = []
+    monkeypatch.setattr(
+        perceptual_hash.cv2, "imread", lambda *args: decoded.append(args)
+    )
+
+    with pytest.raises(ImageTooLargeError):
+        perceptual_hash.file_signature(str(path), max_pixels=40_000_000)
+    assert decoded == []
+
+
+def test_analyze_rejects_a_rect_outside_the_image(client):
+    response = client.post(
+        "/api/analyze",
+        data={
+            "image": (io.BytesIO(bomb_png(20, 20)), "small.png"),
+            "rect": "500,500,10,10",
+        },
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Rectangle lies outside the image"
+
+
+def test_reduced_jpeg_keeps_a_full_size_mask(client, app_module, monkeypatch):
+    # Red left half, blue right half; the mask keeps the blue half
+    image = Image.new("RGB", (200, 100), (255, 0, 0))
+    image.paste((0, 0, 255), (100, 0, 200, 100))
+    jpeg = io.BytesIO()
+    image.save(jpeg, format="JPEG", quality=95)
+    mask = Image.new("L", (200, 100))
+    mask.paste(255, (100, 0, 200, 100))
+    mask_png = io.BytesIO()
+    mask.save(mask_png, format="PNG")
+    monkeypatch.setitem(app_module.app.config, "MAX_IMAGE_PIXELS", 10_000)
+
+    response = client.post(
+        "/api/analyze",
+        data={
+            "image": (io.BytesIO(jpeg.getvalue()), "halves.jpg"),
+            "mask": (io.BytesIO(mask_png.getvalue()), "mask.png"),
+            "num_colors": "1",
+        },
+    )
+
+    assert response.status_code == 200
+    rgb = response.json["dominantColors"][0]["rgb"]
+    assert rgb["b"] > 200 and rgb["r"] < 50
+
+
+def test_odd_sized_jpeg_is_decoded_within_the_limit():
+    from utils.image_processor import process_image
+
+    jpeg = io.BytesIO()
+    Image.new("RGB", (77, 101)).save(jpeg, format="JPEG")
+    jpeg.seek(0)
+
+    image = process_image(jpeg, max_pixels=4000)
+
+    assert image.shape[:2] == (51, 39)
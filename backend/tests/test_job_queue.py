@@ -0,0 +1,56 @@
+import time
+import pytest
+from utils.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"), max_attempts=2, lease_seconds=60)
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"not really an image")
+    return str(path)
+
+
+def expire_leases(queue):
+    conn = queue._connect()
+    try:
+        conn.execute(
+            "UPDATE tasks SET claimed_at = ? WHERE status = 'running'",
+            (time.time() - queue.lease_seconds - 1,),
+        )
+    finally:
+        conn.close()
+
+
+def test_expired_lease_is_reclaimed_until_max_attempts(queue, image_path):
+    job = queue.submit([image_path])
+
+    # A worker that crashes never completes its tasks, so the lease expires
+    assert len(queue.claim_tasks()) == 1
+    expire_leases(queue)
+    assert len(queue.claim_tasks()) == 1
+    expire_leases(queue)
+    assert queue.claim_tasks() == []
+
+    status = queue.get_job(job["id"])
+    assert status["failed"] == 1
+    assert status["status"] == "completed"
+
+
+def test_resubmitting_a_job_retries_failed_tasks(queue, image_path):
+    job = queue.submit([image_path])
+    for _ in range(queue.max_attempts):
+        ((task_id, _, content_hash, num_colors),) = queue.claim_tasks()
+        queue.complete_tasks([(task_id, content_hash, num_colors, None, "boom")])
+    assert queue.get_job(job["id"])["failed"] == 1
+
+    resubmitted = queue.submit([image_path])
+
+    assert resubmitted["id"] == job["id"]
+    assert resubmitted["failed"] == 0
+    assert resubmitted["pending"] == 1
+    assert len(queue.claim_tasks()) == 1
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+from utils.palette_index import PaletteIndex, SharedPaletteIndex
+
+
+def test_additions_are_appended_and_seen_by_other_processes(tmp_path):
+    first = SharedPaletteIndex(str(tmp_path), compact_every=100)
+    second = SharedPaletteIndex(str(tmp_path), compact_every=100)
+
+    first.add("red", ["#ff0000"])
+    second.add("blue", ["#0000ff"])
+
+    # Nothing is rewritten until the log reaches compact_every entries
+    assert not os.path.exists(tmp_path / "ids.json")
+    assert first.search(["#0000ff"], top_k=1)[0]["id"] == "blue"
+    assert second.search(["#ff0000"], top_k=1)[0]["id"] == "red"
+    assert len(first) == len(second) == 2
+
+
+def test_log_is_compacted_into_the_saved_arrays(tmp_path):
+    first = SharedPaletteIndex(str(tmp_path), compact_every=3)
+    second = SharedPaletteIndex(str(tmp_path), compact_every=3)
+    second.add("black", ["#000000"])
+
+    first.add("red", ["#ff0000"])
+    first.add("green", ["#00ff00"])
+
+    assert (tmp_path / "additions.jsonl").read_text() == ""
+    saved = PaletteIndex.load(str(tmp_path))
+    assert sorted(saved.ids) == ["black", "green", "red"]
+
+    # The other process reloads after the compaction
+    second.add("red", ["#ff8080"])
+    results = second.search(["#ff8080"], top_k=3)
+    assert results[0]["id"] == "red"
+    assert results[0]["colors"][0]["hex"] == "#ff8080"
+    assert len(second) == 3
+
+
+def random_palettes(rng, count):
+    return [
+        [f"#{value:06x}" for value in rng.integers(0, 1 << 24, size=3)]
+        for _ in range(count)
+    ]
+
+
+def test_additions_are_searched_without_rebuilding_the_tree(tmp_path):
+    rng = np.random.default_rng(0)
+    index = PaletteIndex(brute_force_limit=0)
+    for i, colors in enumerate(random_palettes(rng, 200)):
+        index.add(i, colors)
+    index.materialize()
+    index.search(["#808080"])
+    tree = index._tree
+
+    # One new palette and one replacement of a stored palette
+    index.add("new", ["#123456"])
+    index.add("7", ["#fedcba"])
+
+    assert len(index) == 201
+    assert index.search(["#123456"], top_k=1)[0]["id"] == "new"
+    replaced = index.search(["#fedcba"], top_k=1, candidates=10000)[0]
+    assert replaced["id"] == "7"
+    assert replaced["colors"][0]["hex"] == "#fedcba"
+    assert index._tree is tree
+
+    expected = index.search(["#a0a0a0"], top_k=5, candidates=10000)
+    index.materialize()
+    assert index.search(["#a0a0a0"], top_k=5, candidates=10000) == expected
+    assert len(index) == 201
@@ -0,0 +1,35 @@
+import pytest
+from utils.palette_matching import ReferencePalette, match_palette
+
+
+def test_dominant_colors_are_assigned_when_reference_is_smaller():
+    colors = [
+        {"hex": "#202020", "percentage": 10},
+        {"hex": "#101010", "percentage": 90},
+    ]
+
+    result = match_palette(colors, ReferencePalette(["#000000"]))
+
+    assert [entry["color"] for entry in result["assignment"]] == ["#101010"]
+    assert result["assignment"][0]["weight"] == pytest.approx(0.9)
+
+
+def test_least_important_colors_stay_unassigned():
+    colors = [
+        {"hex": "#ff0000", "percentage": 40},
+        {"hex": "#fe0000", "percentage": 5},
+        {"hex": "#0000ff", "percentage": 30},
+        {"hex": "#00ff00", "percentage": 25},
+    ]
+    reference = ReferencePalette(["#ff0000", "#0000ff", "#fe0101"])
+
+    result = match_palette(colors, reference)
+
+    assignment = {entry["color"]: entry["matchColor"] for entry in result["assignment"]}
+    assert assignment == {
+        "#ff0000": "#ff0000",
+        "#0000ff": "#0000ff",
+        "#00ff00": "#fe0101",
+    }
+    assert [entry["index"] for entry in result["assignment"]] == [0, 2, 3]
+    assert len(result["nearest"]) == 4
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import pytest
+from utils.profiling import ProfileStore
+
+
+def test_profiling_requires_the_token(client, app_module, monkeypatch, upload):
+    monkeypatch.setitem(app_module.app.config, "PROFILE_TOKEN", "")
+
+    # Test clients are on 127.0.0.1, like every client behind a local proxy
+    response = client.post("/api/upload?profile=text", data=upload())
+    assert response.is_json
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/api/profiles/slow").status_code == 403
+
+    monkeypatch.setitem(app_module.app.config, "PROFILE_TOKEN", "secret")
+    headers = {"X-Profile-Token": "wrong"}
+    assert client.get("/api/profiles/slow", headers=headers).status_code == 403
+
+
+def test_profile_is_stored_with_the_token(client, app_module, monkeypatch, upload):
+    monkeypatch.setitem(app_module.app.config, "PROFILE_TOKEN", "secret")
+    headers = {"X-Profile-Token": "secret"}
+
+    response = client.post("/api/upload?profile=1", data=upload(), headers=headers)
+    profile_id = response.headers["X-Profile-Id"]
+
+    report = client.get(f"/api/profiles/{profile_id}?format=text", headers=headers)
+    assert report.status_code == 200
+    assert client.get(f"/api/profiles/{profile_id}").status_code == 403
+
+
+def test_asgi_requests_enter_the_slow_log(asgi_client, app_module, monkeypatch, upload):
+    recorded = []
+    monkeypatch.setattr(
+        app_module.profile_store,
+        "record",
+        lambda duration, details, profile_id=None: recorded.append(details),
+    )
+
+    form = upload()
+    image = form.pop("image")
+    response = asgi_client.post(
+        "/api/upload", data=form, files={"image": (image[1], image[0])}
+    )
+
+    assert response.status_code == 200
+    assert recorded[-1]["path"] == "/api/upload"
+    assert recorded[-1]["imageSize"] == [20, 20]
+    assert recorded[-1]["params"] == {"num_colors": "1"}
+
+
+def test_asgi_profile_requests_are_served_by_flask(
+    asgi_client, app_module, monkeypatch, upload
+):
+    monkeypatch.setitem(app_module.app.config, "PROFILE_TOKEN", "secret")
+    form = upload()
+    image = form.pop("image")
+
+    response = asgi_client.post(
+        "/api/upload?profile=1",
+        data=form,
+        files={"image": (image[1], image[0])},
+        headers={"X-Profile-Token": "secret"},
+    )
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" in response.headers
+
+
+def test_profiles_of_stopped_processes_are_removed(tmp_path):
+    # A process id that is no longer running
+    finished = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        text=True,
+    )
+    stopped_dir = tmp_path / finished.stdout.strip()
+    running_dir = tmp_path / str(os.getppid())
+    for directory in (stopped_dir, running_dir):
+        directory.mkdir()
+        (directory / "old.prof").write_bytes(b"")
+
+    ProfileStore(str(tmp_path))
+
+    assert not stopped_dir.exists()
+    assert running_dir.exists()
@@ -0,0 +1,145 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# Target 95th percentile request latency in seconds
+DEFAULT_SLO_P95 = 1.0
+
+# Seconds between quality adjustments driven by latency
+DEFAULT_ADJUST_INTERVAL = 1.0
+
+# Latency below this fraction of the target allows a step back up
+DEFAULT_RECOVERY_RATIO = 0.5
+
+# Requests measured before latency may change the tier
+MIN_SAMPLES = 3
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a request arrives while max_in_flight requests are running."""
+
+
+class AdmissionController:
+    """
+    Pick an extraction quality tier for each request from the current load.
+
+    Two signals set the tier, and the cheaper of the two wins:
+
+    - Concurrency: every ``concurrency`` requests already in flight beyond
+      the first batch step one tier down, so a burst degrades immediately.
+    - Latency: once per ``adjust_interval`` the 95th percentile of the
+      requests finished since the last adjustment is compared with the SLO.
+      Above it the latency level steps down one tier per doubling of the
+      target; below ``recovery_ratio`` times the SLO it steps back up one.
+
+    Requests beyond ``max_in_flight`` are rejected with OverloadedError.
+    """
+
+    def __init__(
+        self,
+        tiers,
+        slo_p95=DEFAULT_SLO_P95,
+        concurrency=4,
+        max_in_flight=64,
+        adjust_interval=DEFAULT_ADJUST_INTERVAL,
+        recovery_ratio=DEFAULT_RECOVERY_RATIO,
+        enabled=True,
+    ):
+        """
+        Args:
+            tiers (sequence): Tier names from most to least expensive
+            slo_p95 (float): Target 95th percentile latency in seconds
+            concurrency (int): In-flight requests served per tier step
+            max_in_flight (int): Requests admitted at once, or None for no limit
+            adjust_interval (float): Seconds between latency-driven changes
+            recovery_ratio (float): Fraction of the SLO below which quality
+                is raised again
+            enabled (bool): If False, always pick the first tier
+        """
+        self.tiers = tuple(tiers)
+        self.slo_p95 = slo_p95
+        self.concurrency = max(int(concurrency), 1)
+        self.max_in_flight = max_in_flight
+        self.adjust_interval = adjust_interval
+        self.recovery_ratio = recovery_ratio
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latency_level = 0
+        self._samples = []
+        self._last_adjust = time.monotonic()
+        self._tier_counts = dict.fromkeys(self.tiers, 0)
+        self._rejected = 0
+        self._last_p95 = None
+
+    def _level(self):
+        if not self.enabled:
+            return 0
+        concurrency_level = max(self._in_flight - 1, 0) // self.concurrency
+        level = max(concurrency_level, self._latency_level)
+        return min(level, len(self.tiers) - 1)
+
+    def _adjust(self, now):
+        """Move the latency level based on requests since the last change."""
+        if now - self._last_adjust < self.adjust_interval:
+            return
+        if len(self._samples) < MIN_SAMPLES:
+            return
+        p95 = float(np.percentile(self._samples, 95))
+        self._last_p95 = p95
+        if p95 > self.slo_p95:
+            steps = max(math.ceil(math.log2(p95 / self.slo_p95)), 1)
+            self._latency_level = min(self._latency_level + steps, len(self.tiers) - 1)
+        elif p95 < self.slo_p95 * self.recovery_ratio:
+            self._latency_level = max(self._latency_level - 1, 0)
+        # Judge the next interval only on requests served at the new level
+        self._samples = []
+        self._last_adjust = now
+
+    @contextmanager
+    def admit(self):
+        """
+        Admit a request for the duration of the with block
+
+        Yields:
+            str: Quality tier to use for this request
+
+        Raises:
+            OverloadedError: If max_in_flight requests are already running
+        """
+        with self._lock:
+            if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+                self._rejected += 1
+                raise OverloadedError("Server is overloaded, try again later")
+            self._in_flight += 1
+            tier = self.tiers[self._level()]
+            self._tier_counts[tier] += 1
+
+        start = time.monotonic()
+        try:
+            yield tier
+        finally:
+            now = time.monotonic()
+            with self._lock:
+                self._in_flight -= 1
+                self._samples.append(now - start)
+                self._adjust(now)
+
+    def stats(self):
+        """Current load, tier and per-tier request counts."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": self._in_flight,
+                "tier": self.tiers[self._level()],
+                "latency_level": self._latency_level,
+                "last_p95_ms": (
+                    self._last_p95 * 1000 if self._last_p95 is not None else None
+                ),
+                "slo_p95_ms": self.slo_p95 * 1000,
+                "tier_counts": dict(self._tier_counts),
+                "rejected": self._rejected,
+            }
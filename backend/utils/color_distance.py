@@ -2,6 +2,16 @@ import math
 import numpy as np
 from backend.utils.color_utils import hex_to_rgb
 
+# sRGB to XYZ matrix and D65 reference white used by rgb_to_lab
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124, 0.3576, 0.1805],
+        [0.2126, 0.7152, 0.0722],
+        [0.0193, 0.1192, 0.9505],
+    ]
+)
+_D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
 
 class ColorDistance:
     """
@@ -98,6 +108,51 @@ class ColorDistance:
         else:
             return (7.787 * value) + (16 / 116)
 
+    @staticmethod
+    def rgb_to_lab_array(rgb):
+        """
+        Vectorized version of rgb_to_lab for many colors at once.
+
+        Args:
+            rgb: Array-like of RGB values with shape (..., 3)
+
+        Returns:
+            numpy.ndarray: L*a*b* values with the same shape as the input
+        """
+        rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+
+        # Apply gamma correction
+        rgb = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+
+        # Convert to XYZ and normalize with reference white point (D65)
+        xyz = rgb @ _RGB_TO_XYZ.T / _D65_WHITE
+
+        # Convert XYZ to L*a*b*
+        f = np.where(xyz > 0.008856, np.cbrt(xyz), (7.787 * xyz) + (16 / 116))
+
+        L = np.maximum(0, 116 * f[..., 1] - 16)
+        a = 500 * (f[..., 0] - f[..., 1])
+        b = 200 * (f[..., 1] - f[..., 2])
+
+        return np.stack([L, a, b], axis=-1)
+
+    @staticmethod
+    def pairwise_delta_e_cie76(lab1, lab2):
+        """
+        Calculate the CIE76 Delta E between every pair of two sets of colors.
+
+        Args:
+            lab1: L*a*b* colors with shape (N, 3)
+            lab2: L*a*b* colors with shape (M, 3)
+
+        Returns:
+            numpy.ndarray: Distance matrix with shape (N, M)
+        """
+        lab1 = np.asarray(lab1, dtype=np.float64)
+        lab2 = np.asarray(lab2, dtype=np.float64)
+        diff = lab1[:, None, :] - lab2[None, :, :]
+        return np.sqrt((diff**2).sum(axis=-1))
+
     @staticmethod
     def delta_e_cie76(rgb1, rgb2):
         """
@@ -65,6 +65,29 @@ def hex_to_rgb(hex_color):
     return tuple(int(hex_color[i : i + 2], 16) for i in (0, 2, 4))
 
 
+def normalize_hex(hex_color):
+    """
+    Canonical form of a hex color code
+
+    Args:
+        hex_color (str): Hex color code with 3 or 6 digits, with or without '#'
+
+    Returns:
+        str: Lowercase 6-digit hex color code with '#' prefix
+
+    Raises:
+        ValueError: If hex_color is not a valid hex color code
+    """
+    digits = hex_color[1:] if hex_color.startswith("#") else hex_color
+    if len(digits) == 3:
+        digits = "".join(digit * 2 for digit in digits)
+    if len(digits) != 6 or any(
+        digit not in "0123456789abcdefABCDEF" for digit in digits
+    ):
+        raise ValueError(f"Invalid hex color: {hex_color}")
+    return "#" + digits.lower()
+
+
 def color_distance(color1, color2):
     """
     Calculate Euclidean distance between two colors
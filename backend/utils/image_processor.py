@@ -2,23 +2,141 @@ import cv2
 import numpy as np
 import os
 import io
+import ipaddress
+import socket
+import warnings
+from urllib.parse import urljoin, urlparse
 from PIL import Image
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "bmp", "webp"}
 
+# Pixels with a lower alpha value are treated as background
+ALPHA_THRESHOLD = 128
+
+# Formats whose decoders can scale down by 2, 4 or 8 while decoding (JPEG DCT
+# scaling), so oversized images can be read without a full-size buffer
+REDUCIBLE_FORMATS = {"JPEG", "MPO"}
+REDUCED_READ_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+# Seconds allowed for connecting to and reading from an image URL
+URL_FETCH_TIMEOUT = 10.0
+
+# Redirects followed when fetching an image URL (each target is validated)
+URL_MAX_REDIRECTS = 5
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image has more pixels than allowed and cannot be reduced."""
+
 
 def allowed_file(filename):
     """Check if file has an allowed extension."""
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def process_image(image_input, get_dimensions_only=False):
+def probe_image(image_input):
+    """Read image dimensions and format from the header without decoding.
+
+    Args:
+        image_input: A file path or a seekable file object
+
+    Returns:
+        dict: width, height, pixels and format of the image
+    """
+    position = None if isinstance(image_input, str) else image_input.tell()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            # Image.open only parses the header; pixels are decoded on load()
+            with Image.open(image_input) as img:
+                width, height = img.size
+                image_format = img.format
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    finally:
+        if position is not None:
+            image_input.seek(position)
+
+    return {
+        "width": width,
+        "height": height,
+        "pixels": width * height,
+        "format": image_format,
+    }
+
+
+def decode_reduction(info, max_pixels):
+    """Pick the decode-time scale factor needed to stay within a pixel limit.
+
+    Args:
+        info: Result of probe_image
+        max_pixels: Maximum number of decoded pixels, or None for no limit
+
+    Returns:
+        int: 1 if the image fits, otherwise 2, 4 or 8 for reducible formats
+
+    Raises:
+        ImageTooLargeError: If the image cannot be decoded within the limit
+    """
+    if max_pixels is None or info["pixels"] <= max_pixels:
+        return 1
+
+    if info["format"] in REDUCIBLE_FORMATS:
+        for factor in REDUCED_READ_FLAGS:
+            reduced = -(-info["width"] // factor) * -(-info["height"] // factor)
+            if reduced <= max_pixels:
+                return factor
+
+    raise ImageTooLargeError(
+        f"Image is {info['width']}x{info['height']} "
+        f"({info['pixels'] / 1e6:.1f} MP), limit is {max_pixels / 1e6:.1f} MP"
+    )
+
+
+def read_image(file_path, max_pixels=None):
+    """Read an image file with OpenCV, enforcing a decoded pixel limit.
+
+    The header is probed first, so oversized files are rejected or read at
+    reduced resolution before any full-size buffer is allocated.
+
+    Args:
+        file_path: Path to the image file
+        max_pixels: Maximum number of decoded pixels, or None for no limit
+
+    Returns:
+        Image array in OpenCV channel order (alpha kept when present)
+    """
+    reduction = 1
+    if max_pixels is not None:
+        reduction = decode_reduction(probe_image(file_path), max_pixels)
+
+    if reduction == 1:
+        image = cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+    else:
+        image = cv2.imread(file_path, REDUCED_READ_FLAGS[reduction])
+
+    if image is None:
+        raise ValueError(f"Could not read image: {file_path}")
+    if image.dtype == np.uint16:
+        image = (image // 257).astype(np.uint8)
+    return image
+
+
+def process_image(image_input, get_dimensions_only=False, max_pixels=None):
     """Process uploaded image file or path.
 
     Args:
         image_input: Either a file object from request.files or a file path
-        get_dimensions_only: If True, only returns dimensions without full processing
+        get_dimensions_only: If True, only returns dimensions from the header
+            without decoding the image
+        max_pixels: Maximum number of decoded pixels; larger JPEGs are
+            decoded at reduced resolution and other images are rejected
 
     Returns:
         Processed image or dimensions (height, width) if get_dimensions_only is True
@@ -26,10 +144,15 @@ def process_image(image_input, get_dimensions_only=False):
     # Handle file object vs. file path
     if isinstance(image_input, str):
         # It's a file path
-        image = cv2.imread(image_input)
         if get_dimensions_only:
-            height, width = image.shape[:2]
-            return height, width
+            info = probe_image(image_input)
+            return info["height"], info["width"]
+        reduction = 1
+        if max_pixels is not None:
+            reduction = decode_reduction(probe_image(image_input), max_pixels)
+        image = cv2.imread(
+            image_input, REDUCED_READ_FLAGS.get(reduction, cv2.IMREAD_COLOR)
+        )
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         return image
     else:
@@ -37,9 +160,23 @@ def process_image(image_input, get_dimensions_only=False):
         in_memory_file = io.BytesIO(image_input.read())
         image_input.seek(0)  # Reset file pointer for potential reuse
 
-        img = Image.open(in_memory_file)
+        info = probe_image(in_memory_file)
         if get_dimensions_only:
-            return img.height, img.width
+            return info["height"], info["width"]
+        reduction = decode_reduction(info, max_pixels)
+
+        img = Image.open(in_memory_file)
+        if reduction > 1:
+            # JPEG draft mode scales down during decoding; it only picks a
+            # scale whose output is at least the requested size, so request
+            # the rounded-down size to get the full reduction for odd sides
+            img.draft("RGB", (img.width // reduction, img.height // reduction))
+
+        # Normalize palette/grayscale modes, keeping transparency as RGBA
+        if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+            img = img.convert("RGBA")
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
 
         # Convert PIL Image to numpy array (OpenCV format)
         image = np.array(img)
@@ -51,6 +188,111 @@ def process_image(image_input, get_dimensions_only=False):
         return image
 
 
+def select_pixels(image, alpha_threshold=ALPHA_THRESHOLD, mask=None, rect=None):
+    """Select the pixels that should be clustered.
+
+    Uses a single vectorized boolean index over the image instead of
+    copying pixels one by one.
+
+    Args:
+        image: Image array (height, width), (height, width, 3) or
+            (height, width, 4) with alpha in the last channel
+        alpha_threshold: Minimum alpha (0-255) to keep a pixel, or None to
+            ignore the alpha channel
+        mask: Optional boolean array (height, width); False pixels are dropped
+        rect: Optional (x, y, width, height) region; pixels outside are dropped
+
+    Returns:
+        Array of shape (N, 3) with the color channels of the kept pixels
+    """
+    if image.ndim == 2:
+        image = np.repeat(image[:, :, None], 3, axis=2)
+
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != image.shape[:2]:
+            raise ValueError(
+                f"Mask shape {mask.shape} does not match image {image.shape[:2]}"
+            )
+
+    # Cropping is a view, so the rectangle costs nothing before indexing
+    if rect is not None:
+        x, y, w, h = (int(v) for v in rect)
+        if w <= 0 or h <= 0:
+            raise ValueError("Rectangle width and height must be positive")
+        x, y = max(x, 0), max(y, 0)
+        image = image[y : y + h, x : x + w]
+        if mask is not None:
+            mask = mask[y : y + h, x : x + w]
+
+    keep = mask
+    if image.shape[2] == 4 and alpha_threshold is not None:
+        opaque = image[:, :, 3] >= alpha_threshold
+        keep = opaque if keep is None else keep & opaque
+
+    colors = image[:, :, :3]
+    if keep is None:
+        return colors.reshape(-1, 3)
+    return colors[keep]
+
+
+def fit_pixel_selection(options, info, shape=None):
+    """Check a mask and rectangle against an image and map them onto its
+    decoded grid.
+
+    Large JPEGs are decoded at reduced resolution, so a mask or rectangle
+    given at the header dimensions is scaled down to the decoded shape.
+
+    Args:
+        options: Pixel selection options (see extract_dominant_colors)
+        info: Result of probe_image for the original image
+        shape: (height, width) of the decoded image, if it differs from
+            the header dimensions
+
+    Returns:
+        dict: Options with the mask and rectangle on the decoded grid
+
+    Raises:
+        ValueError: If the mask does not match the image or the rectangle
+            selects no pixels
+    """
+    options = dict(options)
+    width, height = info["width"], info["height"]
+    decoded_height, decoded_width = shape[:2] if shape is not None else (height, width)
+
+    mask = options.get("mask")
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (height, width):
+            raise ValueError(
+                f"Mask is {mask.shape[1]}x{mask.shape[0]}, image is {width}x{height}"
+            )
+        if mask.shape != (decoded_height, decoded_width):
+            mask = cv2.resize(
+                mask.astype(np.uint8),
+                (decoded_width, decoded_height),
+                interpolation=cv2.INTER_NEAREST,
+            ).astype(bool)
+        options["mask"] = mask
+
+    rect = options.get("rect")
+    if rect is not None:
+        x, y, w, h = (int(v) for v in rect)
+        if w <= 0 or h <= 0:
+            raise ValueError("Rectangle width and height must be positive")
+        if x >= width or y >= height or x + w <= 0 or y + h <= 0:
+            raise ValueError("Rectangle lies outside the image")
+        scale_x, scale_y = decoded_width / width, decoded_height / height
+        options["rect"] = (
+            int(x * scale_x),
+            int(y * scale_y),
+            max(int(np.ceil(w * scale_x)), 1),
+            max(int(np.ceil(h * scale_y)), 1),
+        )
+
+    return options
+
+
 def resize_image(image, max_size=800):
     """Resize image while maintaining aspect ratio."""
     height, width = image.shape[:2]
@@ -60,3 +302,65 @@ def resize_image(image, max_size=800):
         new_height = int(height * scale)
         return cv2.resize(image, (new_width, new_height))
     return image
+
+
+def validate_image_url(url, allow_private=False):
+    """Check that an image URL is http(s) and points at a public address.
+
+    Resolves the host name, so call it off the event loop in async code.
+
+    Raises:
+        ValueError: If the URL is malformed, uses another scheme or resolves
+            to a private, loopback or link-local address
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("Image URL must be an http or https URL")
+    if allow_private:
+        return
+    try:
+        addresses = socket.getaddrinfo(parsed.hostname, parsed.port or 0)
+    except socket.gaierror:
+        raise ValueError("Image URL host could not be resolved")
+    for address in addresses:
+        ip = ipaddress.ip_address(address[4][0])
+        if not ip.is_global:
+            raise ValueError("Image URL must point to a public address")
+
+
+def fetch_image_url(url, max_bytes, timeout=URL_FETCH_TIMEOUT, allow_private=False):
+    """Download an image URL into memory, stopping once max_bytes is exceeded.
+
+    Returns:
+        io.BytesIO: The downloaded bytes
+
+    Raises:
+        ValueError: If the URL is not allowed or the download fails
+        ImageTooLargeError: If the response is larger than max_bytes
+    """
+    import requests
+
+    try:
+        for _ in range(URL_MAX_REDIRECTS + 1):
+            validate_image_url(url, allow_private)
+            response = requests.get(
+                url, stream=True, timeout=timeout, allow_redirects=False
+            )
+            if not response.is_redirect:
+                break
+            response.close()
+            url = urljoin(url, response.headers["Location"])
+        else:
+            raise ValueError("Image URL redirected too many times")
+
+        with response:
+            response.raise_for_status()
+            data = io.BytesIO()
+            for chunk in response.iter_content(64 * 1024):
+                data.write(chunk)
+                if data.tell() > max_bytes:
+                    raise ImageTooLargeError("Image download exceeds the size limit")
+    except requests.RequestException as e:
+        raise ValueError(f"Could not fetch image URL: {e}")
+    data.seek(0)
+    return data
@@ -0,0 +1,479 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    num_colors TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_job ON tasks (job_id, seq);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, claimed_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_hash ON tasks (content_hash);
+CREATE TABLE IF NOT EXISTS palettes (
+    content_hash TEXT NOT NULL,
+    num_colors TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (content_hash, num_colors)
+);
+"""
+
+
+def file_content_hash(file_path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 hash of a file without reading it into memory at once
+
+    Args:
+        file_path (str): Path to the file
+        chunk_size (int): Number of bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JobQueue:
+    """
+    Local persistent queue for asynchronous bulk palette extraction.
+
+    Jobs and their tasks live in a SQLite database, so queued work survives
+    restarts and any number of worker processes can share it. Palettes are
+    stored once per content hash, which makes resubmitting the same images
+    idempotent and lets results be paged out without holding a whole job
+    in memory.
+    """
+
+    def __init__(
+        self,
+        db_path,
+        storage_dir=None,
+        max_attempts=3,
+        lease_seconds=300,
+        chunk_size=32,
+    ):
+        """
+        Args:
+            db_path (str): Path of the SQLite database file
+            storage_dir (str): Directory where uploaded images are kept
+            max_attempts (int): Attempts per task before it is marked failed
+            lease_seconds (int): Time after which a running task is reclaimed
+            chunk_size (int): Number of tasks a worker claims and commits at once
+        """
+        self.db_path = db_path
+        self.storage_dir = storage_dir or os.path.join(
+            os.path.dirname(os.path.abspath(db_path)), "job_uploads"
+        )
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.chunk_size = chunk_size
+        self.workers = []
+        self._stop_event = None
+
+        os.makedirs(self.storage_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def store_upload(self, file_storage):
+        """
+        Save an uploaded file under its content hash
+
+        Args:
+            file_storage: File object from request.files
+
+        Returns:
+            str: Path of the stored file
+        """
+        data = file_storage.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        ext = os.path.splitext(file_storage.filename)[1].lower()
+        path = os.path.join(self.storage_dir, content_hash + ext)
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        return path
+
+    def submit(self, sources, num_colors=5):
+        """
+        Submit a set of image paths for palette extraction
+
+        The job id is derived from the content hashes and parameters, so
+        submitting the same images again returns the existing job instead
+        of queueing duplicate work. Failed tasks of an existing job are
+        queued again with a fresh attempt count.
+
+        Args:
+            sources (list): Image file paths
+            num_colors: Number of colors per image, or "auto"
+
+        Returns:
+            dict: Job status (see get_job)
+        """
+        num_colors = str(num_colors)
+        hashes = [file_content_hash(source) for source in sources]
+
+        digest = hashlib.sha256(num_colors.encode())
+        for content_hash in hashes:
+            digest.update(content_hash.encode())
+        job_id = digest.hexdigest()[:32]
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            exists = conn.execute(
+                "SELECT 1 FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if exists:
+                conn.execute(
+                    "UPDATE tasks SET status = 'pending', attempts = 0, "
+                    "claimed_at = NULL, error = NULL "
+                    "WHERE job_id = ? AND status = 'failed'",
+                    (job_id,),
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO jobs (id, num_colors, total, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (job_id, num_colors, len(sources), time.time()),
+                )
+                conn.executemany(
+                    "INSERT INTO tasks (job_id, seq, source, content_hash, status) "
+                    "VALUES (?, ?, ?, ?, "
+                    "CASE WHEN EXISTS (SELECT 1 FROM palettes "
+                    "WHERE content_hash = ? AND num_colors = ?) "
+                    "THEN 'done' ELSE 'pending' END)",
+                    (
+                        (job_id, seq, source, content_hash, content_hash, num_colors)
+                        for seq, (source, content_hash) in enumerate(
+                            zip(sources, hashes)
+                        )
+                    ),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return self.get_job(job_id)
+
+    def get_job(self, job_id):
+        """
+        Get the status and progress of a job
+
+        Args:
+            job_id (str): Job identifier
+
+        Returns:
+            dict: Job status with task counts, or None if the job does not exist
+        """
+        conn = self._connect()
+        try:
+            job = conn.execute(
+                "SELECT num_colors, total, created_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if job is None:
+                return None
+            counts = dict(
+                conn.execute(
+                    "SELECT status, COUNT(*) FROM tasks WHERE job_id = ? "
+                    "GROUP BY status",
+                    (job_id,),
+                ).fetchall()
+            )
+        finally:
+            conn.close()
+
+        pending = counts.get("pending", 0)
+        running = counts.get("running", 0)
+        if pending + running == 0:
+            status = "completed"
+        elif running or counts.get("done", 0) or counts.get("failed", 0):
+            status = "running"
+        else:
+            status = "queued"
+
+        return {
+            "id": job_id,
+            "status": status,
+            "num_colors": job[0],
+            "total": job[1],
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "pending": pending,
+            "running": running,
+            "created_at": job[2],
+        }
+
+    def iter_results(self, job_id, offset=0, limit=None, chunk_size=500):
+        """
+        Iterate over job results in submission order, one chunk at a time
+
+        Args:
+            job_id (str): Job identifier
+            offset (int): Number of results to skip
+            limit (int): Maximum number of results, or None for all
+            chunk_size (int): Number of rows fetched per query
+
+        Yields:
+            dict: Source, status, and dominant colors or error for each image
+        """
+        remaining = limit
+        conn = self._connect()
+        try:
+            while remaining is None or remaining > 0:
+                batch = chunk_size if remaining is None else min(chunk_size, remaining)
+                rows = conn.execute(
+                    "SELECT t.seq, t.source, t.status, t.error, p.result "
+                    "FROM tasks t JOIN jobs j ON j.id = t.job_id "
+                    "LEFT JOIN palettes p ON p.content_hash = t.content_hash "
+                    "AND p.num_colors = j.num_colors "
+                    "WHERE t.job_id = ? AND t.seq >= ? ORDER BY t.seq LIMIT ?",
+                    (job_id, offset, batch),
+                ).fetchall()
+                if not rows:
+                    break
+                for seq, source, status, error, result in rows:
+                    item = {"index": seq, "source": source, "status": status}
+                    if status == "done" and result is not None:
+                        item["dominant_colors"] = json.loads(result)
+                    elif status == "failed":
+                        item["error"] = error
+                    yield item
+                offset = rows[-1][0] + 1
+                if remaining is not None:
+                    remaining -= len(rows)
+        finally:
+            conn.close()
+
+    def get_results(self, job_id, offset=0, limit=100):
+        """Return one page of job results as a list (see iter_results)."""
+        return list(self.iter_results(job_id, offset=offset, limit=limit))
+
+    def claim_tasks(self, limit=None):
+        """
+        Atomically claim pending or expired tasks for processing
+
+        Running tasks whose lease expired are claimed again unless they have
+        used up max_attempts (for example because they crash their worker);
+        those are marked failed.
+
+        Args:
+            limit (int): Maximum number of tasks to claim
+
+        Returns:
+            list: Tuples of (task_id, source, content_hash, num_colors)
+        """
+        limit = limit or self.chunk_size
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = now - self.lease_seconds
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', "
+                "error = 'Lease expired on the last attempt' "
+                "WHERE status = 'running' AND claimed_at < ? AND attempts >= ?",
+                (expired, self.max_attempts),
+            )
+            rows = conn.execute(
+                "SELECT t.id, t.source, t.content_hash, j.num_colors "
+                "FROM tasks t JOIN jobs j ON j.id = t.job_id "
+                "WHERE t.status = 'pending' "
+                "OR (t.status = 'running' AND t.claimed_at < ?) "
+                "ORDER BY t.id LIMIT ?",
+                (expired, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = 'running', claimed_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                ((now, row[0]) for row in rows),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return rows
+
+    def complete_tasks(self, outcomes):
+        """
+        Record the outcome of a chunk of tasks in a single transaction
+
+        Failed tasks go back to pending until they reach max_attempts.
+
+        Args:
+            outcomes (list): Tuples of (task_id, content_hash, num_colors,
+                result, error) where exactly one of result/error is set
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for task_id, content_hash, num_colors, result, error in outcomes:
+                if error is None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO palettes "
+                        "(content_hash, num_colors, result) VALUES (?, ?, ?)",
+                        (content_hash, num_colors, json.dumps(result)),
+                    )
+                    # Finish every task waiting on the same image
+                    conn.execute(
+                        "UPDATE tasks SET status = 'done', error = NULL "
+                        "WHERE content_hash = ? AND status != 'done' AND job_id IN "
+                        "(SELECT id FROM jobs WHERE num_colors = ?)",
+                        (content_hash, num_colors),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE tasks SET error = ?, status = CASE "
+                        "WHEN attempts >= ? THEN 'failed' ELSE 'pending' END "
+                        "WHERE id = ?",
+                        (error, self.max_attempts, task_id),
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def start_workers(self, num_workers=None):
+        """
+        Start worker processes if they are not already running
+
+        Args:
+            num_workers (int): Number of processes (defaults to the CPU count)
+        """
+        self.workers = [worker for worker in self.workers if worker.is_alive()]
+        if self.workers:
+            return
+
+        num_workers = num_workers or os.cpu_count() or 1
+        self._stop_event = multiprocessing.Event()
+        for _ in range(num_workers):
+            worker = multiprocessing.Process(
+                target=run_worker,
+                args=(
+                    self.db_path,
+                    self.storage_dir,
+                    self.max_attempts,
+                    self.lease_seconds,
+                    self.chunk_size,
+                    self._stop_event,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+
+    def stop_workers(self, timeout=10):
+        """Signal worker processes to stop and wait for them to exit."""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+
+
+def run_worker(
+    db_path,
+    storage_dir=None,
+    max_attempts=3,
+    lease_seconds=300,
+    chunk_size=32,
+    stop_event=None,
+    poll_interval=0.5,
+):
+    """
+    Worker loop: claim a chunk of tasks, extract palettes, commit the chunk
+
+    Args:
+        db_path (str): Path of the SQLite database file
+        storage_dir (str): Directory where uploaded images are kept
+        max_attempts (int): Attempts per task before it is marked failed
+        lease_seconds (int): Time after which a running task is reclaimed
+        chunk_size (int): Number of tasks claimed and committed at once
+        stop_event: multiprocessing.Event that ends the loop when set
+        poll_interval (float): Sleep time in seconds when the queue is empty
+    """
+    from ml.color_extractor import apply_thread_limit, extract_dominant_colors
+
+    apply_thread_limit()
+    queue = JobQueue(db_path, storage_dir, max_attempts, lease_seconds, chunk_size)
+    worker_id = uuid.uuid4().hex[:8]
+
+    while stop_event is None or not stop_event.is_set():
+        tasks = queue.claim_tasks()
+        if not tasks:
+            time.sleep(poll_interval)
+            continue
+
+        outcomes = []
+        for task_id, source, content_hash, num_colors in tasks:
+            try:
+                colors = extract_dominant_colors(
+                    source,
+                    num_colors=num_colors if num_colors == "auto" else int(num_colors),
+                )
+                outcomes.append((task_id, content_hash, num_colors, colors, None))
+            except Exception as e:
+                outcomes.append(
+                    (task_id, content_hash, num_colors, None, f"{worker_id}: {e}")
+                )
+        queue.complete_tasks(outcomes)
+
+
+def serve_workers(db_path, num_workers=None):
+    """Run worker processes for a queue until interrupted."""
+    job_queue = JobQueue(db_path)
+    job_queue.start_workers(num_workers)
+    try:
+        for worker in job_queue.workers:
+            worker.join()
+    except KeyboardInterrupt:
+        job_queue.stop_workers()
+
+
+# Run standalone workers (from backend/): python -m utils.job_queue jobs.db
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run palette extraction workers")
+    parser.add_argument("db_path", help="Path of the job queue database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    serve_workers(args.db_path, args.workers)
@@ -0,0 +1,607 @@
+import copy
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+from sklearn.neighbors import BallTree
+from scipy.optimize import linprog
+from backend.utils.color_utils import hex_to_rgb
+from utils.color_distance import ColorDistance
+
+# Number of color slots stored per palette (extra colors are dropped)
+DEFAULT_SLOTS = 8
+
+# Above this many entries, searches use the ball tree to pick candidates
+BRUTE_FORCE_LIMIT = 20000
+
+# Rows scored per step of the brute-force scan, to bound temporary memory
+SCAN_CHUNK = 20000
+
+# Default number of nearest stored colors gathered per query (split by weight)
+CANDIDATE_BUDGET = 2000
+
+# Logged additions folded into the saved arrays at once by SharedPaletteIndex
+COMPACT_EVERY = 10000
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single development server, no file locks
+    fcntl = None
+
+
+def _color_rgb(color):
+    """Read the RGB value of a hex string, RGB list or color dict."""
+    if isinstance(color, str):
+        return hex_to_rgb(color)
+    if isinstance(color, dict):
+        if "rgb" in color:
+            rgb = color["rgb"]
+        elif "hex" in color:
+            rgb = hex_to_rgb(color["hex"])
+        else:
+            rgb = color
+        if isinstance(rgb, dict):
+            rgb = (rgb["r"], rgb["g"], rgb["b"])
+        return tuple(rgb)
+    return tuple(color)
+
+
+def _color_weight(color):
+    """Read the weight of a color dict ("percentage"); other colors weigh 1."""
+    if isinstance(color, dict):
+        return float(color.get("percentage", 1.0))
+    return 1.0
+
+
+def _color_rgb_and_weight(color):
+    """Read an (rgb, weight) pair from a hex string, RGB list or color dict."""
+    return _color_rgb(color), _color_weight(color)
+
+
+def palette_to_arrays(colors, slots=DEFAULT_SLOTS):
+    """
+    Convert a palette to fixed-length arrays
+
+    Colors are sorted by weight, truncated to ``slots`` and padded with
+    zero-weight entries. Weights are normalized to sum to 1.
+
+    Args:
+        colors (list): Colors as returned by extract_dominant_colors, hex
+            strings or RGB lists
+        slots (int): Fixed palette length
+
+    Returns:
+        tuple: (rgb uint8 (slots, 3), lab float32 (slots, 3), weights float32 (slots,))
+    """
+    pairs = [_color_rgb_and_weight(color) for color in colors]
+    pairs.sort(key=lambda pair: pair[1], reverse=True)
+    pairs = pairs[:slots]
+    if not pairs:
+        raise ValueError("Palette is empty")
+
+    rgb = np.zeros((slots, 3), dtype=np.uint8)
+    weights = np.zeros(slots, dtype=np.float32)
+    rgb[: len(pairs)] = [pair[0] for pair in pairs]
+    weights[: len(pairs)] = [pair[1] for pair in pairs]
+
+    total = weights.sum()
+    if total <= 0:
+        raise ValueError("Palette weights must be positive")
+    weights /= total
+
+    lab = ColorDistance.rgb_to_lab_array(rgb).astype(np.float32)
+    return rgb, lab, weights
+
+
+def weighted_delta_e(query_lab, query_weights, lab, weights):
+    """
+    Symmetric weighted Delta E between a query palette and many palettes
+
+    Each color is matched to its nearest color in the other palette and the
+    CIE76 distances are averaged with the palette weights in both directions.
+
+    Args:
+        query_lab: Query colors in L*a*b*, shape (K, 3)
+        query_weights: Query weights, shape (K,)
+        lab: Candidate colors in L*a*b*, shape (N, S, 3)
+        weights: Candidate weights, shape (N, S)
+
+    Returns:
+        numpy.ndarray: Distance per candidate, shape (N,)
+    """
+    query_lab = np.asarray(query_lab, dtype=np.float32)
+    lab = np.asarray(lab, dtype=np.float32)
+    weights = np.asarray(weights, dtype=np.float32)
+
+    # Squared distances via |x|^2 + |y|^2 - 2xy, shape (N, S, K); the square
+    # root is only taken after the nearest-color reductions
+    squared = (
+        (lab**2).sum(axis=-1)[:, :, None]
+        + (query_lab**2).sum(axis=-1)[None, None, :]
+        - 2 * (lab @ query_lab.T)
+    )
+
+    to_candidate = np.where(weights[:, :, None] > 0, squared, np.inf).min(axis=1)
+    to_query = np.where(query_weights[None, None, :] > 0, squared, np.inf).min(axis=2)
+
+    forward = (query_weights[None, :] * np.sqrt(np.maximum(to_candidate, 0))).sum(
+        axis=1
+    )
+    backward = (weights * np.sqrt(np.maximum(to_query, 0))).sum(axis=1)
+    return (forward + backward) / 2
+
+
+def earth_movers_distance(query_lab, query_weights, lab, weights):
+    """
+    Earth Mover's Distance between two palettes with CIE76 ground distance
+
+    Args:
+        query_lab: Query colors in L*a*b*, shape (K, 3)
+        query_weights: Query weights summing to 1, shape (K,)
+        lab: Candidate colors in L*a*b*, shape (S, 3)
+        weights: Candidate weights summing to 1, shape (S,)
+
+    Returns:
+        float: Minimum cost of moving the query weights onto the candidate
+    """
+    q_mask = query_weights > 0
+    c_mask = weights > 0
+    supply = query_weights[q_mask].astype(np.float64)
+    demand = weights[c_mask].astype(np.float64)
+    supply /= supply.sum()
+    demand /= demand.sum()
+
+    cost = ColorDistance.pairwise_delta_e_cie76(query_lab[q_mask], lab[c_mask])
+    n, m = cost.shape
+
+    # Row sums equal supply, column sums equal demand; the last column
+    # constraint is implied by the others and dropped for numerical stability
+    a_eq = np.zeros((n + m - 1, n * m))
+    for i in range(n):
+        a_eq[i, i * m : (i + 1) * m] = 1
+    for j in range(m - 1):
+        a_eq[n + j, j::m] = 1
+    b_eq = np.concatenate([supply, demand[:-1]])
+
+    result = linprog(
+        cost.ravel(), A_eq=a_eq, b_eq=b_eq, bounds=(0, None), method="highs"
+    )
+    return float(result.fun)
+
+
+def _entry(palette_id, rgb, weights, distance):
+    """Search result for one stored palette."""
+    colors = [
+        {
+            "rgb": {"r": int(r), "g": int(g), "b": int(b)},
+            "hex": f"#{int(r):02x}{int(g):02x}{int(b):02x}",
+            "percentage": float(weight) * 100,
+        }
+        for (r, g, b), weight in zip(rgb, weights)
+        if weight > 0
+    ]
+    return {"id": palette_id, "distance": float(distance), "colors": colors}
+
+
+class PaletteIndex:
+    """
+    Searchable store of image palettes.
+
+    Palettes are kept as fixed-length arrays of L*a*b* colors and weights.
+    Small indexes are searched with a vectorized brute-force scan. Larger
+    ones use a ball tree over all stored colors: the nearest neighbours of
+    each query color (more for heavier colors) give a shortlist of palettes
+    that is then reranked exactly. Saved indexes are memory-mapped on load.
+
+    Added palettes are kept apart from the stored arrays, and searched by
+    brute force, until materialize() merges them, so adding does not
+    invalidate the ball tree.
+    """
+
+    def __init__(self, slots=DEFAULT_SLOTS, brute_force_limit=BRUTE_FORCE_LIMIT):
+        """
+        Args:
+            slots (int): Number of colors stored per palette
+            brute_force_limit (int): Largest index size searched exhaustively
+        """
+        self.slots = slots
+        self.brute_force_limit = brute_force_limit
+        self.ids = []
+        self.rgb = np.zeros((0, slots, 3), dtype=np.uint8)
+        self.lab = np.zeros((0, slots, 3), dtype=np.float32)
+        self.weights = np.zeros((0, slots), dtype=np.float32)
+        self._positions = {}
+        # Additions not merged into the arrays yet, by id
+        self._tail = {}
+        self._new_in_tail = 0
+        self._tree = None
+        self._tree_owner = None
+
+    def __len__(self):
+        return len(self.ids) + self._new_in_tail
+
+    def add(self, palette_id, colors):
+        """
+        Add or replace the palette stored for an image
+
+        Args:
+            palette_id (str): Image identifier
+            colors (list): Colors as returned by extract_dominant_colors
+        """
+        palette_id = str(palette_id)
+        arrays = palette_to_arrays(colors, self.slots)
+        if palette_id not in self._positions and palette_id not in self._tail:
+            self._new_in_tail += 1
+        self._tail[palette_id] = arrays
+
+    def materialize(self):
+        """
+        Merge added palettes into the stored arrays
+
+        New arrays and a new id list are built instead of updating the old
+        ones, so snapshots taken earlier stay valid. The ball tree is
+        rebuilt on the next search that needs it.
+        """
+        if not self._tail:
+            return
+
+        ids = list(self.ids)
+        positions = dict(self._positions)
+        rgb = np.array(self.rgb)
+        lab = np.array(self.lab)
+        weights = np.array(self.weights)
+        new_rows = []
+        for palette_id, row in self._tail.items():
+            position = positions.get(palette_id)
+            if position is None:
+                positions[palette_id] = len(ids) + len(new_rows)
+                new_rows.append(row)
+                continue
+            rgb[position], lab[position], weights[position] = row
+
+        if new_rows:
+            ids.extend(
+                palette_id
+                for palette_id in self._tail
+                if palette_id not in self._positions
+            )
+            rgb = np.concatenate([rgb, np.stack([row[0] for row in new_rows])])
+            lab = np.concatenate([lab, np.stack([row[1] for row in new_rows])])
+            weights = np.concatenate([weights, np.stack([row[2] for row in new_rows])])
+
+        self.ids, self._positions = ids, positions
+        self.rgb, self.lab, self.weights = rgb, lab, weights
+        self._tail = {}
+        self._new_in_tail = 0
+        self._tree = None
+        self._tree_owner = None
+
+    def snapshot(self):
+        """
+        A view of the index that later additions do not change
+
+        The view shares the stored arrays and the ball tree, which are only
+        replaced, never modified, so it can be searched without a lock.
+        """
+        if self._tree is None and len(self.ids) > self.brute_force_limit:
+            self._build_tree()
+        view = copy.copy(self)
+        view._tail = dict(self._tail)
+        return view
+
+    def _build_tree(self):
+        mask = np.asarray(self.weights) > 0
+        self._tree_owner = np.nonzero(mask)[0]
+        # Gather the used colors in chunks rather than reading the whole
+        # (possibly memory-mapped) array at once
+        colors = np.concatenate(
+            [
+                self.lab[start : start + SCAN_CHUNK][mask[start : start + SCAN_CHUNK]]
+                for start in range(0, len(self.ids), SCAN_CHUNK)
+            ]
+        )
+        self._tree = BallTree(colors)
+
+    def _candidate_rows(self, query_lab, query_weights, budget):
+        """Rows of palettes that have a color near one of the query colors."""
+        if self._tree is None:
+            self._build_tree()
+
+        rows = []
+        for color, weight in zip(query_lab, query_weights):
+            if weight <= 0:
+                continue
+            k = min(int(np.ceil(budget * weight)) + 10, len(self._tree_owner))
+            neighbours = self._tree.query(color[None], k=k, return_distance=False)
+            rows.append(self._tree_owner[neighbours[0]])
+        return np.unique(np.concatenate(rows))
+
+    def _stored_scores(self, query_lab, query_weights, candidates):
+        """Weighted Delta E of the stored palettes (all or a tree shortlist)."""
+        if not self.ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        if candidates is None and len(self.ids) <= self.brute_force_limit:
+            # Exact weighted Delta E, scanned in chunks to bound memory
+            scores = np.concatenate(
+                [
+                    weighted_delta_e(
+                        query_lab,
+                        query_weights,
+                        np.asarray(self.lab[start : start + SCAN_CHUNK]),
+                        np.asarray(self.weights[start : start + SCAN_CHUNK]),
+                    )
+                    for start in range(0, len(self.ids), SCAN_CHUNK)
+                ]
+            )
+            rows = np.arange(len(self.ids))
+        else:
+            rows = self._candidate_rows(
+                query_lab, query_weights, candidates or CANDIDATE_BUDGET
+            )
+            scores = weighted_delta_e(
+                query_lab, query_weights, self.lab[rows], self.weights[rows]
+            )
+
+        # Stored palettes replaced by a newer addition are skipped
+        replaced = [
+            self._positions[palette_id]
+            for palette_id in self._tail
+            if palette_id in self._positions
+        ]
+        if replaced:
+            keep = ~np.isin(rows, replaced)
+            rows, scores = rows[keep], scores[keep]
+        return rows, scores
+
+    def search(self, colors, top_k=10, metric="delta_e", candidates=None):
+        """
+        Find the stored palettes most similar to a query palette
+
+        Args:
+            colors (list): Query colors (see palette_to_arrays)
+            top_k (int): Number of results
+            metric (str): "delta_e" for weighted Delta E or "emd" for Earth
+                Mover's Distance
+            candidates (int): Number of nearest stored colors gathered from the
+                ball tree; defaults to an exhaustive scan for small indexes and
+                CANDIDATE_BUDGET otherwise
+
+        Returns:
+            list: Dicts with id, distance and stored colors, best match first
+        """
+        if metric not in ("delta_e", "emd"):
+            raise ValueError(f"Unknown metric: {metric}")
+        if not len(self):
+            return []
+
+        _, query_lab, query_weights = palette_to_arrays(colors, self.slots)
+        top_k = min(top_k, len(self))
+
+        rows, scores = self._stored_scores(query_lab, query_weights, candidates)
+        tail_ids = list(self._tail)
+        if tail_ids:
+            tail = [np.stack(arrays) for arrays in zip(*self._tail.values())]
+            scores = np.concatenate(
+                [scores, weighted_delta_e(query_lab, query_weights, tail[1], tail[2])]
+            )
+
+        # EMD is costlier, so only rerank a shortlist picked by Delta E
+        shortlist = np.argsort(scores)[
+            : top_k if metric == "delta_e" else max(top_k * 3, 30)
+        ]
+        ids, rgb, lab, weights = [], [], [], []
+        for i in shortlist:
+            if i < len(rows):
+                row = rows[i]
+                ids.append(self.ids[row])
+                rgb.append(self.rgb[row])
+                lab.append(self.lab[row])
+                weights.append(self.weights[row])
+            else:
+                ids.append(tail_ids[i - len(rows)])
+                rgb.append(tail[0][i - len(rows)])
+                lab.append(tail[1][i - len(rows)])
+                weights.append(tail[2][i - len(rows)])
+        scores = scores[shortlist]
+
+        if metric == "emd":
+            scores = np.array(
+                [
+                    earth_movers_distance(query_lab, query_weights, lab[i], weights[i])
+                    for i in range(len(shortlist))
+                ]
+            )
+
+        order = np.argsort(scores, kind="stable")[:top_k]
+        return [_entry(ids[i], rgb[i], weights[i], scores[i]) for i in order]
+
+    def save(self, directory):
+        """Write the index to a directory of .npy arrays plus an id list.
+
+        Each file is written next to its final name and then renamed over
+        it, so processes that have the previous arrays memory-mapped keep
+        reading the old files.
+        """
+        self.materialize()
+        os.makedirs(directory, exist_ok=True)
+        for name, array in (
+            ("rgb", self.rgb),
+            ("lab", self.lab),
+            ("weights", self.weights),
+        ):
+            path = os.path.join(directory, f"{name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(path + ".tmp", path)
+        path = os.path.join(directory, "ids.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.ids, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory, mmap=True, **kwargs):
+        """
+        Load an index written by save()
+
+        Args:
+            directory (str): Index directory
+            mmap (bool): Memory-map the arrays instead of reading them
+
+        Returns:
+            PaletteIndex: Loaded index
+        """
+        mmap_mode = "r" if mmap else None
+        lab = np.load(os.path.join(directory, "lab.npy"), mmap_mode=mmap_mode)
+        index = cls(slots=lab.shape[1], **kwargs)
+        index.lab = lab
+        index.rgb = np.load(os.path.join(directory, "rgb.npy"), mmap_mode=mmap_mode)
+        index.weights = np.load(
+            os.path.join(directory, "weights.npy"), mmap_mode=mmap_mode
+        )
+        with open(os.path.join(directory, "ids.json"), "r") as f:
+            index.ids = json.load(f)
+        index._positions = {palette_id: i for i, palette_id in enumerate(index.ids)}
+        return index
+
+    @classmethod
+    def from_jsonl(cls, path, **kwargs):
+        """Build an index from the JSONL output of the bulk extraction CLI."""
+        index = cls(**kwargs)
+        with open(path, "r") as f:
+            for line in f:
+                row = json.loads(line)
+                if row.get("colors"):
+                    index.add(row["path"], row["colors"])
+        index.materialize()
+        return index
+
+
+class SharedPaletteIndex:
+    """
+    PaletteIndex persisted in a directory shared by several server processes.
+
+    The arrays written by PaletteIndex.save() are the base of the index.
+    Additions are appended to a JSONL log instead of rewriting the arrays,
+    and every process replays the log lines it has not seen yet before it
+    searches, so entries added by other processes are visible too. Once the
+    log holds ``compact_every`` entries it is folded into the arrays and the
+    generation number is bumped, which makes the other processes reload.
+    Writers take an exclusive lock on a lock file in the directory.
+
+    Replayed entries stay in the index's unmerged additions, so the ball
+    tree over the saved arrays is only rebuilt after a compaction, and
+    searches run on a snapshot outside the lock.
+    """
+
+    def __init__(self, directory, compact_every=COMPACT_EVERY, **kwargs):
+        """
+        Args:
+            directory (str): Index directory
+            compact_every (int): Logged additions before the arrays are rewritten
+            **kwargs: Passed on to PaletteIndex
+        """
+        self.directory = directory
+        self.compact_every = compact_every
+        self._kwargs = kwargs
+        self._index = PaletteIndex(**kwargs)
+        self._generation = None
+        self._offset = 0
+        self._logged = 0
+        # Guards the in-memory index against the threads of this process
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        with open(self._path("index.lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _read_generation(self):
+        try:
+            with open(self._path("generation"), "r") as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _refresh(self):
+        """Reload after a compaction and replay unseen log lines (file lock held)."""
+        generation = self._read_generation()
+        if generation != self._generation:
+            if os.path.exists(self._path("ids.json")):
+                self._index = PaletteIndex.load(self.directory, **self._kwargs)
+            else:
+                self._index = PaletteIndex(**self._kwargs)
+            self._generation = generation
+            self._offset = 0
+            self._logged = 0
+
+        try:
+            with open(self._path("additions.jsonl"), "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        for line in data.splitlines():
+            row = json.loads(line)
+            self._index.add(row["id"], row["colors"])
+            self._logged += 1
+        self._offset += len(data)
+
+    def _compact(self):
+        """Fold the log into the saved arrays (exclusive file lock held)."""
+        self._index.save(self.directory)
+        open(self._path("additions.jsonl"), "w").close()
+        self._generation += 1
+        path = self._path("generation")
+        with open(path + ".tmp", "w") as f:
+            f.write(str(self._generation))
+        os.replace(path + ".tmp", path)
+        self._offset = 0
+        self._logged = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
+
+    def add(self, palette_id, colors):
+        """
+        Add or replace the palette stored for an image and persist it
+
+        Args:
+            palette_id (str): Image identifier
+            colors (list): Colors as returned by extract_dominant_colors
+        """
+        rgb, _, weights = palette_to_arrays(colors, self._index.slots)
+        entry = {
+            "id": str(palette_id),
+            "colors": [
+                {"rgb": color.tolist(), "percentage": float(weight)}
+                for color, weight in zip(rgb, weights)
+                if weight > 0
+            ],
+        }
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh()
+            with open(self._path("additions.jsonl"), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._refresh()
+            if self._logged >= self.compact_every:
+                self._compact()
+
+    def search(self, colors, **kwargs):
+        """Search the index after picking up additions from other processes.
+
+        Takes the same arguments as PaletteIndex.search().
+        """
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._refresh()
+            index = self._index.snapshot()
+        return index.search(colors, **kwargs)
@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from backend.utils.color_utils import rgb_to_hex
+from utils.color_distance import ColorDistance
+from utils.palette_index import _color_rgb, _color_weight
+
+# Maximum number of reference palettes kept by id
+DEFAULT_REFERENCE_CACHE_SIZE = 1000
+
+
+def palette_rgb(colors):
+    """
+    Colors of a palette as an RGB array, ignoring any weights
+
+    Args:
+        colors (list): Colors as returned by extract_dominant_colors, hex
+            strings or RGB lists
+
+    Returns:
+        uint8 array (N, 3)
+    """
+    values = [_color_rgb(color) for color in colors]
+    if not values:
+        raise ValueError("Palette is empty")
+
+    rgb = np.array(values, dtype=np.int64)
+    if rgb.ndim != 2 or rgb.shape[1] != 3 or rgb.min() < 0 or rgb.max() > 255:
+        raise ValueError("Colors must be RGB values between 0 and 255")
+    return rgb.astype(np.uint8)
+
+
+def palette_arrays(colors):
+    """
+    Convert a palette to arrays, keeping the order of its colors
+
+    Args:
+        colors (list): Colors as returned by extract_dominant_colors, hex
+            strings or RGB lists
+
+    Returns:
+        tuple: (rgb uint8 (N, 3), lab float64 (N, 3), weights float64 (N,)),
+        weights normalized to sum to 1
+    """
+    rgb = palette_rgb(colors)
+    weights = np.array([_color_weight(color) for color in colors], dtype=np.float64)
+    if weights.min() < 0 or weights.sum() <= 0:
+        raise ValueError("Palette weights must be positive")
+
+    return rgb, ColorDistance.rgb_to_lab_array(rgb), weights / weights.sum()
+
+
+class ReferencePalette:
+    """A reference palette with its Lab conversion done once."""
+
+    def __init__(self, colors):
+        self.rgb, self.lab, self.weights = palette_arrays(colors)
+        self.hex = [rgb_to_hex(*color) for color in self.rgb.tolist()]
+
+    def __len__(self):
+        return len(self.rgb)
+
+
+class ReferencePaletteCache:
+    """
+    Reference palettes by id, evicting the least recently used.
+
+    Brand palettes are matched against many extracted palettes, so storing
+    them under an id lets later requests skip sending and converting them.
+    """
+
+    def __init__(self, max_entries=DEFAULT_REFERENCE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, reference_id):
+        """Return the palette stored under reference_id, or None."""
+        with self._lock:
+            reference = self._entries.get(reference_id)
+            if reference is not None:
+                self._entries.move_to_end(reference_id)
+            return reference
+
+    def put(self, reference_id, colors):
+        """Convert and store a palette under reference_id, replacing any old one."""
+        reference = ReferencePalette(colors)
+        with self._lock:
+            self._entries[reference_id] = reference
+            self._entries.move_to_end(reference_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return reference
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def match_palette(colors, reference, return_matrix=False):
+    """
+    Match a palette against a reference palette
+
+    The CIE76 Delta E between every pair of colors is computed in one pass.
+    Each color gets its nearest reference color, and the colors are also
+    assigned one-to-one to reference colors (Hungarian algorithm). With more
+    colors than reference colors only the dominant ones are assigned and
+    the least important ones stay unassigned. Each distance is weighted by
+    the color's percentage, so dominant colors get their closest reference
+    colors first.
+
+    Args:
+        colors (list): Palette to match (colors as for palette_arrays)
+        reference (ReferencePalette): Palette to match against
+        return_matrix (bool): Also return the full distance matrix
+
+    Returns:
+        dict: "nearest" and "assignment" entries per color and "score", the
+        weighted mean Delta E of the assignment
+    """
+    rgb, lab, weights = palette_arrays(colors)
+    distances = ColorDistance.pairwise_delta_e_cie76(lab, reference.lab)
+
+    nearest_index = distances.argmin(axis=1)
+    nearest_distance = distances[np.arange(len(rgb)), nearest_index]
+
+    # Weighting the cost alone would leave out the heaviest colors, which
+    # are the most expensive to assign, so pick the colors to assign first
+    candidates = np.argsort(-weights, kind="stable")[: len(reference)]
+    rows, cols = linear_sum_assignment(
+        distances[candidates] * weights[candidates, None]
+    )
+    rows = candidates[rows]
+    order = np.argsort(rows)
+    rows, cols = rows[order], cols[order]
+    assigned_weight = weights[rows].sum()
+    score = float((distances[rows, cols] * weights[rows]).sum() / assigned_weight)
+
+    hex_colors = [rgb_to_hex(*color) for color in rgb.tolist()]
+    result = {
+        "nearest": [
+            {
+                "index": index,
+                "color": hex_colors[index],
+                "match": int(match),
+                "matchColor": reference.hex[match],
+                "deltaE": float(distance),
+            }
+            for index, (match, distance) in enumerate(
+                zip(nearest_index, nearest_distance)
+            )
+        ],
+        "assignment": [
+            {
+                "index": int(row),
+                "color": hex_colors[row],
+                "match": int(col),
+                "matchColor": reference.hex[col],
+                "deltaE": float(distances[row, col]),
+                "weight": float(weights[row]),
+            }
+            for row, col in zip(rows, cols)
+        ],
+        "score": score,
+    }
+    if return_matrix:
+        result["matrix"] = distances
+    return result
@@ -0,0 +1,347 @@
+import random
+import threading
+from collections import OrderedDict
+from itertools import combinations
+import cv2
+import numpy as np
+from utils.image_processor import REDUCED_READ_FLAGS, decode_reduction, probe_image
+from utils.palette_index import palette_to_arrays, weighted_delta_e
+
+# Hashes within this many differing bits (of 64) count as near-duplicates
+DEFAULT_MAX_DISTANCE = 6
+
+# Maximum number of palettes kept in the near-duplicate cache
+DEFAULT_CACHE_SIZE = 100000
+
+# Largest RGB distance between image mean colors for a cache hit; dHash only
+# sees brightness structure, so recolored copies of an image share a hash
+DEFAULT_COLOR_TOLERANCE = 16.0
+
+# Fraction of cache hits that are recomputed to measure false-match Delta E
+DEFAULT_AUDIT_RATE = 0.01
+
+
+def _to_gray(image):
+    """Convert a BGR/RGBA/grayscale array to a single-channel image."""
+    image = np.asarray(image)
+    if image.ndim == 2:
+        return image
+    # Channel order only changes the weights slightly, which is fine for hashing
+    return image[:, :, :3].mean(axis=2).astype(np.float32)
+
+
+def dhash(image, hash_size=8):
+    """
+    Difference hash of an image
+
+    The image is shrunk to (hash_size + 1) x hash_size grayscale pixels and
+    each bit records whether a pixel is brighter than its right neighbour.
+
+    Args:
+        image: Image array (grayscale, BGR or RGBA)
+        hash_size (int): Bits per row and number of rows
+
+    Returns:
+        int: Hash with hash_size * hash_size bits
+    """
+    small = cv2.resize(
+        np.asarray(_to_gray(image), dtype=np.float32),
+        (hash_size + 1, hash_size),
+        interpolation=cv2.INTER_AREA,
+    )
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def phash(image, hash_size=8, highfreq_factor=4):
+    """
+    DCT-based perceptual hash of an image
+
+    Args:
+        image: Image array (grayscale, BGR or RGBA)
+        hash_size (int): Side of the low-frequency DCT block that is kept
+        highfreq_factor (int): Thumbnail side as a multiple of hash_size
+
+    Returns:
+        int: Hash with hash_size * hash_size bits
+    """
+    side = hash_size * highfreq_factor
+    small = cv2.resize(
+        np.asarray(_to_gray(image), dtype=np.float32),
+        (side, side),
+        interpolation=cv2.INTER_AREA,
+    )
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    bits = low > np.median(low)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def mean_color(image, bgr=False):
+    """Mean RGB color of an image array as a float array of three values."""
+    image = np.asarray(image)
+    if image.ndim == 2:
+        return np.repeat(float(image.mean()), 3)
+    mean = image[:, :, :3].reshape(-1, 3).mean(axis=0)
+    return mean[::-1] if bgr else mean
+
+
+def image_signature(image, bgr=False, hash_size=8):
+    """
+    Difference hash and mean RGB color of an image array
+
+    Both are computed from one small thumbnail, so the full-size image is
+    only read once.
+
+    Returns:
+        tuple: (hash, mean color)
+    """
+    image = np.asarray(image)
+    if image.ndim == 3 and image.shape[2] > 3:
+        image = image[:, :, :3]
+    side = hash_size * 4
+    thumbnail = cv2.resize(
+        np.ascontiguousarray(image), (side, side), interpolation=cv2.INTER_AREA
+    )
+    return dhash(thumbnail, hash_size), mean_color(thumbnail, bgr=bgr)
+
+
+def file_signature(file_path, hash_size=8, max_pixels=None):
+    """
+    Difference hash and mean RGB color of an image file, decoded at reduced
+    resolution
+
+    Args:
+        file_path (str): Image file
+        hash_size (int): Hash side, giving hash_size**2 bits
+        max_pixels (int): Decoded pixel limit, checked against the header
+            before anything is decoded (see decode_reduction)
+
+    Returns:
+        tuple: (hash, mean color), or (None, None) if the file cannot be decoded
+
+    Raises:
+        ImageTooLargeError: If the image cannot be decoded within max_pixels
+    """
+    # Reduced decoding is enough for a thumbnail; JPEGs over the limit are
+    # read at the stronger reduction that fits it
+    reduction = 4
+    if max_pixels is not None:
+        info = probe_image(file_path)
+        reduction = max(reduction, decode_reduction(info, max_pixels))
+    image = cv2.imread(file_path, REDUCED_READ_FLAGS[reduction])
+    if image is None or min(image.shape[:2]) < hash_size + 1:
+        image = cv2.imread(file_path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None, None
+    return image_signature(image, bgr=True, hash_size=hash_size)
+
+
+def hamming_distance(hash1, hash2):
+    """Number of differing bits between two integer hashes."""
+    return bin(hash1 ^ hash2).count("1")
+
+
+class MultiIndexHashTable:
+    """
+    Hamming-distance index over fixed-width integer hashes (multi-index hashing).
+
+    Each hash is split into chunks with one lookup table per chunk. If two
+    hashes are within max_distance bits, at least one chunk differs by no
+    more than max_distance // num_chunks bits, so a query only probes the
+    keys within that radius in each table before checking full distances.
+    """
+
+    def __init__(self, bits=64, max_distance=DEFAULT_MAX_DISTANCE, chunk_bits=16):
+        """
+        Args:
+            bits (int): Width of the hashes
+            max_distance (int): Largest Hamming distance answered by query()
+            chunk_bits (int): Width of each chunk
+        """
+        self.bits = bits
+        self.max_distance = max_distance
+        self.chunk_bits = chunk_bits
+        self.num_chunks = -(-bits // chunk_bits)
+        self._mask = (1 << chunk_bits) - 1
+        self._tables = [{} for _ in range(self.num_chunks)]
+        self._masks = {}
+
+    def _keys(self, value):
+        return [
+            (value >> (i * self.chunk_bits)) & self._mask
+            for i in range(self.num_chunks)
+        ]
+
+    def _flip_masks(self, radius):
+        """XOR masks that flip up to radius bits of a chunk (cached)."""
+        if radius not in self._masks:
+            masks = [0]
+            for flips in range(1, radius + 1):
+                for positions in combinations(range(self.chunk_bits), flips):
+                    masks.append(sum(1 << position for position in positions))
+            self._masks[radius] = masks
+        return self._masks[radius]
+
+    def add(self, value, item):
+        for table, key in zip(self._tables, self._keys(value)):
+            table.setdefault(key, []).append((value, item))
+
+    def remove(self, value, item):
+        for table, key in zip(self._tables, self._keys(value)):
+            bucket = table.get(key, [])
+            if (value, item) in bucket:
+                bucket.remove((value, item))
+            if not bucket:
+                table.pop(key, None)
+
+    def query(self, value, max_distance=None):
+        """
+        Find stored items whose hash is within max_distance bits
+
+        Returns:
+            list: (distance, item) pairs, closest first
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        masks = self._flip_masks(max_distance // self.num_chunks)
+        matches = {}
+        for table, key in zip(self._tables, self._keys(value)):
+            for flip in masks:
+                for stored, item in table.get(key ^ flip, ()):
+                    if item in matches:
+                        continue
+                    distance = hamming_distance(stored, value)
+                    if distance <= max_distance:
+                        matches[item] = distance
+        return sorted((distance, item) for item, distance in matches.items())
+
+
+def palette_delta_e(colors1, colors2):
+    """Weighted Delta E between two extracted palettes (0 means identical)."""
+    _, lab1, weights1 = palette_to_arrays(colors1)
+    _, lab2, weights2 = palette_to_arrays(colors2)
+    return float(weighted_delta_e(lab1, weights1, lab2[None], weights2[None])[0])
+
+
+class PaletteHashCache:
+    """
+    Reuse palettes for resized or re-encoded copies of an image.
+
+    Palettes are stored with the perceptual hash of their image and the
+    extraction parameters. A lookup returns the palette of the closest
+    stored hash with the same parameters. A small fraction of hits is
+    recomputed to measure how far reused palettes are from fresh ones.
+    """
+
+    def __init__(
+        self,
+        max_distance=DEFAULT_MAX_DISTANCE,
+        max_entries=DEFAULT_CACHE_SIZE,
+        audit_rate=DEFAULT_AUDIT_RATE,
+        color_tolerance=DEFAULT_COLOR_TOLERANCE,
+    ):
+        """
+        Args:
+            max_distance (int): Largest Hamming distance treated as a duplicate
+            max_entries (int): Number of palettes kept before evicting the oldest
+            audit_rate (float): Fraction of hits recomputed for the Delta E report
+            color_tolerance (float): Largest mean color distance for a hit
+        """
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self.color_tolerance = color_tolerance
+        self._index = MultiIndexHashTable(max_distance=max_distance)
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.audits = 0
+        self.audit_delta_e_total = 0.0
+        self.audit_delta_e_max = 0.0
+
+    def lookup(self, image_hash, params, color=None):
+        """
+        Find the palette of a near-duplicate image
+
+        Args:
+            image_hash (int): Perceptual hash of the image
+            params (tuple): Hashable extraction parameters
+            color: Mean RGB color of the image, checked against the stored one
+
+        Returns:
+            tuple: (palette, Hamming distance), or (None, None) on a miss
+        """
+        with self._lock:
+            for distance, entry_id in self._index.query(image_hash):
+                entry = self._entries.get(entry_id)
+                if entry is None or entry[1] != params:
+                    continue
+                if color is not None and entry[2] is not None:
+                    if np.linalg.norm(entry[2] - color) > self.color_tolerance:
+                        continue
+                return entry[3], distance
+        return None, None
+
+    def add(self, image_hash, params, palette, color=None):
+        if color is not None:
+            color = np.asarray(color, dtype=np.float64)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (image_hash, params, color, palette)
+            self._index.add(image_hash, entry_id)
+
+            while len(self._entries) > self.max_entries:
+                old_id, (old_hash, _, _, _) = self._entries.popitem(last=False)
+                self._index.remove(old_hash, old_id)
+
+    def get_or_compute(self, image_hash, params, compute, color=None):
+        """
+        Return a cached palette for a near-duplicate image or compute it
+
+        Args:
+            image_hash (int): Perceptual hash of the image
+            params (tuple): Hashable extraction parameters
+            compute (callable): Returns the palette when there is no match
+            color: Mean RGB color of the image (see mean_color)
+
+        Returns:
+            tuple: (palette, info dict with "hit" and "distance")
+        """
+        if color is not None:
+            color = np.asarray(color, dtype=np.float64)
+        palette, distance = self.lookup(image_hash, params, color)
+
+        with self._lock:
+            self.lookups += 1
+            if palette is not None:
+                self.hits += 1
+
+        if palette is None:
+            palette = compute()
+            self.add(image_hash, params, palette, color)
+            return palette, {"hit": False, "distance": None}
+
+        if random.random() < self.audit_rate:
+            delta_e = palette_delta_e(palette, compute())
+            with self._lock:
+                self.audits += 1
+                self.audit_delta_e_total += delta_e
+                self.audit_delta_e_max = max(self.audit_delta_e_max, delta_e)
+
+        return palette, {"hit": True, "distance": distance}
+
+    def stats(self):
+        """Hit rate and audited false-match Delta E of the cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "audits": self.audits,
+                "audit_mean_delta_e": (
+                    self.audit_delta_e_total / self.audits if self.audits else None
+                ),
+                "audit_max_delta_e": self.audit_delta_e_max if self.audits else None,
+            }
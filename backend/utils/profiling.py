@@ -0,0 +1,270 @@
+import cProfile
+import heapq
+import io
+import ipaddress
+import os
+import pstats
+import shutil
+import threading
+import time
+import uuid
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import (
+        ConsoleRenderer,
+        HTMLRenderer,
+        SpeedscopeRenderer,
+    )
+    from pyinstrument.session import Session
+except ImportError:
+    # Optional; explicit profiles fall back to cProfile and the slow log
+    # records timings without profiles
+    Profiler = None
+
+# Sampling interval of the profiler in seconds
+DEFAULT_INTERVAL = 0.001
+
+# Report formats and their content types; cProfile reports are text only
+REPORT_FORMATS = {
+    "html": "text/html; charset=utf-8",
+    "speedscope": "application/json",
+    "text": "text/plain; charset=utf-8",
+}
+
+
+def parse_allowlist(value):
+    """Parse a comma-separated list of IP addresses and networks."""
+    return [
+        ipaddress.ip_network(item.strip(), strict=False)
+        for item in value.split(",")
+        if item.strip()
+    ]
+
+
+def is_allowed(address, allowlist):
+    """Check whether a client address belongs to one of the allowed networks."""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in allowlist)
+
+
+class RequestProfile:
+    """
+    Profile one block of code with pyinstrument or, if it is missing, cProfile
+
+    Usage:
+        with RequestProfile() as profile:
+            ...
+        profile.save(path_without_extension)
+    """
+
+    def __init__(self, engine=None, interval=DEFAULT_INTERVAL):
+        if engine is None:
+            engine = "pyinstrument" if Profiler is not None else "cprofile"
+        if engine == "pyinstrument" and Profiler is None:
+            raise ValueError("pyinstrument is not installed")
+        if engine not in ("pyinstrument", "cprofile"):
+            raise ValueError(f"Unknown profiler: {engine}")
+        self.engine = engine
+        self.interval = interval
+        self.duration = None
+        self._profiler = None
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.engine == "pyinstrument":
+            self._profiler = Profiler(interval=self.interval, async_mode="disabled")
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.engine == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+        self.duration = time.perf_counter() - self._start
+        return False
+
+    def render(self, report_format="html"):
+        """Render the profile as html, speedscope (flamegraph JSON) or text."""
+        if self.engine == "cprofile":
+            return render_pstats(pstats.Stats(self._profiler))
+        return render_session(self._profiler.last_session, report_format)
+
+    def save(self, path):
+        """
+        Store the raw profile next to path
+
+        Returns:
+            str: File name of the stored profile
+        """
+        if self.engine == "pyinstrument":
+            filename = path + ".pyisession"
+            self._profiler.last_session.save(filename)
+        else:
+            filename = path + ".prof"
+            self._profiler.dump_stats(filename)
+        return filename
+
+
+def render_session(session, report_format):
+    if report_format == "speedscope":
+        return SpeedscopeRenderer().render(session)
+    if report_format == "text":
+        return ConsoleRenderer(unicode=True, color=False).render(session)
+    return HTMLRenderer().render(session)
+
+
+def render_pstats(stats, limit=60):
+    output = io.StringIO()
+    stats.stream = output
+    stats.sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+def _is_running(pid):
+    """Whether a process with this id exists (always True off POSIX)."""
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ProfileStore:
+    """
+    Stored request profiles plus a log of the slowest requests.
+
+    Profiles are written to a directory and rendered when they are read.
+    The slow log keeps the ``slow_log_size`` slowest requests seen so far;
+    the profiles of requests that drop out of it are deleted, as are the
+    oldest explicitly requested profiles beyond ``max_reports``.
+
+    Profile ids are only known to the process that stored them, so each
+    process writes to its own subdirectory, and the subdirectories of
+    processes that are no longer running are removed on startup.
+    """
+
+    def __init__(self, directory, slow_log_size=20, max_reports=100):
+        self.directory = directory
+        self.slow_log_size = slow_log_size
+        self.max_reports = max_reports
+        self._lock = threading.Lock()
+        self._files = {}
+        self._requested = []
+        self._slow = []
+        self._counter = 0
+        self._remove_orphans()
+
+    def _path(self, profile_id):
+        # Looked up per call, so forked workers get their own directory
+        directory = os.path.join(self.directory, str(os.getpid()))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, profile_id)
+
+    def _remove_orphans(self):
+        """Delete the profiles of server processes that no longer run."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.isdigit() or not os.path.isdir(path):
+                continue
+            # A directory named after this process is left from an earlier
+            # run that had the same process id (common in containers)
+            pid = int(name)
+            if pid == os.getpid() or not _is_running(pid):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _delete(self, profile_id):
+        filename = self._files.pop(profile_id, None)
+        if filename is not None and os.path.exists(filename):
+            os.remove(filename)
+
+    def is_slow(self, duration):
+        """Whether a request of this duration would enter the slow log."""
+        with self._lock:
+            return self.slow_log_size > 0 and (
+                len(self._slow) < self.slow_log_size or duration > self._slow[0][0]
+            )
+
+    def save(self, profile, requested=False, profile_id=None):
+        """
+        Store a finished profile
+
+        Args:
+            profile (RequestProfile): The profile to store
+            requested (bool): Explicitly requested profiles are kept until
+                max_reports newer ones exist, whatever their duration
+            profile_id (str): Id already handed out for the profile, if any
+
+        Returns:
+            str: Profile id
+        """
+        profile_id = profile_id or uuid.uuid4().hex
+        filename = profile.save(self._path(profile_id))
+        with self._lock:
+            self._files[profile_id] = filename
+            if requested:
+                self._requested.append(profile_id)
+                while len(self._requested) > self.max_reports:
+                    old_id = self._requested.pop(0)
+                    if not any(entry[2]["profileId"] == old_id for entry in self._slow):
+                        self._delete(old_id)
+        return profile_id
+
+    def record(self, duration, details, profile_id=None):
+        """
+        Offer a finished request to the slow log
+
+        Args:
+            duration (float): Request time in seconds
+            details (dict): Path, image size, parameters and so on
+            profile_id (str): Stored profile of the request, if any
+        """
+        entry = dict(details, durationMs=duration * 1000, profileId=profile_id)
+        with self._lock:
+            self._counter += 1
+            item = (duration, self._counter, entry)
+            if len(self._slow) < self.slow_log_size:
+                heapq.heappush(self._slow, item)
+                return
+            if self.slow_log_size == 0 or duration <= self._slow[0][0]:
+                dropped = entry
+            else:
+                dropped = heapq.heapreplace(self._slow, item)[2]
+            dropped_id = dropped["profileId"]
+            if dropped_id is not None and dropped_id not in self._requested:
+                self._delete(dropped_id)
+
+    def slow_requests(self):
+        """Logged requests, slowest first."""
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._slow, reverse=True)]
+
+    def render(self, profile_id, report_format="html"):
+        """
+        Render a stored profile
+
+        Returns:
+            tuple: (report, content type), or (None, None) if it is unknown
+        """
+        with self._lock:
+            filename = self._files.get(profile_id)
+        if filename is None or not os.path.exists(filename):
+            return None, None
+        if filename.endswith(".prof"):
+            return render_pstats(pstats.Stats(filename)), REPORT_FORMATS["text"]
+        session = Session.load(filename)
+        return render_session(session, report_format), REPORT_FORMATS[report_format]
@@ -0,0 +1,79 @@
+import json
+import numpy as np
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+# Media type (or ?format= value) that selects the columnar palette format
+COLUMNAR_MEDIA_TYPE = "application/vnd.palette.columnar+json"
+
+
+def _default(obj):
+    """Convert NumPy values that the JSON encoders do not handle themselves."""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        """Serialize obj to UTF-8 JSON bytes, handling NumPy types natively."""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+
+else:
+
+    def dumps(obj):
+        """Serialize obj to UTF-8 JSON bytes, handling NumPy types."""
+        return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+def to_columnar(colors):
+    """
+    Convert a palette to parallel arrays
+
+    Args:
+        colors (list): Colors as returned by extract_dominant_colors
+
+    Returns:
+        dict: {"hex": [...], "rgb": [[r, g, b], ...], "percentage": [...]}
+    """
+    return {
+        "hex": [color["hex"] for color in colors],
+        "rgb": [
+            [color["rgb"]["r"], color["rgb"]["g"], color["rgb"]["b"]]
+            for color in colors
+        ],
+        "percentage": [color["percentage"] for color in colors],
+    }
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (falls back to the json module)."""
+
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Skip the str round trip that the default provider makes
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import { rgbToHex } from '../utils/colorUtils';
+import { canonicalHex, rgbToHex } from '../utils/colorUtils';
 
 const ColorAnalysis = ({ color, addComparisonColor }) => {
   const [analysis, setAnalysis] = useState(null);
@@ -14,14 +14,8 @@ const ColorAnalysis = ({ color, addComparisonColor }) => {
       setError(null);
       
       try {
-        // Try to fetch from API first
-        const response = await fetch('/api/analyze', {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json',
-          },
-          body: JSON.stringify({ color: color.hex }),
-        });
+        // Try to fetch from API first (cacheable GET on a canonical URL)
+        const response = await fetch(`/api/colors/${canonicalHex(color.hex)}`);
         
         if (!response.ok) {
           throw new Error('API request failed');
@@ -31,8 +31,8 @@ const DominantColors = ({ imageUrl, addComparisonColor, colors: propColors }) =>
       
       const data = await response.json();
       setDominantColors(data.colors.map(color => ({
-        hex: rgbToHex(color.r, color.g, color.b),
-        rgb: { r: color.r, g: color.g, b: color.b },
+        hex: color.hex || rgbToHex(color.rgb.r, color.rgb.g, color.rgb.b),
+        rgb: color.rgb,
         percentage: color.percentage,
         hsl: color.hsl,
         name: color.name
@@ -42,12 +42,7 @@ export default function ImageUploader({ onImageUpload, isAnalyzing }) {
       return;
     }
     
-    // Check file size (limit to 10MB)
-    if (file.size > 10 * 1024 * 1024) {
-      alert('File size should be less than 10MB');
-      return;
-    }
-    
+    // The size limit is checked by the API client after downscaling
     onImageUpload(file);
   };
   
@@ -15,7 +15,8 @@ export default async function handler(req, res) {
     // Try to use the backend API if available
     try {
       const backendUrl = process.env.BACKEND_URL || 'http://localhost:5000';
-      const response = await axios.post(`${backendUrl}/api/analyze-color`, { color });
+      const hex = color.replace('#', '').toLowerCase();
+      const response = await axios.get(`${backendUrl}/api/colors/${hex}`);
       return res.status(200).json(response.data);
     } catch (backendError) {
       console.error('Backend API error:', backendError);
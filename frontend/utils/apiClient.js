@@ -1,12 +1,59 @@
+import { canonicalHex } from './colorUtils';
+import { downscaleImage } from './imageResize';
+
 // Determine API base URL based on environment
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 
   (process.env.NODE_ENV === 'production'
     ? 'https://your-backend-api-url.com/api' // Replace with your production backend URL
     : '/api');
 
+let capabilitiesRequest = null;
+
+// Upload limits and working resolution advertised by the server, fetched once
+export const getCapabilities = () => {
+  if (!capabilitiesRequest) {
+    capabilitiesRequest = fetch(`${API_BASE_URL}/capabilities`)
+      .then((response) => {
+        if (!response.ok) throw new Error('Error fetching capabilities');
+        return response.json();
+      })
+      .catch((error) => {
+        capabilitiesRequest = null;
+        throw error;
+      });
+  }
+  return capabilitiesRequest;
+};
+
+// Upload size limit used when the server's capabilities are unavailable
+const FALLBACK_MAX_UPLOAD_BYTES = 10 * 1024 * 1024;
+
+// Downscale an image to the server's working resolution before it is sent.
+// The original file is sent if the capabilities or the resize are unavailable.
+// Only the upload functions below call this, so an image is resized once.
+// The size limit applies to the file that is sent, so large photos that
+// downscale below it are accepted.
+export const prepareUpload = async (imageFile) => {
+  let upload = imageFile;
+  let maxUploadBytes = FALLBACK_MAX_UPLOAD_BYTES;
+  try {
+    const capabilities = await getCapabilities();
+    maxUploadBytes = capabilities.maxUploadBytes || maxUploadBytes;
+    upload = await downscaleImage(imageFile, capabilities.workingResolution);
+  } catch (error) {
+    console.warn('Uploading the original image:', error);
+  }
+
+  if (upload.size > maxUploadBytes) {
+    const limitMb = Math.floor(maxUploadBytes / (1024 * 1024));
+    throw new Error(`File size should be less than ${limitMb}MB`);
+  }
+  return upload;
+};
+
 export const uploadImage = async (imageFile) => {
   const formData = new FormData();
-  formData.append('image', imageFile);
+  formData.append('image', await prepareUpload(imageFile));
   
   try {
     const response = await fetch(`${API_BASE_URL}/upload`, {
@@ -22,17 +69,55 @@ export const uploadImage = async (imageFile) => {
   }
 };
 
+// Color lookups are GET requests on canonical URLs, so the browser and any
+// proxy in between can cache them
 export const analyzeColor = async (hexColor) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/analyze`, {
+    const response = await fetch(`${API_BASE_URL}/colors/${canonicalHex(hexColor)}`);
+    
+    if (!response.ok) throw new Error('Error analyzing color');
+    return await response.json();
+  } catch (error) {
+    console.error('API Error:', error);
+    throw error;
+  }
+};
+
+export const calculateColorDistance = async (color1, color2) => {
+  try {
+    const response = typeof color1 === 'string' && typeof color2 === 'string'
+      ? await fetch(
+        `${API_BASE_URL}/distance/${canonicalHex(color1)}/${canonicalHex(color2)}`
+      )
+      : await fetch(`${API_BASE_URL}/color-distance`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ color1, color2 }),
+      });
+    
+    if (!response.ok) throw new Error('Error calculating color distance');
+    return await response.json();
+  } catch (error) {
+    console.error('API Error:', error);
+    throw error;
+  }
+};
+
+// Match a palette against a reference palette. The reference is stored on the
+// server under referenceId, so later calls can pass null for reference.
+export const matchPalette = async (palette, reference, referenceId) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/match-palette`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ color: hexColor }),
+      body: JSON.stringify({ palette, reference, reference_id: referenceId }),
     });
-    
-    if (!response.ok) throw new Error('Error analyzing color');
+
+    if (!response.ok) throw new Error('Error matching palette');
     return await response.json();
   } catch (error) {
     console.error('API Error:', error);
@@ -40,20 +125,152 @@ export const analyzeColor = async (hexColor) => {
   }
 };
 
-export const calculateColorDistance = async (color1, color2) => {
+// Harmony schemes (complementary, analogous, triadic, split_complementary,
+// tetradic) for every color of a palette in one request
+export const getHarmonies = async (palette, schemes) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/color-distance`, {
+    const response = await fetch(`${API_BASE_URL}/harmony`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ color1, color2 }),
+      body: JSON.stringify({ palette, schemes }),
     });
-    
-    if (!response.ok) throw new Error('Error calculating color distance');
+
+    if (!response.ok) throw new Error('Error generating color harmonies');
     return await response.json();
   } catch (error) {
     console.error('API Error:', error);
     throw error;
   }
 };
+
+// Read an NDJSON response line by line, calling onItem for each parsed object
+// as soon as it arrives. Resolves with the number of items received.
+const readNdjson = async (response, onItem) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let count = 0;
+
+  const emit = (line) => {
+    if (line.trim()) {
+      onItem(JSON.parse(line));
+      count += 1;
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(emit);
+  }
+
+  emit(buffer + decoder.decode());
+  return count;
+};
+
+export const analyzeImagesStream = async (imageFiles, onResult, numColors) => {
+  const formData = new FormData();
+  imageFiles.forEach((file) => formData.append('images', file));
+  if (numColors) formData.append('num_colors', numColors);
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/analyze-batch?stream=1`, {
+      method: 'POST',
+      headers: {
+        Accept: 'application/x-ndjson',
+      },
+      body: formData,
+    });
+
+    if (!response.ok) throw new Error('Error analyzing images');
+    return await readNdjson(response, onResult);
+  } catch (error) {
+    console.error('API Error:', error);
+    throw error;
+  }
+};
+
+export const calculatePaletteDistanceStream = async (palette1, palette2, onRow) => {
+  try {
+    const response = await fetch(`${API_BASE_URL}/palette-distance?stream=1`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'application/x-ndjson',
+      },
+      body: JSON.stringify({ palette1, palette2 }),
+    });
+
+    if (!response.ok) throw new Error('Error calculating palette distance');
+    return await readNdjson(response, onRow);
+  } catch (error) {
+    console.error('API Error:', error);
+    throw error;
+  }
+};
+
+export const streamJobResults = async (jobId, onResult, offset = 0) => {
+  try {
+    const response = await fetch(
+      `${API_BASE_URL}/jobs/${jobId}/results?stream=1&offset=${offset}`,
+      {
+        headers: {
+          Accept: 'application/x-ndjson',
+        },
+      }
+    );
+
+    if (!response.ok) throw new Error('Error fetching job results');
+    return await readNdjson(response, onResult);
+  } catch (error) {
+    console.error('API Error:', error);
+    throw error;
+  }
+};
+
+// Upload an image in progressive mode: onUpdate receives a coarse palette
+// within tens of milliseconds and refined palettes after it. The request is
+// aborted once an update is converged (or onUpdate returns false), which also
+// stops the remaining work on the server.
+export const uploadImageProgressive = async (imageFile, onUpdate, options = {}) => {
+  const { deadlineMs = 1000, numColors, stopWhenConverged = true } = options;
+  const formData = new FormData();
+  formData.append('image', await prepareUpload(imageFile));
+  formData.append('progressive', '1');
+  formData.append('deadline_ms', deadlineMs);
+  if (numColors) formData.append('num_colors', numColors);
+
+  const controller = new AbortController();
+  let lastUpdate = null;
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/upload`, {
+      method: 'POST',
+      headers: {
+        Accept: 'application/x-ndjson',
+      },
+      body: formData,
+      signal: controller.signal,
+    });
+
+    if (!response.ok) throw new Error('Error uploading image');
+    await readNdjson(response, (update) => {
+      lastUpdate = update;
+      const keepGoing = onUpdate(update);
+      if (keepGoing === false || (stopWhenConverged && update.converged)) {
+        controller.abort();
+      }
+    });
+    return lastUpdate;
+  } catch (error) {
+    if (error.name === 'AbortError') return lastUpdate;
+    console.error('API Error:', error);
+    throw error;
+  }
+};
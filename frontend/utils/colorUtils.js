@@ -10,6 +10,15 @@ export const rgbToHex = (r, g, b) => {
   }).join('');
 };
 
+// Canonical form of a HEX color for cacheable URLs: 6 lowercase digits, no '#'
+export const canonicalHex = (hex) => {
+  let digits = hex.replace('#', '').toLowerCase();
+  if (digits.length === 3) {
+    digits = digits.split('').map(digit => digit + digit).join('');
+  }
+  return digits;
+};
+
 // Convert HEX to RGB
 export const hexToRgb = (hex) => {
   // Remove the # if it exists
@@ -0,0 +1,85 @@
+/**
+ * Client-side downscaling of images before upload
+ */
+
+// Encoder quality for re-encoded JPEGs
+const JPEG_QUALITY = 0.9;
+
+// Scale factor that fits width x height into the working resolution
+export const workingScale = (width, height, { maxSide, maxPixels }) => {
+  let scale = 1;
+  if (maxSide) scale = Math.min(scale, maxSide / Math.max(width, height));
+  if (maxPixels) scale = Math.min(scale, Math.sqrt(maxPixels / (width * height)));
+  return scale;
+};
+
+const loadBitmap = async (file) => {
+  if (typeof createImageBitmap === 'function') {
+    return createImageBitmap(file, { imageOrientation: 'from-image' });
+  }
+
+  // Fallback for browsers without createImageBitmap
+  const url = URL.createObjectURL(file);
+  try {
+    const img = new Image();
+    img.src = url;
+    await img.decode();
+    return img;
+  } finally {
+    URL.revokeObjectURL(url);
+  }
+};
+
+const drawScaled = async (source, width, height, type) => {
+  if (typeof OffscreenCanvas === 'function') {
+    const canvas = new OffscreenCanvas(width, height);
+    const context = canvas.getContext('2d');
+    context.imageSmoothingQuality = 'high';
+    context.drawImage(source, 0, 0, width, height);
+    return canvas.convertToBlob({ type, quality: JPEG_QUALITY });
+  }
+
+  const canvas = document.createElement('canvas');
+  canvas.width = width;
+  canvas.height = height;
+  const context = canvas.getContext('2d');
+  context.imageSmoothingQuality = 'high';
+  context.drawImage(source, 0, 0, width, height);
+  return new Promise((resolve, reject) => {
+    canvas.toBlob(
+      (blob) => (blob ? resolve(blob) : reject(new Error('Could not encode image'))),
+      type,
+      JPEG_QUALITY
+    );
+  });
+};
+
+// Downscale an image file to the working resolution and re-encode it.
+// Files already within it are returned unchanged. PNG and WebP stay
+// lossless PNG to keep alpha.
+export const downscaleImage = async (file, workingResolution) => {
+  if (!workingResolution) return file;
+
+  const bitmap = await loadBitmap(file);
+  const width = bitmap.width;
+  const height = bitmap.height;
+  const scale = workingScale(width, height, workingResolution);
+  if (scale >= 1) {
+    if (bitmap.close) bitmap.close();
+    return file;
+  }
+
+  // Round down so the result never exceeds maxSide or maxPixels
+  const type = ['image/png', 'image/webp'].includes(file.type) ? 'image/png' : 'image/jpeg';
+  const blob = await drawScaled(
+    bitmap,
+    Math.max(1, Math.floor(width * scale)),
+    Math.max(1, Math.floor(height * scale)),
+    type
+  );
+  if (bitmap.close) bitmap.close();
+
+  const extension = type === 'image/png' ? 'png' : 'jpg';
+  const name = file.name.replace(/\.[^.]*$/, '') + '.' + extension;
+  return new File([blob], name, { type, lastModified: file.lastModified });
+};